@@ -1,17 +1,3870 @@
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
+from tkinter import ttk, filedialog, messagebox, simpledialog
 import json
 import time
 import threading
 import queue
 import pynput
 from pynput import mouse, keyboard
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
 import sys
-from collections import deque
+from collections import deque, OrderedDict, defaultdict
+from collections.abc import Sequence, MutableSequence
+from bisect import bisect_left, bisect_right
+import itertools
+import argparse
+import heapq
 import copy
+import cProfile
+import functools
+import hashlib
+import hmac
+import secrets
+import mmap
+import pickle
+import random
+import platform
 import ctypes
+import csv
+import shutil
+import tempfile
+import zipfile
+import multiprocessing
+from multiprocessing import shared_memory
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+# Fast mode keeps only the settles needed for correctness
+FAST_CLICK_SETTLE = 0.005
+FAST_FOCUS_SETTLE = 0.05
+FOCUS_CHANGING_KEYS = {'enter', 'tab', 'esc', 'alt', 'alt_l', 'alt_r', 'alt_gr', 'cmd', 'cmd_l', 'cmd_r',
+                       'f4', 'page_up', 'page_down'}
+
+# Settings, caches and profiles live here
+APP_DATA_DIR = os.path.join(os.path.expanduser('~'), '.namouse')
+
+# Tracing: Chrome trace-event JSON, opens in Perfetto or chrome://tracing
+TRACE_EVENT_LIMIT = 2_000_000
+TRACED_OPERATIONS = ('open_script', 'save_to_file', 'update_script_display', 'optimize_script')
+
+class Tracer:
+    """Collects spans and counters from every thread while enabled.
+    
+    Off by default; instrumented code then pays a single attribute check.
+    One operation can also be armed for a cProfile capture, which is saved
+    next to the other app data the next time that operation runs.
+    """
+    
+    def __init__(self):
+        self.enabled = False
+        self.profile_next = None  # operation name to capture with cProfile
+        self.on_profile = None  # called with (operation, stats file) after a capture
+        self.events = []  # list.append is atomic, so threads share it without a lock
+        self.thread_names = {}
+        self.dropped = 0
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+    
+    @property
+    def active(self):
+        return self.enabled or self.profile_next is not None
+    
+    def start(self):
+        self.events = []
+        self.thread_names = {}
+        self.dropped = 0
+        self.origin = time.perf_counter()
+        self.enabled = True
+    
+    def stop(self):
+        self.enabled = False
+    
+    def now(self):
+        """Microseconds since tracing started"""
+        return (time.perf_counter() - self.origin) * 1e6
+    
+    def emit(self, event):
+        if len(self.events) >= TRACE_EVENT_LIMIT:
+            self.dropped += 1
+            return
+        tid = threading.get_ident()
+        if tid not in self.thread_names:
+            self.thread_names[tid] = threading.current_thread().name
+        event['pid'] = self.pid
+        event['tid'] = tid
+        self.events.append(event)
+    
+    def complete(self, name, start, end=None, **args):
+        """A finished span; start/end in now() units"""
+        end = self.now() if end is None else end
+        self.emit({'name': name, 'ph': 'X', 'ts': start, 'dur': end - start, 'args': args})
+    
+    def counter(self, name, **values):
+        self.emit({'name': name, 'ph': 'C', 'ts': self.now(), 'args': values})
+    
+    def instant(self, name, **args):
+        self.emit({'name': name, 'ph': 'i', 's': 't', 'ts': self.now(), 'args': args})
+    
+    def call(self, name, func, args, kwargs):
+        """Run func as a traced (and possibly profiled) operation"""
+        if self.profile_next == name:
+            self.profile_next = None
+            return self.profile(name, func, args, kwargs)
+        if not self.enabled:
+            return func(*args, **kwargs)
+        start = self.now()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.complete(name, start)
+    
+    def profile(self, name, func, args, kwargs):
+        profiler = cProfile.Profile()
+        start = self.now()
+        try:
+            return profiler.runcall(func, *args, **kwargs)
+        finally:
+            if self.enabled:
+                self.complete(name, start, profiled=True)
+            os.makedirs(APP_DATA_DIR, exist_ok=True)
+            stats_file = os.path.join(APP_DATA_DIR, f"profile-{name}-{datetime.now():%Y%m%d-%H%M%S}.prof")
+            profiler.dump_stats(stats_file)
+            if self.on_profile:
+                self.on_profile(name, stats_file)
+    
+    def save(self, filename):
+        """Write the trace; thread names become track names in the viewer"""
+        metadata = [{'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': tid, 'args': {'name': name}}
+                    for tid, name in list(self.thread_names.items())]
+        with open(filename, 'w') as f:
+            json.dump({'traceEvents': metadata + list(self.events), 'displayTimeUnit': 'ms',
+                       'otherData': {'dropped_events': self.dropped}}, f)
+
+tracer = Tracer()
+
+def traced(name):
+    """Decorator: record calls as spans named name while tracing is on"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.active:
+                return func(*args, **kwargs)
+            return tracer.call(name, func, args, kwargs)
+        return wrapper
+    return decorate
+
+# Events per chunk in the event store; edits copy at most the chunks they touch
+EVENT_CHUNK_SIZE = 1024
+UNDO_LIMIT = 200
+
+class EventSequence(Sequence):
+    """Read-only view over a list of event chunks"""
+    
+    def __init__(self, chunks=()):
+        self._chunks = list(chunks)
+        self._offsets = None
+        self._len = sum(len(chunk) for chunk in self._chunks)
+    
+    def __len__(self):
+        return self._len
+    
+    def __iter__(self):
+        for chunk in self._chunks:
+            yield from chunk
+    
+    def _chunk_offsets(self):
+        """Start index of every chunk, rebuilt lazily after structural edits"""
+        if self._offsets is None:
+            offsets = []
+            total = 0
+            for chunk in self._chunks:
+                offsets.append(total)
+                total += len(chunk)
+            self._offsets = offsets
+        return self._offsets
+    
+    def _locate(self, index):
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("event index out of range")
+        offsets = self._chunk_offsets()
+        k = bisect_right(offsets, index) - 1
+        return k, index - offsets[k]
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._len)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return list(self.iter_range(start, stop))
+        k, j = self._locate(index)
+        return self._chunks[k][j]
+    
+    def iter_range(self, start, stop):
+        """Iterate events start..stop-1 without materializing a list"""
+        if start >= stop:
+            return
+        k, j = self._locate(start)
+        remaining = stop - start
+        while remaining > 0 and k < len(self._chunks):
+            part = self._chunks[k][j:j + remaining]
+            yield from part
+            remaining -= len(part)
+            k += 1
+            j = 0
+
+class EventSnapshot(EventSequence):
+    """Immutable version of the event store, sharing chunks with it"""
+    
+    def __init__(self, chunks=(), source=None):
+        super().__init__(chunks)
+        self.source = source  # (store id, version) it was taken from, a cache key
+
+_event_store_ids = itertools.count(1)
+
+class ChunkedEventList(EventSequence, MutableSequence):
+    """The recorded event store.
+    
+    Events are kept in chunks of about EVENT_CHUNK_SIZE. snapshot() is
+    O(number of chunks) and shares every chunk with the live list; a shared
+    chunk is copied the first time it is modified afterwards. Events are
+    treated as immutable: edits replace an event dict instead of mutating it.
+    """
+    
+    def __init__(self, events=()):
+        super().__init__()
+        self._owned = []
+        self.store_id = next(_event_store_ids)
+        self.version = 0
+        self.extend(events)
+    
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        events = cls()
+        events._chunks = list(snapshot._chunks)
+        events._owned = [False] * len(events._chunks)
+        events._len = len(snapshot)
+        return events
+    
+    def snapshot(self):
+        """Return an immutable version of the current events"""
+        self._owned = [False] * len(self._chunks)
+        return EventSnapshot(self._chunks, (self.store_id, self.version))
+    
+    def _own(self, k):
+        """Make chunk k private to this list before modifying it"""
+        if not self._owned[k]:
+            self._chunks[k] = list(self._chunks[k])
+            self._owned[k] = True
+        return self._chunks[k]
+    
+    def _changed(self, structural=True):
+        self.version += 1
+        if structural:
+            self._offsets = None
+    
+    def __setitem__(self, index, event):
+        if isinstance(index, slice):
+            raise TypeError("slice assignment is not supported, use delete_indices/insert")
+        k, j = self._locate(index)
+        self._own(k)[j] = event
+        self._changed(structural=False)
+    
+    def __delitem__(self, index):
+        if isinstance(index, slice):
+            self.delete_indices(range(*index.indices(self._len)))
+            return
+        k, j = self._locate(index)
+        chunk = self._own(k)
+        del chunk[j]
+        if not chunk:
+            del self._chunks[k]
+            del self._owned[k]
+        self._len -= 1
+        self._changed()
+    
+    def delete_indices(self, indices):
+        """Delete many events at once, rebuilding only the affected chunks"""
+        by_chunk = {}
+        for index in set(indices):
+            k, j = self._locate(index)
+            by_chunk.setdefault(k, set()).add(j)
+        
+        for k in sorted(by_chunk, reverse=True):
+            drop = by_chunk[k]
+            kept = [event for j, event in enumerate(self._chunks[k]) if j not in drop]
+            self._len -= len(self._chunks[k]) - len(kept)
+            if kept:
+                self._chunks[k] = kept
+                self._owned[k] = True
+            else:
+                del self._chunks[k]
+                del self._owned[k]
+        
+        if by_chunk:
+            self._changed()
+    
+    def insert(self, index, event):
+        if index < 0:
+            index = max(0, index + self._len)
+        if index >= self._len:
+            self.append(event)
+            return
+        
+        k, j = self._locate(index)
+        chunk = self._own(k)
+        chunk.insert(j, event)
+        if len(chunk) > 2 * EVENT_CHUNK_SIZE:
+            self._chunks[k:k + 1] = [chunk[:EVENT_CHUNK_SIZE], chunk[EVENT_CHUNK_SIZE:]]
+            self._owned[k:k + 1] = [True, True]
+        self._len += 1
+        self._changed()
+    
+    def replace_many(self, replacements):
+        """Replace events by index ({index: event}), owning each touched chunk once"""
+        if not replacements:
+            return
+        offsets = self._chunk_offsets()
+        indices = np.fromiter(replacements, dtype=np.int64, count=len(replacements))
+        if indices.min() < 0 or indices.max() >= self._len:
+            raise IndexError("event index out of range")
+        chunk_of = np.searchsorted(np.asarray(offsets), indices, 'right') - 1
+        for index, k, event in zip(indices.tolist(), chunk_of.tolist(), replacements.values()):
+            self._own(k)[index - offsets[k]] = event
+        self._changed(structural=False)
+    
+    def append(self, event):
+        # Fast path for recording: offsets stay valid when only the tail grows
+        if not self._chunks or len(self._chunks[-1]) >= EVENT_CHUNK_SIZE:
+            if self._offsets is not None:
+                self._offsets.append(self._len)
+            self._chunks.append([event])
+            self._owned.append(True)
+        else:
+            self._own(len(self._chunks) - 1).append(event)
+        self._len += 1
+        self.version += 1
+    
+    def extend(self, events):
+        for event in events:
+            self.append(event)
+
+class EditHistory:
+    """Undo/redo stacks of event snapshots"""
+    
+    def __init__(self, limit=UNDO_LIMIT):
+        self.undo_stack = deque(maxlen=limit)
+        self.redo_stack = []
+    
+    def record(self, snapshot):
+        """Remember the state before an edit"""
+        self.undo_stack.append(snapshot)
+        self.redo_stack.clear()
+    
+    def undo(self, current):
+        if not self.undo_stack:
+            return None
+        self.redo_stack.append(current)
+        return self.undo_stack.pop()
+    
+    def redo(self, current):
+        if not self.redo_stack:
+            return None
+        self.undo_stack.append(current)
+        return self.redo_stack.pop()
+    
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+
+# Repeated-segment mining
+BLOCK_MIN_LENGTH = 6
+BLOCK_MAX_LENGTH = 4096
+BLOCK_COORD_TOLERANCE = 4
+BLOCK_TIME_TOLERANCE = 0.05
+BLOCK_MAX_COUNT = 64
+
+# Control nodes carry a body (or a reference to one) that the cursor runs in place
+CONTROL_NODE_TYPES = ('block', 'loop', 'section', 'call')
+MAX_NESTING_DEPTH = 32
+WAIT_FOR_POLL_INTERVAL = 0.05
+
+def node_span(node, blocks):
+    """Recorded time a node occupies in its parent's timeline (one pass)"""
+    node_type = node['type']
+    if node_type == 'type_text':
+        return node['offsets'][-1] if node['offsets'] else 0.0
+    if node_type == 'block':
+        return script_duration(blocks.get(node['block'], ()), blocks)
+    if node_type in ('loop', 'section'):
+        return script_duration(node['events'], blocks)
+    return 0.0  # calls and waits are inserted at a point in time
+
+def script_duration(events, blocks):
+    """Recorded duration of a script, including the span of a trailing node"""
+    if not events:
+        return 0
+    last = events[-1]
+    return last['time'] + node_span(last, blocks)
+
+def read_script_file(filename):
+    """Read a script file into {'events', 'blocks', 'settings', 'metadata'}"""
+    return script_disk_cache.load(filename)
+
+def parse_script_data(data):
+    """Normalize parsed script JSON (old list or current dict format)"""
+    # Handle both old and new format
+    if isinstance(data, list):
+        return {'events': data, 'blocks': {}, 'settings': {}, 'metadata': {}}
+    return {
+        'events': data.get('events', []),
+        'blocks': data.get('blocks', {}),
+        'settings': data.get('settings', {}),
+        'metadata': data.get('metadata', {})
+    }
+
+def load_secret(filename, create=False):
+    """A per-user random secret kept in a 0600 file, generated on first use when create is set"""
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            secret = f.read().strip()
+        if secret:
+            return secret
+    except OSError:
+        pass
+    if not create:
+        return None
+    
+    secret = secrets.token_urlsafe(32)
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    temp_file = filename + '.tmp'
+    fd = os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(secret)
+    os.replace(temp_file, filename)
+    return secret
+
+SCRIPT_CACHE_DIR = os.path.join(APP_DATA_DIR, 'cache')
+SCRIPT_CACHE_LIMIT = 256 * 1024 * 1024  # bytes on disk
+SCRIPT_CACHE_MAGIC = b'NAM2'
+SCRIPT_CACHE_KEY_FILE = os.path.join(APP_DATA_DIR, 'cache_key')  # HMAC key entries are signed with
+SCRIPT_CACHE_MAC_SIZE = 32
+
+class DiskScriptCache:
+    """Parsed scripts pickled on disk, keyed by path and validated by mtime/size and content hash.
+    
+    A hit unpickles the entry, skipping the JSON parse. Entries are signed
+    with an HMAC under a per-user key, and nothing is unpickled unless its
+    signature checks out, so a planted .pkl file cannot run code. A miss
+    parses the JSON as usual and hands the pickled form to a background
+    writer. Entries are replaced atomically, and the least recently used ones
+    are evicted once the directory grows past the size limit.
+    """
+    
+    def __init__(self, directory=SCRIPT_CACHE_DIR, limit=SCRIPT_CACHE_LIMIT, key_file=SCRIPT_CACHE_KEY_FILE):
+        self.directory = directory
+        self.limit = limit
+        self.key_file = key_file
+        self.key = None
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.writes = queue.Queue()
+        self.writer = None
+    
+    def entry_path(self, filename):
+        key = hashlib.sha1(os.path.normcase(os.path.abspath(filename)).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, key + '.pkl')
+    
+    def signing_key(self):
+        with self.lock:
+            if self.key is None:
+                self.key = load_secret(self.key_file, create=True).encode('utf-8')
+            return self.key
+    
+    def load(self, filename):
+        """Parsed script, from the cache when the file is unchanged"""
+        stat = os.stat(filename)
+        stamp = [stat.st_mtime_ns, stat.st_size]
+        entry_path = self.entry_path(filename)
+        raw = None
+        
+        try:
+            with open(entry_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as entry:
+                header, offset = self.read_header(entry)
+                if header['stamp'] != stamp:
+                    # Touched but maybe not edited - the content hash decides
+                    with open(filename, 'rb') as source:
+                        raw = source.read()
+                    if hashlib.sha256(raw).hexdigest() != header['sha256']:
+                        raise KeyError(filename)
+                    self.queue_write(entry_path, dict(header, stamp=stamp), entry[offset:])
+                with memoryview(entry)[offset:] as payload:
+                    data = pickle.loads(payload)
+            os.utime(entry_path)  # recency for eviction
+            with self.lock:
+                self.hits += 1
+            return data
+        except Exception:
+            pass  # missing, stale or unreadable entry - parse the script
+        
+        if raw is None:
+            with open(filename, 'rb') as f:
+                raw = f.read()
+        data = parse_script_data(json.loads(raw))
+        with self.lock:
+            self.misses += 1
+        header = {'path': os.path.abspath(filename), 'stamp': stamp, 'sha256': hashlib.sha256(raw).hexdigest()}
+        self.queue_write(entry_path, header, pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+        return data
+    
+    def read_header(self, entry):
+        """Header dict and payload offset of a mapped entry; raises ValueError unless it is signed with our key"""
+        if entry[:4] != SCRIPT_CACHE_MAGIC:
+            raise ValueError("not a script cache entry")
+        length = int.from_bytes(entry[4:8], 'little')
+        offset = 8 + length + SCRIPT_CACHE_MAC_SIZE
+        with memoryview(entry) as view:
+            mac = hmac.new(self.signing_key(), view[8:8 + length], 'sha256')
+            mac.update(view[offset:])
+        if not hmac.compare_digest(mac.digest(), entry[8 + length:offset]):
+            raise ValueError("script cache entry has a bad signature")
+        return json.loads(entry[8:8 + length]), offset
+    
+    def queue_write(self, entry_path, header, payload):
+        self.writes.put((entry_path, header, payload))
+        with self.lock:
+            if self.writer is None:
+                self.writer = threading.Thread(target=self.write_entries, name="Script cache writer", daemon=True)
+                self.writer.start()
+    
+    def write_entries(self):
+        """Background writer: atomic replace, then evict down to the size limit"""
+        while True:
+            entry_path, header, payload = self.writes.get()
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                header_bytes = json.dumps(header).encode('utf-8')
+                mac = hmac.new(self.signing_key(), header_bytes, 'sha256')
+                mac.update(payload)
+                temp_path = entry_path + '.tmp'
+                with open(temp_path, 'wb') as f:
+                    f.write(SCRIPT_CACHE_MAGIC)
+                    f.write(len(header_bytes).to_bytes(4, 'little'))
+                    f.write(header_bytes)
+                    f.write(mac.digest())
+                    f.write(payload)
+                os.replace(temp_path, entry_path)
+                self.evict()
+            except OSError as e:
+                print(f"Script cache write error: {e}")
+            finally:
+                self.writes.task_done()
+    
+    def entries(self):
+        """(last used, size, path) of every entry"""
+        try:
+            with os.scandir(self.directory) as it:
+                return [(entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                        for entry in it if entry.name.endswith('.pkl')]
+        except OSError:
+            return []
+    
+    def evict(self):
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.limit:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+    
+    def clear(self):
+        for _, _, path in self.entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    
+    def stats(self):
+        entries = self.entries()
+        with self.lock:
+            return {'entries': len(entries), 'bytes': sum(size for _, size, _ in entries),
+                    'hits': self.hits, 'misses': self.misses}
+
+script_disk_cache = DiskScriptCache()
+
+def collect_block_names(events):
+    """Names of all blocks referenced anywhere in a script"""
+    names = set()
+    for event in events:
+        if event['type'] == 'block':
+            names.add(event['block'])
+        elif 'events' in event:
+            names |= collect_block_names(event['events'])
+    return names
+
+def inline_blocks(events, blocks):
+    """Return events with every block reference replaced by the block's events"""
+    inlined = []
+    for event in events:
+        if event['type'] == 'block':
+            base = event['time']
+            inlined.extend(dict(block_event, time=base + block_event['time'])
+                           for block_event in inline_blocks(blocks.get(event['block'], ()), blocks))
+        elif 'events' in event:
+            inlined.append(dict(event, events=inline_blocks(event['events'], blocks)))
+        else:
+            inlined.append(event)
+    return inlined
+
+# Background saving
+SAVE_BATCH_EVENTS = EVENT_CHUNK_SIZE
+
+@traced('save_to_file')
+def write_script_file(filename, events, blocks, settings, screen, on_progress=None):
+    """Write a script atomically: stream it to a temp file, fsync, then replace filename.
+    
+    events is a snapshot, so the script can keep changing while this runs.
+    Events are written one per line in batches, reporting the fraction done.
+    """
+    used_blocks = collect_block_names(events)
+    header = {
+        'version': '2.4',
+        'blocks': {name: body for name, body in blocks.items() if name in used_blocks},
+        'settings': settings,
+        'metadata': {
+            'created': datetime.now().isoformat(),
+            'total_events': len(events),
+            'duration': script_duration(events, blocks),
+            'screen_width': screen[0],
+            'screen_height': screen[1]
+        }
+    }
+    
+    temp_file = filename + '.tmp'
+    try:
+        with open(temp_file, 'w') as f:
+            f.write('{\n')
+            for key, value in header.items():
+                f.write(f'  {json.dumps(key)}: {json.dumps(value)},\n')
+            f.write('  "events": [')
+            total = len(events)
+            reported = 0
+            for start in range(0, total, SAVE_BATCH_EVENTS):
+                if start:
+                    f.write(',')
+                f.write(','.join('\n    ' + json.dumps(event)
+                                 for event in events.iter_range(start, start + SAVE_BATCH_EVENTS)))
+                percent = min(start + SAVE_BATCH_EVENTS, total) * 100 // total
+                if on_progress and percent > reported:
+                    reported = percent
+                    on_progress(percent / 100)
+            f.write('\n  ]\n}\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, filename)
+    except BaseException:
+        try:
+            os.remove(temp_file)
+        except OSError:
+            pass
+        raise
+
+class BackgroundSaver:
+    """Writes scripts on a worker thread, one at a time in request order.
+    
+    on_progress(filename, fraction) and on_done(filename, error) are called
+    from the worker thread.
+    """
+    
+    def __init__(self, on_progress=None, on_done=None):
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.requests = queue.Queue()
+        self.worker = None
+        self.lock = threading.Lock()
+    
+    def save(self, filename, events, blocks, settings, screen):
+        """Queue a save of an events snapshot"""
+        self.requests.put((filename, events, blocks, settings, screen))
+        with self.lock:
+            if self.worker is None:
+                self.worker = threading.Thread(target=self.run, name="Save", daemon=True)
+                self.worker.start()
+    
+    def busy(self):
+        return self.requests.unfinished_tasks > 0
+    
+    def run(self):
+        while True:
+            request = self.requests.get()
+            filename = request[0]
+            progress = None
+            if self.on_progress:
+                progress = lambda fraction: self.on_progress(filename, fraction)
+            error = None
+            try:
+                write_script_file(*request, on_progress=progress)
+            except Exception as e:
+                error = e
+            if self.on_done:
+                self.on_done(filename, error)
+            self.requests.task_done()
+
+class CursorFrame:
+    """One level of the playback cursor's stack"""
+    __slots__ = ('events', 'index', 'stop', 'base', 'blocks', 'node', 'remaining', 'span', 'shift_after')
+    
+    def __init__(self, events, base, blocks, node=None, remaining=1, span=0.0, shift_after=0.0):
+        self.events = events
+        self.index = 0
+        self.stop = len(events)
+        self.base = base
+        self.blocks = blocks
+        self.node = node
+        self.remaining = remaining  # passes left, None = forever
+        self.span = span
+        self.shift_after = shift_after
+
+class PlaybackCursor:
+    """Walks a script lazily, running control nodes without expanding them.
+    
+    Iterating yields (time, event) for every event the player must execute.
+    Blocks, sections, loops and calls push a frame onto a small stack, so
+    memory depends on nesting depth only and a forever loop runs in constant
+    memory. Later events are shifted by the extra time repeated loop passes
+    and called scripts take. infinite_as runs forever loops a fixed number of
+    times (for analysis and export).
+    """
+    
+    def __init__(self, events, blocks, loader=None, infinite_as=None, start=0, stop=None):
+        self.loader = loader  # path -> (events, blocks)
+        self.infinite_as = infinite_as
+        self.shift = 0.0
+        self.top_time = 0.0
+        self.called = {}
+        root = CursorFrame(events, 0.0, blocks)
+        root.index = start
+        if stop is not None:
+            root.stop = min(stop, root.stop)
+        self.stack = [root]
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self):
+        stack = self.stack
+        while stack:
+            frame = stack[-1]
+            if frame.index >= frame.stop:
+                self._finish_frame(frame)
+                continue
+            
+            event = frame.events[frame.index]
+            frame.index += 1
+            if len(stack) == 1:
+                self.top_time = event['time']
+            
+            if event['type'] in CONTROL_NODE_TYPES:
+                self._enter(frame, event)
+                continue
+            return frame.base + event['time'] + self.shift, event
+        raise StopIteration
+    
+    def _enter(self, frame, node):
+        if len(self.stack) >= MAX_NESTING_DEPTH:
+            raise RuntimeError("Control nodes are nested too deeply (recursive call?)")
+        
+        base = frame.base + node['time']
+        node_type = node['type']
+        blocks = frame.blocks
+        
+        if node_type == 'block':
+            self.stack.append(CursorFrame(blocks.get(node['block'], ()), base, blocks))
+        elif node_type == 'section':
+            self.stack.append(CursorFrame(node['events'], base, blocks))
+        elif node_type == 'loop':
+            count = node.get('count', 1)
+            if count == 0:
+                count = self.infinite_as
+            if count is None or count > 0:
+                span = script_duration(node['events'], blocks) + node.get('interval', 0.0)
+                self.stack.append(CursorFrame(node['events'], base, blocks, node, count, span))
+        elif node_type == 'call':
+            if self.loader is None:
+                return
+            path = node['path']
+            if path not in self.called:
+                events, called_blocks = self.loader(path)
+                self.called[path] = (events, called_blocks, script_duration(events, called_blocks))
+            events, called_blocks, duration = self.called[path]
+            self.stack.append(CursorFrame(events, base, called_blocks, node, shift_after=duration))
+    
+    def _finish_frame(self, frame):
+        if frame.remaining is not None:
+            frame.remaining -= 1
+        if frame.remaining is None or frame.remaining > 0:
+            # Next loop pass replays the same recorded times, later
+            self.shift += frame.span
+            frame.index = 0
+            return
+        
+        self.shift += frame.shift_after
+        self.stack.pop()
+
+def iter_script_events(events, blocks, loader=None):
+    """Yield (time, event) for a finite rendering of a script (forever loops run once)"""
+    return PlaybackCursor(events, blocks, loader=loader, infinite_as=1)
+
+def _block_tokens(events, coord_tolerance, time_tolerance):
+    """Tolerance-quantized tokens for matching events.
+    
+    shapes[i] describes event i alone; full[i] adds its gap to the previous
+    event, so windows compare relative timing but not the gap leading into them.
+    """
+    shapes = []
+    full = []
+    last_time = 0.0
+    for i, event in enumerate(events):
+        event_type = event['type']
+        if event_type in CONTROL_NODE_TYPES or event_type == 'wait_for':
+            shape = ('node', i)  # never matches, blocks do not nest
+        elif event_type in ('mouse_move', 'mouse_click', 'mouse_scroll'):
+            shape = (event_type, round(event['x'] / coord_tolerance), round(event['y'] / coord_tolerance),
+                     event.get('button'), event.get('pressed'), event.get('dx'), event.get('dy'))
+        elif event_type == 'delay':
+            shape = (event_type, round(event['duration'] / time_tolerance))
+        else:
+            shape = (event_type, event.get('key'), event.get('text'))
+        shapes.append(shape)
+        full.append((shape, round((event['time'] - last_time) / time_tolerance)))
+        last_time = event['time']
+    return shapes, full
+
+def _best_repeat(shapes, full, min_length):
+    """Find the repeated window that saves the most events: (saving, starts, length)"""
+    n = len(shapes)
+    windows = {}
+    for p in range(n - min_length + 1):
+        key = (shapes[p],) + tuple(full[p + 1:p + min_length])
+        windows.setdefault(key, []).append(p)
+    
+    best = None
+    for positions in windows.values():
+        if len(positions) < 2:
+            continue
+        
+        # Greedy non-overlapping occurrences
+        starts = []
+        for p in positions:
+            if not starts or p >= starts[-1] + min_length:
+                starts.append(p)
+        if len(starts) < 2:
+            continue
+        
+        # Extend while every occurrence agrees on the next event
+        first = starts[0]
+        length = min_length
+        while length < BLOCK_MAX_LENGTH:
+            token = full[first + length] if first + length < n else None
+            if token is None or token[0][0] == 'node':
+                break
+            limits = starts[1:] + [n]
+            if not all(p + length < limits[k] and full[p + length] == token
+                       for k, p in enumerate(starts)):
+                break
+            length += 1
+        
+        # Each occurrence becomes one reference; the block is stored once
+        saving = (len(starts) - 1) * length - len(starts)
+        if saving > 0 and (best is None or saving > best[0]):
+            best = (saving, starts, length)
+    return best
+
+def mine_repeated_blocks(events, blocks=None, min_length=BLOCK_MIN_LENGTH,
+                         coord_tolerance=BLOCK_COORD_TOLERANCE, time_tolerance=BLOCK_TIME_TOLERANCE,
+                         max_blocks=BLOCK_MAX_COUNT):
+    """Replace repeated event runs with references to shared blocks.
+    
+    Returns (events, blocks). Matching uses relative timing and coordinates
+    quantized to the given tolerances; every reference replays the first
+    occurrence's events.
+    """
+    events = list(events)
+    blocks = dict(blocks or {})
+    found = 0
+    
+    while found < max_blocks:
+        shapes, full = _block_tokens(events, coord_tolerance, time_tolerance)
+        best = _best_repeat(shapes, full, min_length)
+        if best is None:
+            break
+        
+        _, starts, length = best
+        name = f"B{len(blocks) + 1}"
+        while name in blocks:
+            name += "'"
+        base = events[starts[0]]['time']
+        blocks[name] = [dict(event, time=event['time'] - base)
+                        for event in events[starts[0]:starts[0] + length]]
+        
+        rewritten = []
+        previous = 0
+        for p in starts:
+            rewritten.extend(events[previous:p])
+            rewritten.append({'type': 'block', 'time': events[p]['time'], 'block': name})
+            previous = p + length
+        rewritten.extend(events[previous:])
+        events = rewritten
+        found += 1
+    
+    return events, blocks
+
+# Held-input checkpoints for seeking
+SEEK_CHECKPOINT_INTERVAL = 1024
+
+def apply_held_state(keys, buttons, event):
+    """Update the sets of held keys and mouse buttons with one event"""
+    event_type = event['type']
+    if event_type == 'key_press':
+        keys.add(event['key'])
+    elif event_type == 'key_release':
+        keys.discard(event['key'])
+    elif event_type == 'mouse_click':
+        if event['pressed']:
+            buttons.add(event['button'])
+        else:
+            buttons.discard(event['button'])
+
+class EventTimeIndex:
+    """Sorted time index over the top-level events of a snapshot.
+    
+    times holds the running maximum of event times, so it is sorted even
+    after hand edits, and bisection finds the first event at or after a time
+    in O(log n). The held keys and buttons and the pointer position are
+    checkpointed every SEEK_CHECKPOINT_INTERVAL events, so the input state at
+    any index is rebuilt from at most one interval of events. Blocks,
+    sections and loops count with their body played through once; keys held
+    across a call into another script are not tracked.
+    """
+    
+    def __init__(self, events, blocks=None):
+        self.events = events
+        self.blocks = blocks or {}
+        self.times = []
+        self.checkpoints = []
+        keys = set()
+        buttons = set()
+        position = None
+        latest = 0.0
+        for i, event in enumerate(events):
+            if i % SEEK_CHECKPOINT_INTERVAL == 0:
+                self.checkpoints.append((frozenset(keys), frozenset(buttons), position))
+            latest = max(latest, event['time'])
+            self.times.append(latest)
+            position = self.apply(keys, buttons, position, event)
+    
+    def apply(self, keys, buttons, position, event, depth=0):
+        """Apply one event to the input state; returns the pointer position after it"""
+        event_type = event['type']
+        if event_type in ('block', 'section', 'loop'):
+            if depth >= MAX_NESTING_DEPTH:
+                return position
+            body = self.blocks.get(event['block'], ()) if event_type == 'block' else event['events']
+            for inner in body:
+                position = self.apply(keys, buttons, position, inner, depth + 1)
+            return position
+        apply_held_state(keys, buttons, event)
+        if event_type in COORD_EVENT_TYPES:
+            return event['x'], event['y']
+        return position
+    
+    def index_at(self, seconds):
+        """Index of the first event at or after a recorded time"""
+        return bisect_left(self.times, seconds)
+    
+    def held_state(self, index):
+        """(keys, buttons, pointer position or None) just before the event at index"""
+        if not self.checkpoints:
+            return set(), set(), None
+        k = min(index // SEEK_CHECKPOINT_INTERVAL, len(self.checkpoints) - 1)
+        keys, buttons, position = set(self.checkpoints[k][0]), set(self.checkpoints[k][1]), self.checkpoints[k][2]
+        for event in self.events.iter_range(k * SEEK_CHECKPOINT_INTERVAL, index):
+            position = self.apply(keys, buttons, position, event)
+        return keys, buttons, position
+
+# Script filtering
+QUERY_GRID_CELL = 64  # Pixels per spatial index cell
+QUERY_DISPLAY_LIMIT = 20000  # Result rows shown in the script view
+QUERY_TYPE_ALIASES = {
+    'move': 'mouse_move', 'click': 'mouse_click', 'scroll': 'mouse_scroll',
+    'press': 'key_press', 'release': 'key_release', 'text': 'type_text', 'wait': 'wait_for',
+}
+QUERY_FIELDS = ('type', 'key', 'button', 'time', 'region')
+QUERY_HINT = "e.g. type:click region:0,0,800,600 time:10:00-12:00"
+
+def parse_query_time(text):
+    """Seconds from '90', '90.5' or 'm:ss'"""
+    minutes, _, seconds = text.rpartition(':')
+    return (int(minutes) * 60 if minutes else 0) + float(seconds)
+
+def parse_event_query(text):
+    """Parse 'field:value' terms into a query dict; raises ValueError.
+    
+    type:click,press  key:enter  button:left  time:10:00-12:00  region:x1,y1,x2,y2
+    """
+    query = {}
+    for term in text.split():
+        field, sep, value = term.partition(':')
+        field = field.lower()
+        if not sep or not value or field not in QUERY_FIELDS:
+            raise ValueError(f"Unknown filter term {term!r}; use {', '.join(f + ':...' for f in QUERY_FIELDS)}")
+        if field == 'type':
+            query['types'] = {QUERY_TYPE_ALIASES.get(name.lower(), name.lower()) for name in value.split(',')}
+        elif field == 'key':
+            query['keys'] = {name if len(name) == 1 else name.lower() for name in value.split(',')}
+        elif field == 'button':
+            query['button'] = value.lower()
+        elif field == 'time':
+            start, sep, end = value.partition('-')
+            query['time'] = (parse_query_time(start) if start else 0.0,
+                             parse_query_time(end) if sep and end else float('inf'))
+        elif field == 'region':
+            x1, y1, x2, y2 = (float(v) for v in value.split(','))
+            query['region'] = (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+    return query
+
+class EventQueryIndex:
+    """Type, time and spatial indexes over the top-level events of a snapshot.
+    
+    Columns are numpy arrays, so filters over millions of events are a few
+    vectorized passes. The type index maps each type to its sorted event
+    indices, times is the same running maximum EventTimeIndex uses (a time
+    window is one contiguous index range), and a uniform grid of
+    QUERY_GRID_CELL cells keeps the event indices ordered by cell with each
+    grid column contiguous, so a region costs one slice per column it spans.
+    """
+    
+    def __init__(self, events):
+        codes = {}
+        types, times, xs, ys, keys, buttons = [], [], [], [], [], []
+        for event in events:
+            types.append(codes.setdefault(event['type'], len(codes)))
+            times.append(event['time'])
+            xs.append(event.get('x', np.nan))
+            ys.append(event.get('y', np.nan))
+            keys.append(event.get('key'))
+            buttons.append(event.get('button'))
+        self.size = len(types)
+        self.times = np.maximum.accumulate(np.asarray(times, dtype=float)) if times else np.empty(0)
+        self.x = np.asarray(xs, dtype=float)
+        self.y = np.asarray(ys, dtype=float)
+        self.type_codes = np.asarray(types, dtype=np.int16)
+        self.codes = codes
+        self.by_type = {name: np.flatnonzero(self.type_codes == code) for name, code in codes.items()}
+        self.keys = np.asarray(keys, dtype=object)
+        self.buttons = np.asarray(buttons, dtype=object)
+        
+        # Spatial grid: cell id = column * rows + row, indices ordered by cell
+        located = np.flatnonzero(~(np.isnan(self.x) | np.isnan(self.y)))
+        self.origin = (0.0, 0.0)
+        self.grid_rows = 1
+        self.cell_order = located
+        self.cell_ids = np.zeros(len(located), dtype=np.int64)
+        if len(located):
+            self.origin = (self.x[located].min(), self.y[located].min())
+            columns = ((self.x[located] - self.origin[0]) // QUERY_GRID_CELL).astype(np.int64)
+            rows = ((self.y[located] - self.origin[1]) // QUERY_GRID_CELL).astype(np.int64)
+            self.grid_rows = int(rows.max()) + 1
+            cell_ids = columns * self.grid_rows + rows
+            order = np.argsort(cell_ids, kind='stable')
+            self.cell_order = located[order]
+            self.cell_ids = cell_ids[order]
+    
+    def in_region(self, x1, y1, x2, y2):
+        """Sorted indices of events whose point lies in the rectangle"""
+        if not len(self.cell_ids):
+            return np.empty(0, dtype=np.int64)
+        last_column = int(self.cell_ids[-1] // self.grid_rows)
+        c1 = max(int((x1 - self.origin[0]) // QUERY_GRID_CELL), 0)
+        c2 = min(int((x2 - self.origin[0]) // QUERY_GRID_CELL), last_column)
+        r1 = max(int((y1 - self.origin[1]) // QUERY_GRID_CELL), 0)
+        r2 = min(int((y2 - self.origin[1]) // QUERY_GRID_CELL), self.grid_rows - 1)
+        if c1 > c2 or r1 > r2:
+            return np.empty(0, dtype=np.int64)
+        starts = np.searchsorted(self.cell_ids, np.arange(c1, c2 + 1) * self.grid_rows + r1, 'left')
+        ends = np.searchsorted(self.cell_ids, np.arange(c1, c2 + 1) * self.grid_rows + r2, 'right')
+        candidates = np.concatenate([self.cell_order[s:e] for s, e in zip(starts, ends)])
+        inside = ((self.x[candidates] >= x1) & (self.x[candidates] <= x2)
+                  & (self.y[candidates] >= y1) & (self.y[candidates] <= y2))
+        return np.sort(candidates[inside])
+    
+    def query(self, query):
+        """Sorted top-level indices of the events matching a parse_event_query dict"""
+        start, stop = 0, self.size
+        if 'time' in query:
+            start = int(np.searchsorted(self.times, query['time'][0], 'left'))
+            stop = int(np.searchsorted(self.times, query['time'][1], 'right'))
+        types = query.get('types')
+        if types is None and 'keys' in query:
+            types = {'key_press', 'key_release'}
+        elif types is None and 'button' in query:
+            types = {'mouse_click'}
+        
+        # Start from the narrowest index, then filter the candidates
+        if 'region' in query:
+            result = self.in_region(*query['region'])
+            result = result[(result >= start) & (result < stop)]
+        elif types is not None:
+            parts = [self.by_type[name] for name in types if name in self.by_type]
+            result = np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+            result = result[np.searchsorted(result, start):np.searchsorted(result, stop)]
+        else:
+            result = np.arange(start, stop)
+        
+        if types is not None and 'region' in query:
+            codes = [self.codes[name] for name in types if name in self.codes]
+            result = result[np.isin(self.type_codes[result], codes)]
+        if 'keys' in query:
+            wanted = query['keys']
+            result = result[np.fromiter((key is not None and (key if len(key) == 1 else key.lower()) in wanted
+                                         for key in self.keys[result]), dtype=bool, count=len(result))]
+        if 'button' in query:
+            result = result[self.buttons[result] == query['button']]
+        return result
+
+# Path view: a min/max LOD pyramid over the pointer trajectory
+PATH_EVENT_TYPES = ('mouse_move', 'mouse_click', 'mouse_scroll')
+PATH_LOD_BUCKET = 16  # points per bucket at the first level
+PATH_LOD_FACTOR = 4  # buckets merged into one at each level above
+PATH_HEAT_CELL = 32  # heatmap cell in screen pixels
+PATH_MARKER_LIMIT = 2000  # click markers drawn at most
+PATH_BUILD_BATCH = 50000  # events added per UI step while a script is indexed
+PATH_MAX_DETAIL = 8  # zooming in adds buckets up to this many per canvas pixel
+
+class PathPyramid:
+    """Pointer trajectory, click markers and heatmap, built incrementally for the Path tab.
+    
+    Points are appended in playback order to growable numpy columns, with
+    times kept as a running maximum so a time range is one index range.
+    Level k of the pyramid has a row per PATH_LOD_BUCKET * PATH_LOD_FACTOR**k
+    points holding the indices of the bucket's first and last points and of
+    its x and y extremes; a polyline through those keeps the path's outline.
+    A row is added as soon as its bucket fills, and decimate() starts at the
+    level that gives about the requested number of buckets, so any time range
+    is drawn from a screen width of points however long the script is.
+    """
+    
+    def __init__(self):
+        self.size = 0
+        self.times = np.empty(1024)
+        self.x = np.empty(1024)
+        self.y = np.empty(1024)
+        self.levels = []  # (rows, 6) index arrays with spare capacity
+        self.level_rows = []
+        self.click_times = []  # presses, times as a running maximum
+        self.clicks = []  # (x, y, button) per press
+        self.heat = {}  # (column, row) -> points in the cell
+        self.bounds = None  # (min x, min y, max x, max y)
+    
+    def feed(self, timed_events):
+        """Add the pointer events among (time, event) pairs"""
+        times, xs, ys = [], [], []
+        last_click = self.click_times[-1] if self.click_times else -np.inf
+        for event_time, event in timed_events:
+            if event['type'] in PATH_EVENT_TYPES:
+                times.append(event_time)
+                xs.append(event['x'])
+                ys.append(event['y'])
+                if event['type'] == 'mouse_click' and event['pressed']:
+                    last_click = max(last_click, event_time)
+                    self.click_times.append(last_click)
+                    self.clicks.append((event['x'], event['y'], event['button']))
+        if times:
+            self.add_points(np.asarray(times, dtype=float), np.asarray(xs, dtype=float),
+                            np.asarray(ys, dtype=float))
+    
+    def add_points(self, times, xs, ys):
+        """Append points and extend the heatmap and every level they complete"""
+        start, stop = self.size, self.size + len(times)
+        if stop > len(self.times):
+            capacity = max(stop, 2 * len(self.times))
+            for name in ('times', 'x', 'y'):
+                column = np.empty(capacity)
+                column[:start] = getattr(self, name)[:start]
+                setattr(self, name, column)
+        if start:
+            times = np.maximum(times, self.times[start - 1])
+        self.times[start:stop] = np.maximum.accumulate(times)
+        self.x[start:stop] = xs
+        self.y[start:stop] = ys
+        self.size = stop
+        
+        low = (xs.min(), ys.min())
+        high = (xs.max(), ys.max())
+        if self.bounds is not None:
+            low = (min(low[0], self.bounds[0]), min(low[1], self.bounds[1]))
+            high = (max(high[0], self.bounds[2]), max(high[1], self.bounds[3]))
+        self.bounds = (*low, *high)
+        
+        cells = np.stack([xs // PATH_HEAT_CELL, ys // PATH_HEAT_CELL], axis=1).astype(np.int64)
+        cells, counts = np.unique(cells, axis=0, return_counts=True)
+        for (column, row), count in zip(cells.tolist(), counts.tolist()):
+            self.heat[column, row] = self.heat.get((column, row), 0) + count
+        
+        self.extend_levels()
+    
+    def extend_levels(self):
+        """Add a row to each level for every bucket that has filled"""
+        for level in itertools.count():
+            if level == len(self.levels):
+                if self.size < PATH_LOD_BUCKET * PATH_LOD_FACTOR ** level:
+                    return
+                self.levels.append(np.empty((64, 6), dtype=np.int64))
+                self.level_rows.append(0)
+            
+            rows = self.level_rows[level]
+            if level == 0:
+                complete = self.size // PATH_LOD_BUCKET
+                candidates = np.arange(rows * PATH_LOD_BUCKET, complete * PATH_LOD_BUCKET)
+            else:
+                complete = self.level_rows[level - 1] // PATH_LOD_FACTOR
+                candidates = self.levels[level - 1][rows * PATH_LOD_FACTOR:complete * PATH_LOD_FACTOR]
+            if complete == rows:
+                return  # nothing above can have filled either
+            
+            candidates = candidates.reshape(complete - rows, -1)
+            xs, ys = self.x[candidates], self.y[candidates]
+            extremes = [xs.argmin(axis=1), xs.argmax(axis=1), ys.argmin(axis=1), ys.argmax(axis=1)]
+            picked = np.take_along_axis(candidates, np.stack(extremes, axis=1), axis=1)
+            entries = np.column_stack([candidates.min(axis=1), candidates.max(axis=1), picked])
+            
+            table = self.levels[level]
+            if complete > len(table):
+                table = np.resize(table, (max(complete, 2 * len(table)), 6))
+                self.levels[level] = table
+            table[rows:complete] = entries
+            self.level_rows[level] = complete
+    
+    def span(self, start_time, end_time):
+        """Index range of the points between two times"""
+        times = self.times[:self.size]
+        return (int(np.searchsorted(times, start_time, 'left')),
+                int(np.searchsorted(times, end_time, 'right')))
+    
+    def decimate(self, start, stop, buckets):
+        """Sorted indices of a min/max decimation of points start..stop-1 into about `buckets` buckets"""
+        if stop - start <= 6 * buckets or not self.levels:
+            return np.arange(start, stop)
+        
+        level = 0
+        while (level + 1 < len(self.levels)
+               and (stop - start) / (PATH_LOD_BUCKET * PATH_LOD_FACTOR ** level) > buckets):
+            level += 1
+        
+        parts = [np.array([start, stop - 1])]
+        self._cover(start, stop, level, parts)
+        return np.unique(np.concatenate(parts))
+    
+    def _cover(self, start, stop, level, parts):
+        """Rows of the buckets of a level that lie inside start..stop-1; the ragged ends go a level down"""
+        size = PATH_LOD_BUCKET * PATH_LOD_FACTOR ** level
+        first, last = -(-start // size), min(stop // size, self.level_rows[level])
+        if first < last:
+            parts.append(self.levels[level][first:last].ravel())
+            ends = [(start, first * size), (last * size, stop)]
+        else:
+            ends = [(start, stop)]
+        for end_start, end_stop in ends:
+            if end_start >= end_stop:
+                continue
+            if level == 0:
+                parts.append(np.arange(end_start, end_stop))
+            else:
+                self._cover(end_start, end_stop, level - 1, parts)
+    
+    def clicks_between(self, start_time, end_time):
+        """(time, x, y, button) of the presses between two times"""
+        first = bisect_left(self.click_times, start_time)
+        last = bisect_right(self.click_times, end_time)
+        return [(self.click_times[i], *self.clicks[i]) for i in range(first, last)]
+
+# Events that carry screen coordinates
+COORD_EVENT_TYPES = ('mouse_move', 'mouse_click', 'mouse_scroll', 'wait_for')
+
+# Bulk edits: operation -> (dialog label, default value)
+BULK_EDIT_OPERATIONS = {
+    'scale_time': ("Scale time by factor", "1.0"),
+    'shift_time': ("Shift time by seconds", "0.0"),
+    'translate': ("Move by dx, dy pixels", "0, 0"),
+    'scale_xy': ("Scale coordinates by sx, sy", "1.0, 1.0"),
+    'set_button': ("Set click button", "left"),
+    'remove_types': ("Remove events of types", "move"),
+}
+
+def bulk_edit_events(events, indices, operation, value):
+    """Compute a bulk edit of the top-level events at sorted indices.
+    
+    Returns (replacements {index: event}, deletions). Columns are edited as
+    numpy arrays and written back as new event dicts. Time edits retime the
+    span from the first to the last target and shift everything after it,
+    so the script stays in order.
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    if not len(indices):
+        return {}, []
+    
+    if operation in ('scale_time', 'shift_time'):
+        first, last = int(indices[0]), int(indices[-1])
+        times = np.fromiter((event['time'] for event in events.iter_range(first, len(events))),
+                            dtype=float, count=len(events) - first)
+        base = times[0]
+        if operation == 'scale_time':
+            if value <= 0:
+                raise ValueError("Time factor must be positive")
+            span = times[last - first] - base
+            new_times = base + (times - base) * value
+            new_times[last - first + 1:] = times[last - first + 1:] + span * (value - 1)
+        else:
+            # Never move the span before the event that precedes it
+            floor = events[first - 1]['time'] if first else 0.0
+            new_times = times + max(value, floor - base)
+        new_times = np.maximum(new_times, 0.0)
+        changed = (new_times != times).tolist()
+        return {first + j: dict(event, time=t)
+                for j, (event, t, change) in enumerate(zip(events.iter_range(first, len(events)),
+                                                           new_times.tolist(), changed)) if change}, []
+    
+    span = list(events.iter_range(int(indices[0]), int(indices[-1]) + 1))
+    targets = [span[i] for i in (indices - indices[0]).tolist()]
+    indices = indices.tolist()
+    if operation == 'remove_types':
+        types = {QUERY_TYPE_ALIASES.get(name, name) for name in value}
+        return {}, [i for i, event in zip(indices, targets) if event['type'] in types]
+    if operation == 'set_button':
+        return {i: dict(event, button=value) for i, event in zip(indices, targets)
+                if event['type'] == 'mouse_click' and event['button'] != value}, []
+    
+    located = [j for j, event in enumerate(targets) if event['type'] in COORD_EVENT_TYPES]
+    if not located:
+        return {}, []
+    xs = np.fromiter((targets[j]['x'] for j in located), dtype=float, count=len(located))
+    ys = np.fromiter((targets[j]['y'] for j in located), dtype=float, count=len(located))
+    if operation == 'translate':
+        xs, ys = xs + value[0], ys + value[1]
+    elif operation == 'scale_xy':
+        xs, ys = xs * value[0], ys * value[1]
+    else:
+        raise ValueError(f"Unknown bulk edit {operation!r}")
+    xs = np.rint(xs).astype(int).tolist()
+    ys = np.rint(ys).astype(int).tolist()
+    return {indices[j]: dict(targets[j], x=x, y=y) for j, x, y in zip(located, xs, ys)}, []
+
+# Coordinate remapping
+REMAP_CACHE_SIZE = 4
+
+class CoordinateTransform:
+    """Maps recorded screen coordinates onto the playback display.
+    
+    Either a per-axis scale and offset, or - when anchors are given - a
+    piecewise-linear map between anchor points, per axis, extrapolated from
+    the outermost segments. apply() works on whole coordinate columns.
+    """
+    
+    def __init__(self, scale_x=1.0, scale_y=1.0, offset_x=0.0, offset_y=0.0, anchors=None):
+        self.scale_x = scale_x
+        self.scale_y = scale_y
+        self.offset_x = offset_x
+        self.offset_y = offset_y
+        self.anchors = tuple(anchors) if anchors else ()
+    
+    @classmethod
+    def for_displays(cls, source, target):
+        """Scale a (width, height) source display onto a target display"""
+        return cls(scale_x=target[0] / source[0], scale_y=target[1] / source[1])
+    
+    def is_identity(self):
+        return (not self.anchors and self.scale_x == 1.0 and self.scale_y == 1.0
+                and self.offset_x == 0.0 and self.offset_y == 0.0)
+    
+    def key(self):
+        return (self.scale_x, self.scale_y, self.offset_x, self.offset_y, self.anchors)
+    
+    @staticmethod
+    def _piecewise(values, source, target):
+        source, first = np.unique(np.asarray(source, dtype=float), return_index=True)
+        target = np.asarray(target, dtype=float)[first]
+        if len(source) == 1:
+            return values + (target[0] - source[0])
+        
+        mapped = np.interp(values, source, target)
+        below = values < source[0]
+        mapped[below] = target[0] + (values[below] - source[0]) * (target[1] - target[0]) / (source[1] - source[0])
+        above = values > source[-1]
+        mapped[above] = target[-1] + (values[above] - source[-1]) * (target[-1] - target[-2]) / (source[-1] - source[-2])
+        return mapped
+    
+    def apply(self, xs, ys):
+        """Map coordinate arrays, returning integer pixel arrays"""
+        xs = np.asarray(xs, dtype=float)
+        ys = np.asarray(ys, dtype=float)
+        if self.anchors:
+            xs = self._piecewise(xs, [a[0] for a in self.anchors], [a[2] for a in self.anchors])
+            ys = self._piecewise(ys, [a[1] for a in self.anchors], [a[3] for a in self.anchors])
+        else:
+            xs = xs * self.scale_x + self.offset_x
+            ys = ys * self.scale_y + self.offset_y
+        return np.rint(xs).astype(np.int64), np.rint(ys).astype(np.int64)
+
+def _collect_coordinates(events, xs, ys):
+    for event in events:
+        if event['type'] in COORD_EVENT_TYPES:
+            xs.append(event['x'])
+            ys.append(event['y'])
+        elif 'events' in event:
+            _collect_coordinates(event['events'], xs, ys)
+
+def _replace_coordinates(events, coordinates):
+    remapped = []
+    for event in events:
+        if event['type'] in COORD_EVENT_TYPES:
+            x, y = next(coordinates)
+            remapped.append(dict(event, x=x, y=y))
+        elif 'events' in event:
+            remapped.append(dict(event, events=_replace_coordinates(event['events'], coordinates)))
+        else:
+            remapped.append(event)
+    return remapped
+
+def remap_script(events, blocks, transform):
+    """Return (events, blocks) with every coordinate mapped by transform.
+    
+    All x/y values - top level, node bodies and blocks - are gathered into two
+    columns and transformed in one vectorized pass.
+    """
+    xs = []
+    ys = []
+    _collect_coordinates(events, xs, ys)
+    for name in blocks:
+        _collect_coordinates(blocks[name], xs, ys)
+    if not xs:
+        return events, blocks
+    
+    new_xs, new_ys = transform.apply(xs, ys)
+    coordinates = zip(new_xs.tolist(), new_ys.tolist())
+    remapped_events = _replace_coordinates(events, coordinates)
+    remapped_blocks = {name: _replace_coordinates(blocks[name], coordinates) for name in blocks}
+    return remapped_events, remapped_blocks
+
+# Mouse smoothing
+SMOOTHING_CURVES = ('linear', 'bezier', 'catmull_rom')
+SMOOTHING_MAX_GAP = 0.25  # longer gaps are pauses, not motion
+SMOOTHING_MAX_STEPS = 32  # per gap
+POINTER_EVENT_TYPES = ('mouse_move', 'mouse_click')
+
+def smoothing_points(times, xs, ys, pairs, curve, rate, speed, max_gap):
+    """Interpolated points for moves from pointer i to i+1, for every i in pairs.
+    
+    times, xs and ys are the columns of a run of pointer events. Each gap
+    gets floor(gap at speed * rate) - 1 points, evenly spaced strictly
+    inside it. Returns (points per pair, offset of each point from its move, x, y).
+    """
+    gaps = times[pairs + 1] - times[pairs]
+    steps = np.clip(np.floor(gaps / speed * rate).astype(np.int64) - 1, 0, SMOOTHING_MAX_STEPS)
+    steps[(gaps <= 0) | (gaps > max_gap)] = 0
+    owner = np.repeat(np.arange(len(pairs)), steps)
+    k = np.arange(len(owner)) - np.repeat(np.cumsum(steps) - steps, steps) + 1
+    u = k / (steps[owner] + 1)
+    
+    i = pairs[owner]
+    last = len(times) - 1
+    p0 = np.stack([xs[np.maximum(i - 1, 0)], ys[np.maximum(i - 1, 0)]], axis=1)
+    p1 = np.stack([xs[i], ys[i]], axis=1)
+    p2 = np.stack([xs[i + 1], ys[i + 1]], axis=1)
+    p3 = np.stack([xs[np.minimum(i + 2, last)], ys[np.minimum(i + 2, last)]], axis=1)
+    u = u[:, None]
+    if curve == 'bezier':
+        # Quadratic, leaving p1 along the incoming direction
+        control = p1 + (p1 - p0) * 0.5
+        points = (1 - u) ** 2 * p1 + 2 * u * (1 - u) * control + u ** 2 * p2
+    elif curve == 'catmull_rom':
+        points = 0.5 * (2 * p1 + (p2 - p0) * u + (2 * p0 - 5 * p1 + 4 * p2 - p3) * u ** 2
+                        + (3 * p1 - p0 - 3 * p2 + p3) * u ** 3)
+    else:
+        points = p1 + (p2 - p1) * u
+    points = np.rint(points).astype(np.int64)
+    return steps, u[:, 0] * gaps[owner], points[:, 0], points[:, 1]
+
+def _smooth_list(events, options):
+    smoothed = [dict(event, events=_smooth_list(event['events'], options)) if 'events' in event else event
+                for event in events]
+    pointer = [j for j, event in enumerate(smoothed) if event['type'] in POINTER_EVENT_TYPES]
+    if len(pointer) < 2:
+        return smoothed
+    
+    positions = np.asarray(pointer)
+    times = np.fromiter((smoothed[j]['time'] for j in pointer), dtype=float, count=len(pointer))
+    xs = np.fromiter((smoothed[j]['x'] for j in pointer), dtype=float, count=len(pointer))
+    ys = np.fromiter((smoothed[j]['y'] for j in pointer), dtype=float, count=len(pointer))
+    # A move followed directly by another pointer event in the same list
+    pairs = np.flatnonzero((positions[1:] - positions[:-1] == 1)
+                           & np.fromiter((smoothed[j]['type'] == 'mouse_move' for j in pointer[:-1]),
+                                         dtype=bool, count=len(pointer) - 1))
+    if not len(pairs):
+        return smoothed
+    
+    steps, offsets, px, py = smoothing_points(times, xs, ys, pairs, **options)
+    ends = np.cumsum(steps).tolist()
+    path = list(zip(offsets.tolist(), px.tolist(), py.tolist()))
+    start = 0
+    for pair, end in zip(pairs.tolist(), ends):
+        if end > start:
+            j = pointer[pair]
+            smoothed[j] = dict(smoothed[j], path=path[start:end])
+        start = end
+    return smoothed
+
+def smooth_script(events, blocks, curve='catmull_rom', rate=60.0, speed=1.0, max_gap=SMOOTHING_MAX_GAP):
+    """Return (events, blocks) with a 'path' of timed in-between points on mouse moves.
+    
+    Points are (offset, x, y), with offsets inside the gap to the next pointer
+    event, so playing them fills idle time instead of adding to it.
+    """
+    options = {'curve': curve, 'rate': rate, 'speed': speed if speed > 0 else 1.0, 'max_gap': max_gap}
+    return (_smooth_list(events, options),
+            {name: _smooth_list(body, options) for name, body in blocks.items()})
+
+def smoothing_options(settings):
+    """smooth_script arguments (curve, rate, speed, max gap) for playback settings"""
+    # Split gaps must stay on the same side of the idle threshold as the whole gap
+    max_gap = min(SMOOTHING_MAX_GAP, settings.get('idle_gap_threshold', 1.0))
+    return (settings.get('smoothing_curve', 'catmull_rom'), settings.get('smoothing_rate', 60.0),
+            settings.get('playback_speed', 1.0), max_gap)
+
+def with_smoothing_points(timed_events):
+    """Yield (time, event) pairs followed by each move's interpolated points"""
+    for event_time, event in timed_events:
+        yield event_time, event
+        for offset, x, y in event.get('path', ()):
+            yield event_time + offset, {'type': 'mouse_move', 'x': x, 'y': y, 'interpolated': True}
+
+# Script optimization
+@traced('optimize_script')
+def optimize_events(events):
+    """Merge bursts of mouse moves less than 20ms apart into their last position"""
+    optimized = []
+    last_mouse_move = None
+    merged_move = None
+    
+    for event in events:
+        # Skip redundant mouse moves
+        if event['type'] == 'mouse_move':
+            if last_mouse_move and event['time'] - last_mouse_move['time'] < 0.02:
+                # Update the last mouse move (on a copy - the original belongs to the undo history)
+                if last_mouse_move is not merged_move:
+                    merged_move = copy.copy(last_mouse_move)
+                    optimized[-1] = merged_move
+                    last_mouse_move = merged_move
+                last_mouse_move['x'] = event['x']
+                last_mouse_move['y'] = event['y']
+                last_mouse_move['time'] = event['time']
+            else:
+                optimized.append(event)
+                last_mouse_move = event
+        else:
+            optimized.append(event)
+            last_mouse_move = None
+    return optimized
+
+# Typed-text coalescing
+TYPING_MIN_CHARS = 3
+TYPING_BATCH_TICK = 0.01
+TYPING_TRANSPARENT_KEYS = {'shift', 'shift_l', 'shift_r'}  # already reflected in the recorded chars
+TYPING_NAMED_CHARS = {'space': ' '}
+
+def _typed_char(event):
+    """Character a key event types, or None if it is not plain typing"""
+    key = event.get('key')
+    if not key:
+        return None
+    if len(key) == 1:
+        return key if key.isprintable() else None
+    return TYPING_NAMED_CHARS.get(key)
+
+def coalesce_typing(events, min_chars=TYPING_MIN_CHARS):
+    """Merge runs of plain typing into 'type_text' events.
+    
+    A run is a sequence of press/release pairs of printable keys (shift
+    presses are dropped - the recorded chars already carry the case) with no
+    other modifier held. Each run of at least min_chars characters becomes a
+    single event holding the text and every key press's offset from the first,
+    so playback can keep the original cadence. A shift is only dropped when
+    both its press and its release fall inside the run; otherwise it is kept
+    and the run is split around it, so the key is never left held.
+    """
+    coalesced = []
+    run = []
+    held_modifiers = set()
+    
+    def emit(part):
+        chars = []
+        offsets = []
+        pressed = 0
+        for event in part:
+            char = _typed_char(event)
+            if char is None:
+                continue  # shift, pressed and released within the run
+            if event['type'] == 'key_press':
+                if not chars:
+                    start = event['time']
+                chars.append(char)
+                offsets.append(event['time'] - start)
+                pressed += 1
+            else:
+                pressed -= 1
+        
+        if len(chars) >= min_chars and pressed == 0:
+            coalesced.append({'type': 'type_text', 'time': start, 'text': ''.join(chars), 'offsets': offsets})
+        else:
+            coalesced.extend(part)
+    
+    def flush():
+        # Shift events whose press and release are both in the run can go
+        paired = set()
+        open_presses = {}
+        for i, event in enumerate(run):
+            if _typed_char(event) is not None:
+                continue
+            if event['type'] == 'key_press':
+                open_presses.setdefault(event['key'], []).append(i)
+            elif event['key'] in open_presses:
+                paired.update(open_presses.pop(event['key']))
+                paired.add(i)
+        
+        part = []
+        for i, event in enumerate(run):
+            if _typed_char(event) is None and i not in paired:
+                emit(part)
+                coalesced.append(event)
+                part = []
+            else:
+                part.append(event)
+        emit(part)
+        run.clear()
+    
+    for event in events:
+        event_type = event['type']
+        is_key = event_type in ('key_press', 'key_release')
+        if is_key and not held_modifiers and (
+                _typed_char(event) is not None or event['key'] in TYPING_TRANSPARENT_KEYS):
+            if run or (event_type == 'key_press' and _typed_char(event) is not None):
+                run.append(event)
+                continue
+        
+        if run:
+            flush()
+        if is_key and event['key'] not in TYPING_TRANSPARENT_KEYS and _typed_char(event) is None:
+            if event_type == 'key_press':
+                held_modifiers.add(event['key'])
+            else:
+                held_modifiers.discard(event['key'])
+        coalesced.append(event)
+    
+    if run:
+        flush()
+    return coalesced
+
+class PlaybackTimeline:
+    """Maps recorded event times to playback times.
+    
+    Gaps up to idle_threshold seconds are active and play at speed. Longer gaps
+    are idle and play at idle_speed. Any gap, active or idle, is then clamped
+    to max_gap (0 = no cap), so the cap holds even when it is below the
+    threshold.
+    """
+    
+    def __init__(self, speed=1.0, idle_speed=0.0, idle_threshold=1.0, max_gap=0.0):
+        self.speed = speed if speed > 0 else 1.0
+        self.idle_speed = idle_speed if idle_speed > 0 else self.speed
+        self.idle_threshold = idle_threshold
+        self.max_gap = max_gap
+        self.reset()
+    
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(speed=settings.get('playback_speed', 1.0),
+                   idle_speed=settings.get('idle_speed', 0.0),
+                   idle_threshold=settings.get('idle_gap_threshold', 1.0),
+                   max_gap=settings.get('max_idle_gap', 0.0))
+    
+    def reset(self, start_time=0.0):
+        """Start a new pass over the script at a recorded time"""
+        self.last_time = start_time
+        self.playback_time = 0.0
+        self.idle_gaps = 0
+        self.clamped_gaps = 0
+    
+    def gap_duration(self, gap):
+        """Playback duration of a recorded gap"""
+        if gap <= 0:
+            return 0.0
+        if gap <= self.idle_threshold:
+            duration = gap / self.speed
+        else:
+            self.idle_gaps += 1
+            duration = gap / self.idle_speed
+        if self.max_gap > 0 and duration > self.max_gap:
+            self.clamped_gaps += 1
+            duration = self.max_gap
+        return duration
+    
+    def advance(self, event_time):
+        """Return the playback time (seconds from pass start) of the next event"""
+        self.playback_time += self.gap_duration(event_time - self.last_time)
+        self.last_time = event_time
+        return self.playback_time
+
+def make_script_loader(script_file):
+    """Loader for call nodes; relative paths resolve against the calling script"""
+    base_dir = os.path.dirname(script_file) if script_file else os.getcwd()
+    
+    def load(path):
+        if not os.path.isabs(path):
+            path = os.path.join(base_dir, path)
+        data = read_script_file(path)
+        return data['events'], data['blocks']
+    
+    return load
+
+def get_pixel_color(x, y):
+    """Read the screen color at (x, y) as (r, g, b)"""
+    user32 = ctypes.windll.user32
+    hdc = user32.GetDC(0)
+    try:
+        color = ctypes.windll.gdi32.GetPixel(hdc, int(x), int(y))
+    finally:
+        user32.ReleaseDC(0, hdc)
+    return color & 0xFF, (color >> 8) & 0xFF, (color >> 16) & 0xFF
+
+# Playback settings saved with a script, and their defaults
+PLAYBACK_DEFAULTS = {
+    'playback_speed': 1.0,
+    'repeat_count': 1,
+    'repeat_interval': 0,
+    'mouse_smoothing': False,
+    'smoothing_curve': 'catmull_rom',
+    'smoothing_rate': 60.0,
+    'use_high_precision': False,
+    'force_position': True,
+    'max_idle_gap': 0.0,
+    'idle_gap_threshold': 1.0,
+    'idle_speed': 0.0,
+    'fast_mode': False,
+    'typing_rate': 0.0,
+    'remap_mode': 'scale',
+    'remap_anchors': '',
+    'calibrated_settle': False,
+    'separate_process': False
+}
+
+def validate_playback_settings(settings):
+    """Check untrusted settings against the PLAYBACK_DEFAULTS types; returns a coerced copy or raises ValueError"""
+    if not isinstance(settings, dict):
+        raise ValueError("settings must be an object")
+    checked = {}
+    for name, value in settings.items():
+        if name not in PLAYBACK_DEFAULTS:
+            raise ValueError(f"unknown setting {name!r}")
+        kind = type(PLAYBACK_DEFAULTS[name])
+        if kind is float and isinstance(value, int) and not isinstance(value, bool):
+            value = float(value)
+        if type(value) is not kind:
+            raise ValueError(f"{name} must be {kind.__name__}, not {type(value).__name__}")
+        if kind in (int, float) and not 0 <= value < float('inf'):
+            raise ValueError(f"{name} must be a non-negative number")
+        checked[name] = value
+    return checked
+
+# Settle delays in execute_event_safe: the fixed defaults, and how calibration derives them
+SETTLE_DEFAULTS = {'click_move': 0.03, 'click_verify': 0.01, 'click_after': 0.01, 'scroll': 0.02,
+                   'position_retry': 0.005}
+SETTLE_RULES = {  # action -> (minimum seconds, multiple of the measured p95 round trip)
+    'click_move': (0.004, 8.0),
+    'click_verify': (0.001, 2.0),
+    'click_after': (0.002, 3.0),
+    'scroll': (0.003, 6.0),
+    'position_retry': (0.001, 2.0)
+}
+SETTLE_CALIBRATION_SAMPLES = 40
+SETTLE_ADJUST_WINDOW = 200  # forced positions between online adjustments
+SETTLE_RETRY_LIMIT = 0.02  # retry rate above which settles grow
+SETTLE_GROWTH = 1.25
+SETTLE_MAX_FACTOR = 4.0
+SETTLE_PROFILE_FILE = os.path.join(APP_DATA_DIR, 'settle.json')
+
+class SettleProfile:
+    """Settle delays for this machine: calibrated from the input backend, tuned from retries.
+    
+    The delays are the calibrated base times a factor that grows when forced
+    positioning needs retries and decays back towards 1 while it doesn't.
+    """
+    
+    def __init__(self, base=None, factor=1.0, calibration=None):
+        self.base = dict(SETTLE_DEFAULTS, **(base or {}))
+        self.factor = factor
+        self.calibration = calibration  # round trip stats of the last calibration
+        self.positions = 0
+        self.retries = 0
+        self.changed = False
+    
+    @classmethod
+    def load(cls, filename=SETTLE_PROFILE_FILE):
+        try:
+            with open(filename, 'r') as f:
+                data = json.load(f)[platform.node()]
+        except (OSError, ValueError, KeyError):
+            return cls()
+        return cls(data.get('delays'), data.get('factor', 1.0), data.get('calibration'))
+    
+    def save(self, filename=SETTLE_PROFILE_FILE):
+        """Store this machine's profile next to those of other machines sharing the file"""
+        try:
+            with open(filename, 'r') as f:
+                profiles = json.load(f)
+        except (OSError, ValueError):
+            profiles = {}
+        profiles[platform.node()] = {'delays': self.base, 'factor': self.factor, 'calibration': self.calibration}
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        temp_file = filename + '.tmp'
+        with open(temp_file, 'w') as f:
+            json.dump(profiles, f, indent=2)
+        os.replace(temp_file, filename)
+        self.changed = False
+    
+    def delay(self, action):
+        return self.base[action] * self.factor
+    
+    def calibrate(self, mouse_controller, samples=SETTLE_CALIBRATION_SAMPLES):
+        """Measure the set-then-read round trip and derive each settle from it"""
+        origin = mouse_controller.position
+        round_trips = []
+        injections = []
+        for i in range(samples):
+            target = (max(0, origin[0] + (5 if i % 2 else -5)), max(0, origin[1] + (5 if i % 4 < 2 else -5)))
+            start = time.perf_counter()
+            mouse_controller.position = target
+            injected = time.perf_counter()
+            # Spin on reads - the time until the new position is visible is what we measure
+            while tuple(mouse_controller.position) != target:
+                if time.perf_counter() - start > SETTLE_DEFAULTS['click_move']:
+                    break
+            round_trips.append(time.perf_counter() - start)
+            injections.append(injected - start)
+        mouse_controller.position = origin
+        
+        round_trips.sort()
+        p95 = round_trips[min(len(round_trips) - 1, int(len(round_trips) * 0.95))]
+        self.base = {action: max(minimum, p95 * multiple) for action, (minimum, multiple) in SETTLE_RULES.items()}
+        self.factor = 1.0
+        self.calibration = {
+            'when': datetime.now().isoformat(),
+            'round_trip_p50_ms': round_trips[len(round_trips) // 2] * 1000,
+            'round_trip_p95_ms': p95 * 1000,
+            'injection_ms': sum(injections) / len(injections) * 1000
+        }
+        self.changed = True
+    
+    def record_position(self, attempts):
+        """Online tuning from forced-position verify results"""
+        self.positions += 1
+        if attempts > 1:
+            self.retries += 1
+        if self.positions < SETTLE_ADJUST_WINDOW:
+            return
+        
+        rate = self.retries / self.positions
+        factor = self.factor
+        if rate > SETTLE_RETRY_LIMIT:
+            factor = min(SETTLE_MAX_FACTOR, factor * SETTLE_GROWTH)
+        elif self.retries == 0:
+            factor = max(1.0, factor / SETTLE_GROWTH ** 0.25)
+        if factor != self.factor:
+            self.factor = factor
+            self.changed = True
+        self.positions = self.retries = 0
+    
+    def describe(self):
+        delays = ", ".join(f"{action} {self.delay(action) * 1000:.1f}ms" for action in SETTLE_DEFAULTS)
+        if not self.calibration:
+            return f"Not calibrated - {delays}"
+        return f"{delays} (round trip p95 {self.calibration['round_trip_p95_ms']:.2f}ms, x{self.factor:.2f})"
+
+class SystemClock:
+    """Wall clock used for real playback"""
+    
+    def now(self):
+        return time.time()
+    
+    def sleep(self, seconds):
+        time.sleep(seconds)
+    
+    def wait(self, waitable, timeout=None):
+        """Wait on an Event or Condition; True if it was set/notified"""
+        return waitable.wait(timeout)
+
+class VirtualClock:
+    """Clock that only moves when something sleeps on it - for dry runs and deterministic tests"""
+    
+    def __init__(self, start=0.0):
+        self.time = start
+    
+    def now(self):
+        return self.time
+    
+    def sleep(self, seconds):
+        if seconds > 0:
+            self.time += seconds
+    
+    def wait(self, waitable, timeout=None):
+        """Virtual wait: set already, or the timeout passes at once"""
+        if timeout is None:
+            # Nothing advances a virtual clock while it blocks, so an untimed wait would hang for real
+            raise RuntimeError("a virtual clock cannot wait without a timeout")
+        if getattr(waitable, 'is_set', None) and waitable.is_set():
+            return True
+        self.sleep(timeout)
+        return False
+
+def playback_outcome(**values):
+    """Outcome dict as returned by PlaybackEngine.play"""
+    outcome = {'events': 0, 'duration': 0.0, 'stopped': False, 'error': None, 'summary': None,
+               'first_event': None, 'lead_in': 0.0, 'settle_saved': 0.0}
+    outcome.update(values)
+    return outcome
+
+class PlaybackEngine:
+    """Replays scripts through the input controllers, independent of the UI.
+    
+    The app drives it for interactive playback and the scheduler for
+    unattended runs. Only one script plays at a time; play() blocks until the
+    script ends or stop() is called and returns an outcome dict.
+    """
+    
+    def __init__(self, mouse_controller=None, keyboard_controller=None, on_progress=None, clock=None):
+        self.mouse_controller = mouse_controller or mouse.Controller()
+        self.keyboard_controller = keyboard_controller or keyboard.Controller()
+        self.on_progress = on_progress  # called with a percentage, from the playback thread
+        self.clock = clock or SystemClock()
+        self.pixel_reader = get_pixel_color
+        self.waiting_for = None  # wait_for event being polled, for simulated pixel readers
+        self.observer = None  # (event time, lateness or None in fast mode, dispatch start, end) per event
+        self.infinite_as = None  # iterations for loops that repeat forever, None = really forever
+        self.settle_profile = None  # SettleProfile used when the calibrated_settle setting is on
+        self.settle = None
+        self.settle_saved = 0.0
+        self.stop_event = threading.Event()
+        self.is_paused = False
+        self.settings = {}
+        self.key_cache = {}
+        self.remap_cache = OrderedDict()
+        self.smooth_cache = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def stop(self):
+        """Stop the running script; play() returns shortly after"""
+        self.is_paused = False
+        self.stop_event.set()
+    
+    def report_progress(self, percent):
+        if self.on_progress:
+            self.on_progress(percent)
+    
+    def play(self, events, blocks, settings, play_range=None, transform=None, script_file=None):
+        """Play a script with the given settings snapshot; returns its outcome"""
+        with self.lock:
+            self.stop_event.clear()
+            self.is_paused = False
+            self.settings = settings
+            self.settle = self.settle_profile if settings.get('calibrated_settle') else None
+            self.settle_saved = 0.0
+            
+            play_range = play_range or {'start': 0, 'stop': None, 'time': 0.0, 'keys': set(), 'buttons': set()}
+            outcome = playback_outcome()
+            start_time = self.clock.now()
+            try:
+                # Remap coordinates and smooth once, up front - nothing is recomputed per event
+                events, blocks = self.remap_for_playback(events, blocks, transform)
+                if settings.get('mouse_smoothing') and not settings.get('fast_mode'):
+                    events, blocks = self.smooth_for_playback(events, blocks, settings)
+                loader = make_script_loader(script_file)
+                
+                # Every run reports once as it starts, after the stop/pause reset above; the process
+                # worker relies on this to resend a stop or pause that raced the start
+                self.report_progress(0.0)
+                self.press_held_state(play_range['keys'], play_range['buttons'], play_range.get('position'),
+                                      transform)
+                if settings.get('fast_mode'):
+                    self.play_fast(events, blocks, settings, play_range, loader, outcome)
+                else:
+                    self.play_timed(events, blocks, settings, play_range, loader, outcome)
+                    
+            except Exception as e:
+                print(f"Playback error: {e}")
+                outcome['error'] = str(e)
+            finally:
+                self.release_held_state(play_range['keys'], play_range['buttons'])
+            
+            outcome['duration'] = self.clock.now() - start_time
+            outcome['stopped'] = self.stop_event.is_set()
+            outcome['settle_saved'] = self.settle_saved
+            return outcome
+    
+    def set_mouse_position_forced(self, x, y):
+        """Force mouse to exact position with multiple attempts"""
+        target_x = int(x)
+        target_y = int(y)
+        
+        if self.settings.get('force_position', True):
+            # Multiple attempts to ensure position is set
+            for attempt in range(3):
+                self.mouse_controller.position = (target_x, target_y)
+                self.settle_sleep('position_retry')  # Small delay between attempts
+                
+                # Verify position
+                current_pos = self.mouse_controller.position
+                if abs(current_pos[0] - target_x) <= 1 and abs(current_pos[1] - target_y) <= 1:
+                    break
+            if self.settle:
+                self.settle.record_position(attempt + 1)
+        else:
+            self.mouse_controller.position = (target_x, target_y)
+    
+    def settle_sleep(self, action):
+        """Wait for an action to settle - calibrated when enabled, else the fixed default"""
+        default = SETTLE_DEFAULTS[action]
+        if self.settle:
+            delay = self.settle.delay(action)
+            self.settle_saved += default - delay
+            self.clock.sleep(delay)
+        else:
+            self.clock.sleep(default)
+    
+    def validate_mouse_position_for_playback(self, x, y):
+        """Special validation for playback that preserves exact positions"""
+        # During playback, we want to preserve the exact recorded position
+        # No modification - just ensure it's an integer
+        return int(x), int(y)
+    
+    def remap_for_playback(self, events, blocks, transform):
+        """Remapped copy of a script for this display, cached per script version and transform"""
+        if transform is None or transform.is_identity():
+            return events, blocks
+        
+        key = (getattr(events, 'source', None) or id(events), id(blocks), transform.key())
+        cached = self.remap_cache.get(key)
+        if cached and cached[0] is blocks:
+            self.remap_cache.move_to_end(key)
+            return cached[1], cached[2]
+        
+        remapped_events, remapped_blocks = remap_script(events, blocks, transform)
+        # Keep the source blocks alive so their id cannot be reused by another table
+        self.remap_cache[key] = (blocks, remapped_events, remapped_blocks)
+        while len(self.remap_cache) > REMAP_CACHE_SIZE:
+            self.remap_cache.popitem(last=False)
+        return remapped_events, remapped_blocks
+    
+    def smooth_for_playback(self, events, blocks, settings):
+        """Smoothed copy of a script, cached per script version and smoothing settings"""
+        options = smoothing_options(settings)
+        key = (getattr(events, 'source', None) or id(events), id(blocks), options)
+        cached = self.smooth_cache.get(key)
+        if cached and cached[0] is blocks:
+            self.smooth_cache.move_to_end(key)
+            return cached[1], cached[2]
+        
+        smoothed_events, smoothed_blocks = smooth_script(events, blocks, *options)
+        # Keep the source blocks alive so their id cannot be reused by another table
+        self.smooth_cache[key] = (blocks, smoothed_events, smoothed_blocks)
+        while len(self.smooth_cache) > REMAP_CACHE_SIZE:
+            self.smooth_cache.popitem(last=False)
+        return smoothed_events, smoothed_blocks
+    
+    def press_held_state(self, keys, buttons, position=None, transform=None):
+        """Put keys and buttons that are down at a seek point into that state.
+        
+        The pointer goes to its recorded position first, so a held button
+        drags from where it was pressed rather than from wherever it is now.
+        """
+        if position is not None:
+            if transform is not None and not transform.is_identity():
+                xs, ys = transform.apply([position[0]], [position[1]])
+                position = (int(xs[0]), int(ys[0]))
+            self.set_mouse_position_forced(*self.validate_mouse_position_for_playback(*position))
+        for key in keys:
+            key_obj = self.resolve_key(key)
+            if key_obj is not None:
+                self.keyboard_controller.press(key_obj)
+        for button in buttons:
+            self.mouse_controller.press(mouse.Button.left if button == 'left' else mouse.Button.right)
+    
+    def release_held_state(self, keys, buttons):
+        """Release whatever playback left held, so no key stays stuck down"""
+        for key in keys:
+            key_obj = self.resolve_key(key)
+            if key_obj is not None:
+                try:
+                    self.keyboard_controller.release(key_obj)
+                except Exception:
+                    pass
+        for button in buttons:
+            try:
+                self.mouse_controller.release(mouse.Button.left if button == 'left' else mouse.Button.right)
+            except Exception:
+                pass
+        keys.clear()
+        buttons.clear()
+    
+    def play_timed(self, events, blocks, settings, play_range, loader, outcome):
+        """Stable playback with proper timing and taskbar support"""
+        held_keys, held_buttons = play_range['keys'], play_range['buttons']
+        
+        repeat_count = settings['repeat_count']
+        repeats = itertools.count() if repeat_count == 0 else range(repeat_count)
+        
+        repeat_interval = settings['repeat_interval']
+        speed = settings['playback_speed']
+        typing_rate = settings.get('typing_rate', 0.0)
+        timeline = PlaybackTimeline.from_settings(settings)
+        
+        total_duration = self.range_duration(events, blocks, play_range)
+        
+        for repeat in repeats:
+            if self.stop_event.is_set():
+                break
+            
+            # Wait between repeats
+            if repeat > 0 and repeat_interval > 0:
+                self.clock.wait(self.stop_event, repeat_interval)
+            
+            # Play events
+            start_playback_time = self.clock.now()
+            timeline.reset(play_range['time'])
+            cursor = PlaybackCursor(events, blocks, loader=loader, infinite_as=self.infinite_as,
+                                    start=play_range['start'], stop=play_range['stop'])
+            timed_events = with_smoothing_points(cursor) if settings.get('mouse_smoothing') else cursor
+            last_progress = -1.0
+            
+            for event_time, event in timed_events:
+                if self.stop_event.is_set():
+                    break
+                
+                # Handle pause
+                while self.is_paused and not self.stop_event.is_set():
+                    self.clock.sleep(0.1)
+                if self.stop_event.is_set():
+                    break  # stopped while paused
+                
+                # Calculate timing (idle gaps may be sped up or clamped)
+                target_time = timeline.advance(event_time)
+                elapsed = self.clock.now() - start_playback_time
+                wait_time = target_time - elapsed
+                
+                if event.get('interpolated'):
+                    # Smoothing only fills idle time: a point that is already due is dropped
+                    if wait_time > 0 and not self.clock.wait(self.stop_event, wait_time):
+                        self.mouse_controller.position = (event['x'], event['y'])
+                    continue
+                
+                # Wait if needed (a stop cuts the wait short)
+                if wait_time > 0 and self.clock.wait(self.stop_event, wait_time):
+                    break
+                
+                dispatch_time = self.clock.now()
+                lateness = dispatch_time - start_playback_time - target_time
+                if outcome['first_event'] is None:
+                    outcome['first_event'] = dispatch_time
+                    outcome['lead_in'] = target_time
+                
+                # Update progress, throttled like play_fast so the Tk queue keeps up
+                if total_duration > 0 and dispatch_time - last_progress >= 0.1:
+                    last_progress = dispatch_time
+                    self.report_progress((cursor.top_time - play_range['time']) / total_duration * 100)
+                
+                if event['type'] == 'wait_for':
+                    # Conditional waits take as long as they take - move the schedule with them
+                    start_playback_time += self.wait_for_condition(event)
+                elif event['type'] == 'type_text':
+                    # Typed text runs at its own rate; the schedule continues from where it ends
+                    self.type_text(event, speed, typing_rate)
+                    timeline.advance(event_time + node_span(event, blocks))
+                    start_playback_time = self.clock.now() - timeline.playback_time
+                    outcome['events'] += 1
+                else:
+                    # Execute event
+                    self.execute_event_safe(event, speed)
+                    apply_held_state(held_keys, held_buttons, event)
+                    outcome['events'] += 1
+                
+                if self.observer:
+                    self.observer(event_time, event, lateness, dispatch_time, self.clock.now())
+                if tracer.enabled:
+                    tracer.counter('playback lateness', ms=lateness * 1000)
+    
+    def range_duration(self, events, blocks, play_range):
+        """Recorded length of the part of the script being played"""
+        stop = play_range['stop']
+        if stop is None or stop >= len(events):
+            end_time = script_duration(events, blocks)
+        else:
+            end_time = events[stop - 1]['time'] + node_span(events[stop - 1], blocks)
+        return end_time - play_range['time']
+    
+    def compile_fast_events(self, timed_events):
+        """Drop the moves that only matter for timing fidelity.
+        
+        Takes (time, event) pairs and yields them back with each run of
+        consecutive mouse moves collapsed to its final position; clicks and
+        scrolls carry their own coordinates.
+        """
+        pending_move = None
+        for timed_event in timed_events:
+            if timed_event[1]['type'] == 'mouse_move':
+                pending_move = timed_event
+                continue
+            if pending_move:
+                yield pending_move
+                pending_move = None
+            yield timed_event
+        if pending_move:
+            yield pending_move
+    
+    def play_fast(self, events, blocks, settings, play_range, loader, outcome):
+        """Replay events back-to-back, keeping only the settles needed for correctness"""
+        held_keys, held_buttons = play_range['keys'], play_range['buttons']
+        
+        repeat_count = settings['repeat_count']
+        repeats = itertools.count() if repeat_count == 0 else range(repeat_count)
+        
+        repeat_interval = settings['repeat_interval']
+        total_duration = self.range_duration(events, blocks, play_range)
+        start_time = self.clock.now()
+        
+        for repeat in repeats:
+            if self.stop_event.is_set():
+                break
+            
+            if repeat > 0 and repeat_interval > 0:
+                self.clock.wait(self.stop_event, repeat_interval)
+            
+            last_progress = 0
+            cursor = PlaybackCursor(events, blocks, loader=loader, infinite_as=self.infinite_as,
+                                    start=play_range['start'], stop=play_range['stop'])
+            for event_time, event in self.compile_fast_events(cursor):
+                if self.stop_event.is_set():
+                    break
+                
+                while self.is_paused and not self.stop_event.is_set():
+                    self.clock.sleep(0.1)
+                if self.stop_event.is_set():
+                    break  # stopped while paused
+                
+                dispatch_time = self.clock.now()
+                if outcome['first_event'] is None:
+                    outcome['first_event'] = dispatch_time
+                
+                self.execute_event_fast(event)
+                apply_held_state(held_keys, held_buttons, event)
+                outcome['events'] += 1
+                
+                if self.observer:
+                    self.observer(event_time, event, None, dispatch_time, self.clock.now())
+                
+                # Throttle progress updates so the Tk queue keeps up
+                now = self.clock.now()
+                if now - last_progress >= 0.1 and total_duration > 0:
+                    last_progress = now
+                    self.report_progress((cursor.top_time - play_range['time']) / total_duration * 100)
+        
+        elapsed = self.clock.now() - start_time
+        rate = outcome['events'] / elapsed if elapsed > 0 else 0
+        outcome['summary'] = f"Done: {outcome['events']} events in {elapsed:.2f}s ({rate:.0f} events/s)"
+    
+    @traced('inject fast')
+    def execute_event_fast(self, event):
+        """Execute a single event without timing fidelity"""
+        try:
+            event_type = event['type']
+            
+            if event_type == 'mouse_move':
+                self.mouse_controller.position = self.validate_mouse_position_for_playback(event['x'], event['y'])
+                
+            elif event_type == 'mouse_click':
+                x, y = self.validate_mouse_position_for_playback(event['x'], event['y'])
+                button = mouse.Button.left if event['button'] == 'left' else mouse.Button.right
+                
+                if event['pressed']:
+                    # The target window must see the pointer before the button goes down
+                    self.set_mouse_position_forced(x, y)
+                    self.clock.sleep(FAST_CLICK_SETTLE)
+                    self.mouse_controller.press(button)
+                else:
+                    self.mouse_controller.position = (x, y)
+                    self.mouse_controller.release(button)
+                    
+            elif event_type == 'mouse_scroll':
+                self.mouse_controller.position = self.validate_mouse_position_for_playback(event['x'], event['y'])
+                self.mouse_controller.scroll(event['dx'], event['dy'])
+                
+            elif event_type in ('key_press', 'key_release'):
+                key_obj = self.resolve_key(event['key'])
+                if key_obj is None:
+                    return
+                
+                if event_type == 'key_press':
+                    self.keyboard_controller.press(key_obj)
+                else:
+                    self.keyboard_controller.release(key_obj)
+                    # Give the new focus target time to appear before typing into it
+                    if event['key'] in FOCUS_CHANGING_KEYS:
+                        self.clock.sleep(FAST_FOCUS_SETTLE)
+                        
+            elif event_type == 'delay':
+                # Explicit delays are deliberate synchronization, keep them
+                self.clock.wait(self.stop_event, event['duration'])
+                
+            elif event_type == 'wait_for':
+                self.wait_for_condition(event)
+                
+            elif event_type == 'type_text':
+                self.keyboard_controller.type(event['text'])
+                
+        except Exception as e:
+            print(f"Event execution error: {e}")
+    
+    @traced('type text')
+    def type_text(self, event, speed, typing_rate):
+        """Type a coalesced text event at the recorded cadence or a fixed rate"""
+        text = event['text']
+        if typing_rate > 0:
+            # Batched path: as many chars per tick as the rate allows
+            per_tick = max(1, int(typing_rate * TYPING_BATCH_TICK))
+            interval = per_tick / typing_rate
+            for i in range(0, len(text), per_tick):
+                if self.stop_event.is_set():
+                    return
+                self.keyboard_controller.type(text[i:i + per_tick])
+                self.clock.sleep(interval)
+            return
+        
+        start = self.clock.now()
+        for char, offset in zip(text, event['offsets']):
+            if self.stop_event.is_set():
+                return
+            wait_time = offset / speed - (self.clock.now() - start)
+            if wait_time > 0:
+                self.clock.sleep(wait_time)
+            self.keyboard_controller.type(char)
+    
+    @traced('wait for')
+    def wait_for_condition(self, event):
+        """Block until the pixel at (x, y) has the expected color; returns seconds waited"""
+        target = event['color'].lstrip('#')
+        expected = tuple(int(target[i:i + 2], 16) for i in (0, 2, 4))
+        tolerance = event.get('tolerance', 10)
+        timeout = event.get('timeout', 30.0)
+        
+        wait_start = self.clock.now()
+        self.waiting_for = event
+        while not self.stop_event.is_set():
+            color = self.pixel_reader(event['x'], event['y'])
+            if all(abs(c - e) <= tolerance for c, e in zip(color, expected)):
+                break
+            if timeout > 0 and self.clock.now() - wait_start >= timeout:
+                print(f"Wait for {event['color']} at ({event['x']}, {event['y']}) timed out")
+                break
+            self.clock.wait(self.stop_event, WAIT_FOR_POLL_INTERVAL)
+        self.waiting_for = None
+        return self.clock.now() - wait_start
+    
+    def resolve_key(self, key):
+        """Map a recorded key name to a pynput key (cached)"""
+        if not key:
+            return None
+        if len(key) == 1:
+            return key
+        
+        if key not in self.key_cache:
+            self.key_cache[key] = getattr(keyboard.Key, key, None)
+        return self.key_cache[key]
+    
+    @traced('inject')
+    def execute_event_safe(self, event, speed=1.0):
+        """Execute a single event with enhanced taskbar support"""
+        try:
+            event_type = event['type']
+            
+            if event_type == 'mouse_move':
+                # Use exact position for playback
+                # Smoothing points are precomputed and scheduled by play_timed
+                x, y = self.validate_mouse_position_for_playback(event['x'], event['y'])
+                self.set_mouse_position_forced(x, y)
+                    
+            elif event_type == 'mouse_click':
+                # Use exact position for clicks (critical for taskbar)
+                x, y = self.validate_mouse_position_for_playback(event['x'], event['y'])
+                button = mouse.Button.left if event['button'] == 'left' else mouse.Button.right
+                
+                # Move to exact position with forced positioning
+                self.set_mouse_position_forced(x, y)
+                self.settle_sleep('click_move')  # Extended delay for taskbar reliability
+                
+                # Double-check position before clicking
+                self.set_mouse_position_forced(x, y)
+                self.settle_sleep('click_verify')
+                
+                # Perform the click
+                if event['pressed']:
+                    self.mouse_controller.press(button)
+                    self.settle_sleep('click_after')  # Small delay after press
+                else:
+                    self.mouse_controller.release(button)
+                    self.settle_sleep('click_after')  # Small delay after release
+                    
+            elif event_type == 'mouse_scroll':
+                x, y = self.validate_mouse_position_for_playback(event['x'], event['y'])
+                self.set_mouse_position_forced(x, y)
+                self.settle_sleep('scroll')
+                self.mouse_controller.scroll(event['dx'], event['dy'])
+                
+            elif event_type == 'key_press':
+                key_obj = self.resolve_key(event['key'])
+                if key_obj is not None:
+                    try:
+                        self.keyboard_controller.press(key_obj)
+                    except:
+                        pass
+                        
+            elif event_type == 'key_release':
+                key_obj = self.resolve_key(event['key'])
+                if key_obj is not None:
+                    try:
+                        self.keyboard_controller.release(key_obj)
+                    except:
+                        pass
+                        
+            elif event_type == 'delay':
+                self.clock.sleep(event['duration'] / speed)
+                
+        except Exception as e:
+            print(f"Event execution error: {e}")
+
+SIM_INPUT_CALL_COST = 0.0001  # seconds per injected input call
+SIM_DRIFT_POINTS = 200
+
+def input_name(value):
+    """Name of a pynput key or button, or the character itself"""
+    return getattr(value, 'name', value)
+
+class VirtualMouse:
+    """Mouse controller stand-in that charges every call to a virtual clock.
+    
+    With a log list, every injected action is appended to it as
+    (clock time, action, value).
+    """
+    
+    def __init__(self, clock, call_cost=SIM_INPUT_CALL_COST, miss_rate=0.0, seed=0, log=None):
+        self.clock = clock
+        self.call_cost = call_cost
+        self.miss_rate = miss_rate  # chance a move lands off target, so forced positioning retries
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.log = log
+        self._position = (0, 0)
+    
+    @property
+    def position(self):
+        self.calls += 1
+        self.clock.sleep(self.call_cost)
+        return self._position
+    
+    @position.setter
+    def position(self, value):
+        self.calls += 1
+        self.clock.sleep(self.call_cost)
+        x, y = value
+        if self.miss_rate and self.random.random() < self.miss_rate:
+            x += 2
+        self._position = (x, y)
+        if self.log is not None:
+            self.log.append((self.clock.now(), 'move', self._position))
+    
+    def press(self, button):
+        self.calls += 1
+        self.clock.sleep(self.call_cost)
+        if self.log is not None:
+            self.log.append((self.clock.now(), 'press', input_name(button)))
+    
+    def release(self, button):
+        self.calls += 1
+        self.clock.sleep(self.call_cost)
+        if self.log is not None:
+            self.log.append((self.clock.now(), 'release', input_name(button)))
+    
+    def scroll(self, dx, dy):
+        self.calls += 1
+        self.clock.sleep(self.call_cost)
+        if self.log is not None:
+            self.log.append((self.clock.now(), 'scroll', (dx, dy)))
+
+class VirtualKeyboard:
+    """Keyboard controller stand-in that charges every key to a virtual clock (and logs it, like VirtualMouse)"""
+    
+    def __init__(self, clock, call_cost=SIM_INPUT_CALL_COST, log=None):
+        self.clock = clock
+        self.call_cost = call_cost
+        self.calls = 0
+        self.log = log
+    
+    def press(self, key):
+        self.calls += 1
+        self.clock.sleep(self.call_cost)
+        if self.log is not None:
+            self.log.append((self.clock.now(), 'key_press', input_name(key)))
+    
+    def release(self, key):
+        self.calls += 1
+        self.clock.sleep(self.call_cost)
+        if self.log is not None:
+            self.log.append((self.clock.now(), 'key_release', input_name(key)))
+    
+    def type(self, text):
+        self.calls += len(text)
+        self.clock.sleep(self.call_cost * len(text))
+        if self.log is not None:
+            self.log.append((self.clock.now(), 'type', text))
+
+def script_segments(events):
+    """Top-level segments for cost reports: each control node, and each run of plain events"""
+    segments = []
+    for index, event in enumerate(events):
+        node = event['type'] if event['type'] in CONTROL_NODE_TYPES else None
+        if node is None and segments and segments[-1]['node'] is None:
+            segments[-1]['last'] = index
+            continue
+        segments.append({'node': node, 'first': index, 'last': index, 'start': event['time'],
+                         'wall': 0.0, 'busy': 0.0, 'events': 0})
+    
+    for segment in segments:
+        event = events[segment['first']]
+        if segment['node'] == 'section':
+            segment['label'] = f"Section '{event['name']}'"
+        elif segment['node'] == 'loop':
+            segment['label'] = f"Loop x{event['count'] or 'forever'}"
+        elif segment['node'] == 'block':
+            segment['label'] = f"Block '{event['block']}'"
+        elif segment['node'] == 'call':
+            segment['label'] = f"Call {os.path.basename(event['path'])}"
+        else:
+            segment['label'] = f"Events {segment['first'] + 1}-{segment['last'] + 1}"
+    return segments
+
+def virtual_pixel_reader(engine):
+    """Pixel reader for simulated runs: it shows whatever color the engine's current wait-for expects"""
+    def read(x, y):
+        target = engine.waiting_for['color'].lstrip('#')
+        return tuple(int(target[i:i + 2], 16) for i in (0, 2, 4))
+    return read
+
+def simulate_playback(events, blocks, settings, script_file=None, call_cost=SIM_INPUT_CALL_COST, miss_rate=0.0,
+                      settle_profile=None):
+    """Dry-run a script on a virtual clock and fake input backend.
+    
+    Runs the real engine code, so settle sleeps, forced-position retries,
+    smoothing steps, speed, repeats and intervals all count. Wait-for steps
+    find their color at once, and anything set to repeat forever runs once.
+    Returns the predicted duration, a drift curve (how late events fire
+    against the schedule) and the cost of each top-level segment.
+    """
+    clock = VirtualClock()
+    engine = PlaybackEngine(VirtualMouse(clock, call_cost, miss_rate), VirtualKeyboard(clock, call_cost),
+                            clock=clock)
+    engine.infinite_as = 1
+    engine.settle_profile = copy.deepcopy(settle_profile)  # online tuning must not leak into the real one
+    
+    engine.pixel_reader = virtual_pixel_reader(engine)
+    
+    settings = dict(PLAYBACK_DEFAULTS, **settings)
+    if settings['repeat_count'] == 0:
+        settings['repeat_count'] = 1
+    
+    segments = script_segments(events)
+    starts = [segment['start'] for segment in segments]
+    drift = []
+    last = [float('inf'), 0.0]  # previous event time and end
+    current = [None, 0.0, -1.0]  # segment, and the time range it covers
+    
+    def observe(event_time, event, lateness, start, end):
+        if event_time < last[0]:
+            last[1] = start  # a new repeat - the interval before it is no segment's cost
+        segment, first, after = current
+        if not first <= event_time < after:
+            # Only look the segment up again when the events leave the current one
+            position = max(0, bisect_right(starts, event_time) - 1)
+            segment = segments[position]
+            after = starts[position + 1] if position + 1 < len(starts) else float('inf')
+            current[:] = segment, starts[position] if position else float('-inf'), after
+        segment['wall'] += end - last[1]
+        segment['busy'] += end - start
+        segment['events'] += 1
+        last[0], last[1] = event_time, end
+        if lateness is not None:
+            drift.append(lateness)
+    
+    engine.observer = observe
+    wall_start = time.perf_counter()
+    outcome = engine.play(events, blocks, settings, script_file=script_file)
+    wall_time = time.perf_counter() - wall_start
+    if outcome['error']:
+        raise ValueError(outcome['error'])
+    
+    # Downsample the drift curve to its worst value per bucket
+    bucket = max(1, -(-len(drift) // SIM_DRIFT_POINTS))
+    curve = [max(drift[i:i + bucket]) for i in range(0, len(drift), bucket)]
+    return {
+        'duration': outcome['duration'],
+        'events': outcome['events'],
+        'input_calls': engine.mouse_controller.calls + engine.keyboard_controller.calls,
+        'final_drift': drift[-1] if drift else 0.0,
+        'max_drift': max(drift) if drift else 0.0,
+        'drift_curve': curve,
+        'segments': segments,
+        'simulated_per_second': outcome['events'] / wall_time if wall_time > 0 else 0
+    }
+
+# Replay fidelity: a run fails when any metric goes over its limit (pixels, seconds, counts)
+FIDELITY_THRESHOLDS = {
+    'rms_error': 0.5,
+    'max_error': 2.0,
+    'p95_lateness': 0.02,
+    'max_lateness': 0.25,
+    'dropped': 0,
+    'reordered': 0,
+    'key_mismatches': 0,
+    'stuck_inputs': 0
+}
+FIDELITY_METRICS = {
+    'rms_error': "Spatial RMS error (px)",
+    'max_error': "Spatial max error (px)",
+    'mean_lateness': "Mean lateness (s)",
+    'p95_lateness': "95th percentile lateness (s)",
+    'max_lateness': "Max lateness (s)",
+    'dropped': "Dropped events",
+    'merged': "Moves merged by fast mode",
+    'reordered': "Reordered events",
+    'key_mismatches': "Key/button state mismatches",
+    'stuck_inputs': "Keys/buttons left held"
+}
+
+def _fidelity_injected(event, actions):
+    """True if the actions injected while an event ran include the one it asks for"""
+    event_type = event['type']
+    if event_type == 'mouse_move':
+        return any(action == 'move' for _, action, _ in actions)
+    if event_type == 'mouse_click':
+        wanted = 'press' if event['pressed'] else 'release'
+        return (wanted, event['button']) in {(action, value) for _, action, value in actions}
+    if event_type == 'mouse_scroll':
+        return (('scroll', (event['dx'], event['dy'])) in {(action, value) for _, action, value in actions})
+    if event_type in ('key_press', 'key_release'):
+        return (event_type, event['key']) in {(action, value) for _, action, value in actions}
+    if event_type == 'type_text':
+        typed = ''.join(value for _, action, value in actions if action in ('type', 'key_press'))
+        return typed == event['text']
+    return True  # waits, delays and control nodes inject nothing
+
+def _fidelity_expected(events, blocks, loader, base=0.0, shift=None, depth=0):
+    """(time, event) of every event a script should inject, expanded recursively without the PlaybackCursor.
+    
+    Blocks and calls are inlined and loops unrolled (forever loops once).
+    Each extra loop pass and each called script moves everything after it
+    by its span, as in playback; shift carries that offset along.
+    """
+    if depth >= MAX_NESTING_DEPTH:
+        raise RuntimeError("Control nodes are nested too deeply (recursive call?)")
+    shift = [0.0] if shift is None else shift
+    expected = []
+    for event in events:
+        event_type = event['type']
+        node_base = base + event['time']
+        if event_type == 'block':
+            expected += _fidelity_expected(blocks.get(event['block'], ()), blocks, loader, node_base, shift, depth + 1)
+        elif event_type == 'section':
+            expected += _fidelity_expected(event['events'], blocks, loader, node_base, shift, depth + 1)
+        elif event_type == 'loop':
+            count = event.get('count', 1) or 1
+            for repeat in range(count):
+                if repeat:
+                    shift[0] += script_duration(event['events'], blocks) + event.get('interval', 0.0)
+                expected += _fidelity_expected(event['events'], blocks, loader, node_base, shift, depth + 1)
+        elif event_type == 'call':
+            if loader is not None:
+                called_events, called_blocks = loader(event['path'])
+                expected += _fidelity_expected(called_events, called_blocks, loader, node_base, shift, depth + 1)
+                shift[0] += script_duration(called_events, called_blocks)
+        else:
+            expected.append((node_base + shift[0], event))
+    return expected
+
+def measure_fidelity(events, blocks, settings, script_file=None, call_cost=SIM_INPUT_CALL_COST, miss_rate=0.0,
+                     thresholds=None):
+    """Play a script against a recording fake backend and compare what was injected with the source.
+    
+    Runs the real engine on a virtual clock, one pass with forever loops run
+    once. The expected event stream is expanded from the script itself, not
+    through the cursor the engine plays with, so a cursor that skips or
+    reorders events shows up here. Each dispatched event is aligned with its
+    source event by time and type, and the actions injected while it ran are
+    checked against it: where the pointer ended up, how late it fired,
+    whether its click, key or scroll was injected at all, and whether the
+    held keys and buttons still match the recording afterwards. Returns the metrics, plus the
+    names of those over their threshold in 'failures'.
+    """
+    clock = VirtualClock()
+    actions = []
+    engine = PlaybackEngine(VirtualMouse(clock, call_cost, miss_rate, log=actions),
+                            VirtualKeyboard(clock, call_cost, log=actions), clock=clock)
+    engine.infinite_as = 1
+    engine.pixel_reader = virtual_pixel_reader(engine)
+    
+    settings = dict(PLAYBACK_DEFAULTS, **settings)
+    settings['repeat_count'] = 1
+    
+    # Source positions by (time, type), in playback order
+    expected = defaultdict(deque)
+    source = []
+    for position, (event_time, event) in enumerate(_fidelity_expected(events, blocks,
+                                                                      make_script_loader(script_file))):
+        expected[round(event_time, 6), event['type']].append(position)
+        source.append(event['type'])
+    
+    dispatched = [False] * len(source)
+    errors = []
+    lateness = []
+    counts = {'dropped': 0, 'reordered': 0, 'key_mismatches': 0}
+    held_keys, held_buttons = set(), set()  # what the recording holds
+    injected_keys, injected_buttons = set(), set()  # what the backend was told to hold
+    state = {'last': -1, 'seen': 0}
+    
+    def observe(event_time, event, late, start, end):
+        window = actions[state['seen']:]
+        state['seen'] = len(actions)
+        for _, action, value in window:
+            if action in ('key_press', 'press'):
+                (injected_keys if action == 'key_press' else injected_buttons).add(value)
+            elif action in ('key_release', 'release'):
+                (injected_keys if action == 'key_release' else injected_buttons).discard(value)
+        
+        positions = expected.get((round(event_time, 6), event['type']))
+        if positions:
+            position = positions.popleft()
+            dispatched[position] = True
+            if position < state['last']:
+                counts['reordered'] += 1
+            state['last'] = max(state['last'], position)
+        
+        if not _fidelity_injected(event, window):
+            counts['dropped'] += 1
+        if event['type'] in POINTER_EVENT_TYPES:
+            x, y = engine.mouse_controller._position
+            errors.append(np.hypot(x - event['x'], y - event['y']))
+        if late is not None:
+            lateness.append(late)
+        
+        apply_held_state(held_keys, held_buttons, event)
+        if held_keys != injected_keys or held_buttons != injected_buttons:
+            counts['key_mismatches'] += 1
+    
+    engine.observer = observe
+    outcome = engine.play(events, blocks, settings, script_file=script_file)
+    if outcome['error']:
+        raise ValueError(outcome['error'])
+    
+    # Whatever the final release did not let go of is stuck
+    for _, action, value in actions[state['seen']:]:
+        if action in ('key_press', 'press'):
+            (injected_keys if action == 'key_press' else injected_buttons).add(value)
+        elif action in ('key_release', 'release'):
+            (injected_keys if action == 'key_release' else injected_buttons).discard(value)
+    
+    merged = 0
+    for position, done in enumerate(dispatched):
+        if not done:
+            if settings['fast_mode'] and source[position] == 'mouse_move':
+                merged += 1
+            else:
+                counts['dropped'] += 1
+    
+    errors = np.asarray(errors, dtype=float)
+    lateness = np.asarray(lateness, dtype=float)
+    report = {
+        'events': len(source),
+        'dispatched': outcome['events'],
+        'input_calls': len(actions),
+        'duration': outcome['duration'],
+        'rms_error': float(np.sqrt(np.mean(errors ** 2))) if len(errors) else 0.0,
+        'max_error': float(errors.max()) if len(errors) else 0.0,
+        'mean_lateness': float(lateness.mean()) if len(lateness) else 0.0,
+        'p95_lateness': float(np.percentile(lateness, 95)) if len(lateness) else 0.0,
+        'max_lateness': float(lateness.max()) if len(lateness) else 0.0,
+        'merged': merged,
+        'stuck_inputs': len(injected_keys) + len(injected_buttons),
+        **counts
+    }
+    report['thresholds'] = dict(FIDELITY_THRESHOLDS, **(thresholds or {}))
+    report['failures'] = [name for name, limit in report['thresholds'].items() if report[name] > limit]
+    return report
+
+def format_fidelity_report(report):
+    """Plain-text fidelity report, one metric per line with its threshold and verdict"""
+    lines = [f"Events: {report['events']}, dispatched: {report['dispatched']}, "
+             f"input calls: {report['input_calls']}, duration: {report['duration']:.2f}s"]
+    for name, label in FIDELITY_METRICS.items():
+        value = report[name]
+        text = f"{value:.4f}" if isinstance(value, float) else str(value)
+        limit = report['thresholds'].get(name)
+        if limit is not None:
+            text += f" (limit {limit}) {'FAIL' if name in report['failures'] else 'ok'}"
+        lines.append(f"{label}: {text}")
+    lines.append("FAILED: " + ", ".join(report['failures']) if report['failures'] else "PASSED")
+    return "\n".join(lines)
+
+def fidelity_cli(argv):
+    """Command-line fidelity check; the exit status is 1 when any metric is over its threshold"""
+    parser = argparse.ArgumentParser(prog="main.py --fidelity",
+                                     description="Replay scripts against a fake input backend and "
+                                                 "check how faithfully they are reproduced")
+    parser.add_argument('scripts', nargs='+', help="script files to check")
+    parser.add_argument('--miss-rate', type=float, default=0.0, help="chance a move lands off target")
+    parser.add_argument('--call-cost', type=float, default=SIM_INPUT_CALL_COST, help="seconds per input call")
+    parser.add_argument('--set', action='append', default=[], metavar='SETTING=VALUE',
+                        help="override a playback setting, e.g. fast_mode=true")
+    for name, limit in FIDELITY_THRESHOLDS.items():
+        parser.add_argument('--max-' + name.replace('_', '-'), dest=name, type=type(limit), default=limit)
+    args = parser.parse_args(argv)
+    
+    overrides = {}
+    for item in args.set:
+        name, _, value = item.partition('=')
+        if name not in PLAYBACK_DEFAULTS:
+            parser.error(f"unknown setting: {name}")
+        overrides[name] = json.loads(value)
+    thresholds = {name: getattr(args, name) for name in FIDELITY_THRESHOLDS}
+    
+    failed = False
+    for filename in args.scripts:
+        data = read_script_file(filename)
+        settings = dict(data['settings'], **overrides)
+        report = measure_fidelity(data['events'], data['blocks'], settings, filename, args.call_cost,
+                                  args.miss_rate, thresholds)
+        print(f"{filename}\n{format_fidelity_report(report)}\n")
+        failed = failed or bool(report['failures'])
+    return 1 if failed else 0
+
+# Out-of-process playback: compiled events are rows of EVENT_COLUMNS in shared memory
+EVENT_COLUMN_TYPES = ('mouse_move', 'mouse_click', 'mouse_scroll', 'key_press', 'key_release')
+EVENT_COLUMNS = np.dtype([('time', 'f8'), ('type', 'i1'), ('x', 'i4'), ('y', 'i4'), ('dx', 'i4'), ('dy', 'i4'),
+                          ('right', '?'), ('pressed', '?'), ('interpolated', '?'), ('key', 'i4'), ('extra', 'i4')])
+PROCESS_POLL_INTERVAL = 0.5  # seconds between checks that the worker is still alive
+EVENT_COLUMN_CHUNK = 65536  # rows built in Python before they are written out
+
+def runs_forever(events, blocks, loader=None, depth=0):
+    """True if a script contains a loop that repeats forever, in a node, block or called script"""
+    if depth >= MAX_NESTING_DEPTH:
+        return False
+    for event in events:
+        if event['type'] == 'loop' and event.get('count', 1) == 0:
+            return True
+        if 'events' in event and runs_forever(event['events'], blocks, loader, depth + 1):
+            return True
+        if event['type'] == 'call' and loader is not None and runs_forever(*loader(event['path']), loader, depth + 1):
+            return True
+    return depth == 0 and any(runs_forever(body, blocks, loader, depth + 1) for body in blocks.values())
+
+def count_event_rows(events, blocks, play_range, loader=None):
+    """Number of EVENT_COLUMNS rows compile_event_columns writes for the same arguments"""
+    cursor = PlaybackCursor(events, blocks, loader=loader, start=play_range['start'], stop=play_range['stop'])
+    return sum(1 + len(event.get('path', ())) for _, event in cursor)
+
+def compile_event_columns(events, blocks, play_range, rows, loader=None):
+    """Flatten the part of a script being played into an EVENT_COLUMNS array.
+    
+    rows is sized with count_event_rows, typically a view over shared memory,
+    and is filled EVENT_COLUMN_CHUNK rows at a time so no full-size copy is
+    ever held. Control nodes are expanded and smoothing points become rows
+    of their own. Returns (key names, extras): rows refer to keys by index,
+    and events that do not fit the columns (waits, typed text, delays) are
+    kept whole in extras. Scripts that loop forever cannot be flattened.
+    """
+    codes = {name: code for code, name in enumerate(EVENT_COLUMN_TYPES)}
+    keys = {}
+    extras = []
+    chunk = []
+    written = 0
+    cursor = PlaybackCursor(events, blocks, loader=loader, start=play_range['start'], stop=play_range['stop'])
+    for event_time, event in with_smoothing_points(cursor):
+        code = codes.get(event['type'])
+        if code is None:
+            extras.append(event)
+            chunk.append((event_time, -1, 0, 0, 0, 0, False, False, False, -1, len(extras) - 1))
+        else:
+            key = keys.setdefault(event['key'], len(keys)) if 'key' in event else -1
+            chunk.append((event_time, code, event.get('x', 0), event.get('y', 0), event.get('dx', 0),
+                          event.get('dy', 0), event.get('button') == 'right', event.get('pressed', False),
+                          event.get('interpolated', False), key, -1))
+        if len(chunk) >= EVENT_COLUMN_CHUNK:
+            rows[written:written + len(chunk)] = chunk
+            written += len(chunk)
+            chunk = []
+    if chunk:
+        rows[written:written + len(chunk)] = chunk
+        written += len(chunk)
+    if written != len(rows):
+        raise ValueError(f"Compiled {written} rows into a buffer sized for {len(rows)}")
+    return list(keys), extras
+
+class ColumnEvents(Sequence):
+    """Flat, read-only script over EVENT_COLUMNS rows; event dicts are built on access"""
+    
+    def __init__(self, rows, keys, extras):
+        self.rows = rows
+        self.keys = keys
+        self.extras = extras
+    
+    def __len__(self):
+        return len(self.rows)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        event_time, code, x, y, dx, dy, right, pressed, interpolated, key, extra = self.rows[index].item()
+        if code < 0:
+            return dict(self.extras[extra], time=event_time)
+        event_type = EVENT_COLUMN_TYPES[code]
+        if event_type in ('key_press', 'key_release'):
+            return {'type': event_type, 'time': event_time, 'key': self.keys[key]}
+        event = {'type': event_type, 'time': event_time, 'x': x, 'y': y}
+        if event_type == 'mouse_click':
+            event.update(button='right' if right else 'left', pressed=pressed)
+        elif event_type == 'mouse_scroll':
+            event.update(dx=dx, dy=dy)
+        elif interpolated:
+            event['interpolated'] = True
+        return event
+
+def playback_worker(control, status):
+    """Worker process: play compiled scripts sent over control, report back over status"""
+    engine = PlaybackEngine()
+    jobs = queue.Queue()
+    requested = {'stop': False, 'paused': False}  # toggles sent for the latest run
+    
+    def listen():
+        while True:
+            try:
+                message = control.recv()
+            except (EOFError, OSError):
+                message = ('exit',)
+            if message[0] == 'play':
+                requested.update(stop=message[-2], paused=message[-1])
+                jobs.put(message)
+            elif message[0] == 'stop':
+                requested['stop'] = True
+                engine.stop()
+            elif message[0] == 'pause':
+                requested['paused'] = message[1]
+                engine.is_paused = message[1]
+            elif message[0] == 'exit':
+                engine.stop()
+                jobs.put(None)
+                return
+    
+    threading.Thread(target=listen, name="Playback control", daemon=True).start()
+    reported = [None]
+    
+    def progress(percent):
+        # The run's start resets stop and pause; reapply toggles that arrived before it
+        if requested['stop'] and not engine.stop_event.is_set():
+            engine.stop()
+        engine.is_paused = requested['paused']
+        # One message per whole percent, with the pause state so the UI can resend a lost toggle
+        if int(percent) != reported[0]:
+            reported[0] = int(percent)
+            status.send(('progress', percent, engine.is_paused))
+    
+    engine.on_progress = progress
+    while True:
+        job = jobs.get()
+        if job is None:
+            return
+        _, buffer_name, count, keys, extras, settings, play_range, settle_profile = job[:8]
+        buffer = shared_memory.SharedMemory(name=buffer_name)
+        try:
+            rows = np.ndarray((count,), dtype=EVENT_COLUMNS, buffer=buffer.buf)
+            engine.settle_profile = settle_profile
+            reported[0] = None
+            outcome = engine.play(ColumnEvents(rows, keys, extras), {}, settings, play_range)
+            del rows
+        finally:
+            buffer.close()
+        status.send(('done', outcome, settle_profile if settle_profile and settle_profile.changed else None))
+
+class PlaybackProcess:
+    """Plays scripts on a PlaybackEngine in a separate process, away from the UI's GIL.
+    
+    Same play/stop/is_paused interface as PlaybackEngine. The in-process
+    engine still remaps and smooths the script (with its caches) and owns the
+    settle profile; the result is flattened into one shared-memory buffer the
+    worker reads in place, so only control and progress messages cross the
+    pipes. Scripts that loop forever play on the in-process engine instead.
+    """
+    
+    def __init__(self, engine):
+        self.engine = engine
+        self.process = None
+        self.control = None
+        self.status = None
+        self.lock = threading.Lock()
+        self.send_lock = threading.Lock()  # Tk and playback threads both send; Connection.send is not thread-safe
+        self.active = False  # a run is being compiled for, or played by, the worker
+        self.running = False  # the worker has been sent the run
+        self.stop_requested = False
+        self._paused = False
+    
+    @property
+    def is_paused(self):
+        return self._paused if self.active else self.engine.is_paused
+    
+    @is_paused.setter
+    def is_paused(self, paused):
+        with self.send_lock:
+            if self.active:
+                self._paused = paused
+                if self.running:
+                    self.control.send(('pause', paused))
+                return
+        self.engine.is_paused = paused  # a forever script playing in-process
+    
+    def stop(self):
+        with self.send_lock:
+            self.stop_requested = True
+            self._paused = False
+            if self.running:
+                self.control.send(('stop',))
+        self.engine.stop()
+    
+    def send_control(self, message):
+        """Send one control message, serialized with the other threads' sends"""
+        with self.send_lock:
+            self.control.send(message)
+    
+    def ensure_worker(self):
+        """Start the worker process, or restart it if it died"""
+        if self.process is not None and self.process.is_alive():
+            return
+        context = multiprocessing.get_context('spawn')
+        control_reader, self.control = context.Pipe(duplex=False)
+        self.status, status_writer = context.Pipe(duplex=False)
+        self.process = context.Process(target=playback_worker, args=(control_reader, status_writer),
+                                       name="NaMouse playback", daemon=True)
+        self.process.start()
+        control_reader.close()
+        status_writer.close()
+    
+    def close(self):
+        if self.process is not None and self.process.is_alive():
+            self.send_control(('exit',))
+            self.process.join(timeout=2)
+    
+    def play(self, events, blocks, settings, play_range=None, transform=None, script_file=None):
+        """Play a script in the worker process; returns its outcome"""
+        loader = make_script_loader(script_file)
+        if runs_forever(events, blocks, loader):
+            return self.engine.play(events, blocks, settings, play_range, transform, script_file)
+        
+        with self.lock:
+            with self.send_lock:
+                self.stop_requested = False
+                self._paused = False
+                self.active = True
+            try:
+                return self.play_in_worker(events, blocks, settings, play_range, transform, loader)
+            finally:
+                with self.send_lock:
+                    self.active = False
+    
+    def play_in_worker(self, events, blocks, settings, play_range, transform, loader):
+        """Compile a script into shared memory and have the worker play it"""
+        play_range = play_range or {'start': 0, 'stop': None, 'time': 0.0, 'keys': set(), 'buttons': set()}
+        try:
+            events, blocks = self.engine.remap_for_playback(events, blocks, transform)
+            if settings.get('mouse_smoothing') and not settings.get('fast_mode'):
+                events, blocks = self.engine.smooth_for_playback(events, blocks, settings)
+            count = count_event_rows(events, blocks, play_range, loader)
+            self.ensure_worker()
+        except Exception as e:
+            print(f"Playback error: {e}")
+            return playback_outcome(error=str(e))
+        
+        buffer = shared_memory.SharedMemory(create=True, size=max(count * EVENT_COLUMNS.itemsize, 1))
+        try:
+            # Compile straight into the shared buffer the worker reads
+            rows = np.ndarray((count,), dtype=EVENT_COLUMNS, buffer=buffer.buf)
+            try:
+                keys, extras = compile_event_columns(events, blocks, play_range, rows, loader)
+            finally:
+                del rows  # the buffer cannot close while a view is alive
+            profile = self.engine.settle_profile if settings.get('calibrated_settle') else None
+            seek = dict(play_range, start=0, stop=None)
+            with self.send_lock:
+                # Running from here on, so later toggles are sent; earlier ones travel with the run
+                self.running = True
+                self.control.send(('play', buffer.name, count, keys, extras, dict(settings, mouse_smoothing=False),
+                                   seek, profile, self.stop_requested, self._paused))
+            return self.wait_for_worker()
+        except Exception as e:
+            print(f"Playback error: {e}")
+            return playback_outcome(error=str(e))
+        finally:
+            with self.send_lock:
+                self.running = False
+            buffer.close()
+            buffer.unlink()
+    
+    def wait_for_worker(self):
+        """Relay progress until the worker reports the outcome"""
+        while True:
+            if not self.status.poll(PROCESS_POLL_INTERVAL):
+                if not self.process.is_alive():
+                    return playback_outcome(error="Playback process exited unexpectedly")
+                continue
+            message = self.status.recv()
+            if message[0] == 'done':
+                _, outcome, learned = message
+                if learned is not None:
+                    self.engine.settle_profile = learned
+                return outcome
+            _, percent, paused = message
+            # A toggle sent just before the worker started its run was reset by it; send again
+            if self.stop_requested:
+                self.send_control(('stop',))
+            elif paused != self._paused:
+                self.send_control(('pause', self._paused))
+            self.engine.report_progress(percent)
+
+# Columnar export for offline analysis (CSV with a JSON sidecar, or NPZ)
+COLUMN_EXPORT_CHUNK = 65536  # rows held in memory at a time
+EXPORT_COLUMNS = np.dtype([('time', 'f8'), ('type', 'i1'), ('x', 'i4'), ('y', 'i4'), ('dx', 'i4'), ('dy', 'i4'),
+                           ('button', 'i1'), ('pressed', '?'), ('key', 'i4'), ('extra', 'i4')])
+EXPORT_BUTTONS = ('', 'left', 'right')  # first codes of the button table; other names are added after them
+COLUMN_META_SUFFIX = '.meta.json'
+
+def iter_column_chunks(events, blocks, keys, buttons, extras, loader=None, chunk=COLUMN_EXPORT_CHUNK):
+    """Yield the played event stream as EXPORT_COLUMNS arrays of up to chunk rows.
+    
+    Control nodes are expanded (forever loops once). Key and button names are
+    numbered in keys and buttons ({name: id}); events without a column form
+    (waits, typed text, delays) are appended whole to extras and referenced
+    by index.
+    """
+    codes = {name: code for code, name in enumerate(EVENT_COLUMN_TYPES)}
+    rows = []
+    for event_time, event in iter_script_events(events, blocks, loader):
+        code = codes.get(event['type'])
+        if code is None:
+            extras.append({name: value for name, value in event.items() if name != 'time'})
+            rows.append((event_time, -1, 0, 0, 0, 0, 0, False, -1, len(extras) - 1))
+        else:
+            key = keys.setdefault(event['key'], len(keys)) if 'key' in event else -1
+            rows.append((event_time, code, event.get('x', 0), event.get('y', 0), event.get('dx', 0),
+                         event.get('dy', 0), buttons.setdefault(event.get('button', ''), len(buttons)),
+                         event.get('pressed', False), key, -1))
+        if len(rows) >= chunk:
+            yield np.array(rows, dtype=EXPORT_COLUMNS)
+            rows = []
+    if rows:
+        yield np.array(rows, dtype=EXPORT_COLUMNS)
+
+def export_columns(filename, events, blocks, settings, metadata, loader=None, on_progress=None):
+    """Stream a script's events to .npz columns or .csv rows (+ .meta.json); returns the row count.
+    
+    Memory is bounded by COLUMN_EXPORT_CHUNK rows: NPZ columns are spooled to
+    temporary files and copied into the archive at the end. Settings,
+    metadata and the key, type and extra tables go in the NPZ 'meta' entry
+    or the CSV's sidecar file. Files are written to a temp name and replaced.
+    """
+    keys = {}
+    buttons = {name: code for code, name in enumerate(EXPORT_BUTTONS)}
+    extras = []
+    count = 0
+    chunks = iter_column_chunks(events, blocks, keys, buttons, extras, loader)
+    temp_file = filename + '.tmp'
+    meta_file = filename + COLUMN_META_SUFFIX
+    spools = {}
+    try:
+        if filename.lower().endswith('.npz'):
+            spools = {name: tempfile.TemporaryFile() for name in EXPORT_COLUMNS.names}
+            for chunk in chunks:
+                count += len(chunk)
+                for name, spool in spools.items():
+                    spool.write(np.ascontiguousarray(chunk[name]).tobytes())
+                if on_progress:
+                    on_progress(count)
+        else:
+            with open(temp_file, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(EXPORT_COLUMNS.names)
+                for chunk in chunks:
+                    count += len(chunk)
+                    button_names = list(buttons)
+                    writer.writerows(
+                        (repr(t), EVENT_COLUMN_TYPES[code] if code >= 0 else extras[extra]['type'], x, y, dx, dy,
+                         button_names[button], int(pressed), key if key >= 0 else '',
+                         json.dumps(extras[extra]) if extra >= 0 else '')
+                        for t, code, x, y, dx, dy, button, pressed, key, extra in chunk.tolist())
+                    if on_progress:
+                        on_progress(count)
+        
+        meta = {
+            'format': 'namouse-columns',
+            'version': 1,
+            'rows': count,
+            'types': list(EVENT_COLUMN_TYPES),
+            'buttons': list(buttons),
+            'keys': list(keys),
+            'extras': extras,
+            'settings': settings,
+            'metadata': metadata
+        }
+        if spools:
+            with zipfile.ZipFile(temp_file, 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+                for name, spool in spools.items():
+                    with archive.open(name + '.npy', 'w', force_zip64=True) as member:
+                        np.lib.format.write_array_header_1_0(member, {
+                            'descr': np.lib.format.dtype_to_descr(EXPORT_COLUMNS.fields[name][0]),
+                            'fortran_order': False, 'shape': (count,)})
+                        spool.seek(0)
+                        shutil.copyfileobj(spool, member)
+                with archive.open('meta.npy', 'w') as member:
+                    np.lib.format.write_array(member, np.array(json.dumps(meta)))
+        else:
+            # The sidecar is replaced first, so a CSV is never left without its key table
+            with open(meta_file + '.tmp', 'w') as f:
+                json.dump(meta, f, indent=2)
+            os.replace(meta_file + '.tmp', meta_file)
+        os.replace(temp_file, filename)
+    except BaseException:
+        for leftover in (temp_file, meta_file + '.tmp'):
+            try:
+                os.remove(leftover)
+            except OSError:
+                pass
+        raise
+    finally:
+        for spool in spools.values():
+            spool.close()
+    return count
+
+def _column_event(meta, event_time, event_type, x, y, dx, dy, button, pressed, key, extra):
+    """Event dict for one exported row (button is the button's name)"""
+    if extra is not None:
+        return dict(extra, time=event_time)
+    if event_type in ('key_press', 'key_release'):
+        return {'type': event_type, 'time': event_time, 'key': meta['keys'][key]}
+    event = {'type': event_type, 'time': event_time, 'x': x, 'y': y}
+    if event_type == 'mouse_click':
+        event.update(button=button, pressed=bool(pressed))
+    elif event_type == 'mouse_scroll':
+        event.update(dx=dx, dy=dy)
+    return event
+
+def _iter_npy_chunks(archive, name, chunk=COLUMN_EXPORT_CHUNK):
+    """Yield a 1-d .npy member of a zip archive as arrays of up to chunk items, never reading it whole"""
+    with archive.open(name) as member:
+        version = np.lib.format.read_magic(member)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(member)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(member)
+        if len(shape) != 1 or dtype.hasobject:
+            raise ValueError(f"Unexpected column {name} in the export")
+        for start in range(0, shape[0], chunk):
+            size = min(chunk, shape[0] - start)
+            data = member.read(size * dtype.itemsize)
+            if len(data) != size * dtype.itemsize:
+                raise ValueError(f"Column {name} is truncated")
+            yield np.frombuffer(data, dtype=dtype, count=size)
+
+def import_columns(filename):
+    """Load an export_columns file into a flat ChunkedEventList; returns (events, settings, metadata)"""
+    events = ChunkedEventList()
+    if filename.lower().endswith('.npz'):
+        with zipfile.ZipFile(filename) as archive:
+            with archive.open('meta.npy') as member:
+                meta = json.loads(str(np.lib.format.read_array(member)))
+            if meta.get('format') != 'namouse-columns':
+                raise ValueError("Not a NaMouse column export")
+            types = meta['types']
+            buttons = meta['buttons']
+            extras = meta['extras']
+            # Read the columns in step, a chunk at a time
+            columns = [_iter_npy_chunks(archive, name + '.npy') for name in EXPORT_COLUMNS.names]
+            for part in zip(*columns):
+                part = [column.tolist() for column in part]
+                events.extend(_column_event(meta, t, types[code] if code >= 0 else None, x, y, dx, dy,
+                                            buttons[button], pressed, key, extras[extra] if extra >= 0 else None)
+                              for t, code, x, y, dx, dy, button, pressed, key, extra in zip(*part))
+    else:
+        try:
+            with open(filename + COLUMN_META_SUFFIX, 'r') as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            raise ValueError(f"Missing {os.path.basename(filename)}{COLUMN_META_SUFFIX} with the key table")
+        if meta.get('format') != 'namouse-columns':
+            raise ValueError("Not a NaMouse column export")
+        with open(filename, 'r', newline='') as f:
+            reader = csv.reader(f)
+            if next(reader, None) != list(EXPORT_COLUMNS.names):
+                raise ValueError("Not a NaMouse column export")
+            events.extend(_column_event(meta, float(t), event_type, int(x), int(y), int(dx), int(dy),
+                                        button, pressed == '1', int(key) if key else -1,
+                                        json.loads(extra) if extra else None)
+                          for t, event_type, x, y, dx, dy, button, pressed, key, extra in reader)
+    return events, meta.get('settings') or {}, meta.get('metadata') or {}
+
+# Playlists: ordered scripts with per-item speed and repeats
+PLAYLIST_ITEM_DEFAULTS = {'speed': 1.0, 'repeat': 1}
+
+def load_playlist(filename):
+    """Items ({script, speed, repeat}) of a saved playlist"""
+    with open(filename, 'r') as f:
+        data = json.load(f)
+    return [dict(PLAYLIST_ITEM_DEFAULTS, **item) for item in data['items']]
+
+def save_playlist(filename, items):
+    temp_file = filename + '.tmp'
+    with open(temp_file, 'w') as f:
+        json.dump({'version': 1, 'items': items}, f, indent=2)
+    os.replace(temp_file, filename)
+
+class PlaylistPlayer:
+    """Plays playlist items in order while the next one is compiled on a background thread.
+    
+    compile_item(item) parses and prepares a script and play_item(index,
+    item, compiled) plays it, returning its outcome. At most the playing item and
+    the prefetched next one are held in memory. on_result(result) gets each
+    item's result as it finishes; a stopped or failed item ends the run.
+    """
+    
+    def __init__(self, compile_item, play_item, on_result=None):
+        self.compile_item = compile_item
+        self.play_item = play_item
+        self.on_result = on_result
+    
+    def prefetch(self, item):
+        """Start compiling an item; the returned queue receives (compiled, error)"""
+        ready = queue.Queue(maxsize=1)
+        
+        def run():
+            try:
+                ready.put((self.compile_item(item), None))
+            except Exception as e:
+                ready.put((None, str(e)))
+        
+        threading.Thread(target=run, name="Playlist prefetch", daemon=True).start()
+        return ready
+    
+    def run(self, items):
+        """Play every item; returns the per-item results"""
+        results = []
+        next_ready = self.prefetch(items[0]) if items else None
+        for index, item in enumerate(items):
+            waited = time.perf_counter()
+            compiled, error = next_ready.get()
+            waited = time.perf_counter() - waited  # transition time not hidden by the prefetch
+            next_ready = self.prefetch(items[index + 1]) if index + 1 < len(items) else None
+            
+            started = time.time()
+            outcome = self.play_item(index, item, compiled) if error is None else playback_outcome(error=error)
+            compiled = None
+            result = {
+                'index': index,
+                'script': item['script'],
+                'started': started,
+                'waited': waited,
+                'duration': outcome['duration'],
+                'events': outcome['events'],
+                'stopped': outcome['stopped'],
+                'error': outcome['error']
+            }
+            results.append(result)
+            if self.on_result:
+                self.on_result(result)
+            if outcome['stopped'] or outcome['error']:
+                break
+        return results
+
+SCHEDULER_JOBS_FILE = os.path.join(APP_DATA_DIR, 'jobs.json')
+SCHEDULER_HISTORY_FILE = os.path.join(APP_DATA_DIR, 'history.jsonl')
+SCHEDULER_HISTORY_SHOWN = 200
+CRON_FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))  # minute hour day month weekday (0 and 7 = Sunday)
+CRON_SEARCH_DAYS = 366 * 8  # Feb 29 can be 8 years away
+
+def _parse_cron_field(text, low, high):
+    """Values allowed by one cron field: *, n, a-b, lists and /step"""
+    values = set()
+    for part in text.split(','):
+        span, _, step = part.partition('/')
+        step = int(step) if step else 1
+        if span == '*':
+            first, last = low, high
+        elif '-' in span:
+            first, last = (int(v) for v in span.split('-'))
+        else:
+            first = int(span)
+            last = high if step > 1 else first
+        if first < low or last > high or first > last or step < 1:
+            raise ValueError(f"'{part}' is outside {low}-{high}")
+        values.update(range(first, last + 1, step))
+    return values
+
+class CronSchedule:
+    """Five-field cron expression: minute hour day month weekday"""
+    
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError("cron needs 5 fields: minute hour day month weekday")
+        self.expression = expression
+        minutes, hours, days, months, weekdays = (
+            _parse_cron_field(field, low, high) for field, (low, high) in zip(fields, CRON_FIELDS))
+        self.minutes = sorted(minutes)
+        self.hours = sorted(hours)
+        self.days = days
+        self.months = months
+        self.weekdays = {d % 7 for d in weekdays}
+        # As in cron, a restricted day and weekday match either one
+        self.either_day = fields[2] != '*' and fields[4] != '*'
+    
+    def matches_day(self, day):
+        in_days = day.day in self.days
+        in_weekdays = (day.weekday() + 1) % 7 in self.weekdays  # cron weeks start on Sunday
+        if self.either_day:
+            return in_days or in_weekdays
+        return in_days and in_weekdays
+    
+    def next_after(self, timestamp):
+        """First fire time strictly after timestamp, in seconds since the epoch"""
+        start = datetime.fromtimestamp(timestamp).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.date()
+        for _ in range(CRON_SEARCH_DAYS):
+            if day.month in self.months and self.matches_day(day):
+                for hour in self.hours:
+                    for minute in self.minutes:
+                        fire = datetime(day.year, day.month, day.day, hour, minute)
+                        if fire >= start:
+                            return fire.timestamp()
+            day += timedelta(days=1)
+        raise ValueError(f"'{self.expression}' never fires")
+
+class JobScheduler:
+    """Runs queued playback jobs unattended, back-to-back.
+    
+    Jobs wait in a heap ordered by start time and the worker sleeps on a
+    condition until the earliest one is due or the queue changes, so an idle
+    queue costs nothing. Of the jobs that are due, the highest priority runs
+    first. Cron jobs go back into the queue at their next fire time. The queue
+    and a run history survive restarts.
+    """
+    
+    def __init__(self, run_job, jobs_file=SCHEDULER_JOBS_FILE, history_file=SCHEDULER_HISTORY_FILE,
+                 on_change=None, clock=None):
+        self.run_job = run_job  # job -> engine outcome, blocks while the job plays
+        self.clock = clock or SystemClock()
+        self.jobs_file = jobs_file
+        self.history_file = history_file
+        self.on_change = on_change  # called from any thread when jobs or history change
+        self.condition = threading.Condition()
+        self.pending = []  # heap of (start, seq, job)
+        self.ready = []  # heap of (-priority, start, seq, job), all due
+        self.seq = itertools.count()
+        self.next_id = 1
+        self.running = None
+        self.held = False
+        self.closed = False
+        self.thread = None
+    
+    def start(self):
+        self.load()
+        self.thread = threading.Thread(target=self.run, name="Scheduler", daemon=True)
+        self.thread.start()
+    
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+    
+    def load(self):
+        """Restore the saved queue; jobs missed while closed become due at once"""
+        try:
+            with open(self.jobs_file, 'r') as f:
+                jobs = json.load(f)
+        except (OSError, ValueError):
+            return
+        with self.condition:
+            for job in jobs:
+                self.next_id = max(self.next_id, job['id'] + 1)
+                heapq.heappush(self.pending, (job['start'], next(self.seq), job))
+            self.condition.notify_all()
+    
+    def save(self):
+        """Write the queue (call with the condition held)"""
+        jobs = [entry[-1] for entry in self.ready + self.pending]
+        if self.running and self.running.get('cron'):
+            jobs.append(self.running)  # re-queued after the run, keep it if we exit mid-run
+        os.makedirs(os.path.dirname(self.jobs_file), exist_ok=True)
+        temp_file = self.jobs_file + '.tmp'
+        with open(temp_file, 'w') as f:
+            json.dump(jobs, f, indent=2)
+        os.replace(temp_file, self.jobs_file)
+    
+    def changed(self):
+        if self.on_change:
+            self.on_change()
+    
+    def add_job(self, script, start=None, settings=None, cron='', priority=0):
+        """Queue a script; start is a timestamp, or the next cron fire time if omitted"""
+        if cron:
+            schedule = CronSchedule(cron)
+            if start is None:
+                start = schedule.next_after(self.clock.now())
+        with self.condition:
+            job = {
+                'id': self.next_id,
+                'name': os.path.basename(script),
+                'script': script,
+                'start': self.clock.now() if start is None else start,
+                'cron': cron,
+                'priority': priority,
+                'settings': settings or {}
+            }
+            self.next_id += 1
+            heapq.heappush(self.pending, (job['start'], next(self.seq), job))
+            self.save()
+            self.condition.notify_all()
+        self.changed()
+        return job
+    
+    def remove_job(self, job_id):
+        with self.condition:
+            self.pending = [entry for entry in self.pending if entry[-1]['id'] != job_id]
+            self.ready = [entry for entry in self.ready if entry[-1]['id'] != job_id]
+            heapq.heapify(self.pending)
+            heapq.heapify(self.ready)
+            if self.running and self.running['id'] == job_id:
+                self.running = dict(self.running, cron='')  # let the current run finish, don't re-queue
+            self.save()
+            self.condition.notify_all()
+        self.changed()
+    
+    def set_held(self, held):
+        """Hold the queue: due jobs wait until it is released"""
+        with self.condition:
+            self.held = held
+            self.condition.notify_all()
+        self.changed()
+    
+    def jobs(self):
+        """Running job (if any), due jobs in run order, then the rest by start time"""
+        with self.condition:
+            jobs = [entry[-1] for entry in sorted(self.ready)] + [entry[-1] for entry in sorted(self.pending)]
+            return ([self.running] if self.running else []), jobs
+    
+    def next_job(self):
+        """Block until a job is due and the queue is not held; None once closed"""
+        with self.condition:
+            while not self.closed:
+                now = self.clock.now()
+                while self.pending and self.pending[0][0] <= now:
+                    start, seq, job = heapq.heappop(self.pending)
+                    heapq.heappush(self.ready, (-job['priority'], start, seq, job))
+                if self.ready and not self.held:
+                    self.running = heapq.heappop(self.ready)[-1]
+                    return self.running
+                # Sleep until the next start time; add/remove/hold notify early
+                timeout = self.pending[0][0] - now if self.pending and not self.held else None
+                self.clock.wait(self.condition, timeout)
+            return None
+    
+    def run(self):
+        while True:
+            job = self.next_job()
+            if job is None:
+                return
+            self.changed()
+            
+            started = self.clock.now()
+            try:
+                outcome = self.run_job(job)
+            except Exception as e:
+                print(f"Scheduled job error: {e}")
+                outcome = playback_outcome(duration=self.clock.now() - started, error=str(e))
+            self.record(job, started, outcome)
+            
+            with self.condition:
+                job = self.running
+                self.running = None
+                if job['cron']:
+                    try:
+                        job['start'] = CronSchedule(job['cron']).next_after(max(self.clock.now(), job['start']))
+                        heapq.heappush(self.pending, (job['start'], next(self.seq), job))
+                    except ValueError as e:
+                        print(f"Scheduled job error: {e}")
+                try:
+                    self.save()
+                except OSError as e:
+                    print(f"Failed to save job queue: {e}")
+            self.changed()
+    
+    def record(self, job, started, outcome):
+        """Append one run to the persistent history"""
+        if outcome['error']:
+            result = 'error'
+        elif outcome['stopped']:
+            result = 'stopped'
+        else:
+            result = 'completed'
+        entry = {
+            'job': job['id'],
+            'name': job['name'],
+            'script': job['script'],
+            'scheduled': job['start'],
+            'started': started,
+            'duration': outcome['duration'],
+            'events': outcome['events'],
+            'outcome': result,
+            'error': outcome['error']
+        }
+        try:
+            os.makedirs(os.path.dirname(self.history_file), exist_ok=True)
+            with open(self.history_file, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+        except OSError as e:
+            print(f"Failed to write run history: {e}")
+    
+    def history(self, limit=SCHEDULER_HISTORY_SHOWN):
+        """Most recent runs, newest first"""
+        try:
+            with open(self.history_file, 'r') as f:
+                lines = deque(f, maxlen=limit)
+        except OSError:
+            return []
+        return [json.loads(line) for line in reversed(lines) if line.strip()]
+
+SCRIPT_CACHE_SIZE = 16
+LATENCY_SAMPLES = 256
+CONTROL_API_HOST = '127.0.0.1'  # never reachable from other machines
+CONTROL_API_PORT = 8765
+CONTROL_API_TOKEN_FILE = os.path.join(APP_DATA_DIR, 'api_token')
+CONTROL_API_HOSTS = ('127.0.0.1', 'localhost')
+
+def load_api_token(create=False, filename=CONTROL_API_TOKEN_FILE):
+    """The control API's per-install token, generated and stored on first use when create is set"""
+    return load_secret(filename, create)
+
+class ScriptCache:
+    """LRU of parsed scripts keyed by path, revalidated against the file's mtime and size"""
+    
+    def __init__(self, size=SCRIPT_CACHE_SIZE):
+        self.size = size
+        self.scripts = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, path):
+        """Return (script, hit); a changed file is parsed again"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            script = self.scripts.get(path)
+            if script and script['stamp'] == stamp:
+                self.scripts.move_to_end(path)
+                self.hits += 1
+                return script, True
+            self.misses += 1
+        
+        # Parse outside the lock so a slow file doesn't hold up hits on others
+        script = self.compile(path, stamp)
+        with self.lock:
+            self.scripts[path] = script
+            self.scripts.move_to_end(path)
+            while len(self.scripts) > self.size:
+                self.scripts.popitem(last=False)
+        return script, False
+    
+    def compile(self, path, stamp):
+        """Everything playback needs, parsed once"""
+        data = read_script_file(path)
+        metadata = data['metadata']
+        screen = None
+        if metadata.get('screen_width') and metadata.get('screen_height'):
+            screen = (metadata['screen_width'], metadata['screen_height'])
+        return {
+            'path': path,
+            'name': os.path.basename(path),
+            'stamp': stamp,
+            'events': data['events'],
+            'blocks': data['blocks'],
+            'settings': data['settings'],
+            'screen': screen,
+            'duration': script_duration(data['events'], data['blocks'])
+        }
+    
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'scripts': len(self.scripts),
+                'capacity': self.size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+    
+    def entries(self):
+        """Cached scripts, most recently used first"""
+        with self.lock:
+            return [{'script': script['path'], 'events': len(script['events']), 'duration': script['duration']}
+                    for script in reversed(self.scripts.values())]
+
+class LatencyStats:
+    """Recent latency samples (seconds), summarized in milliseconds"""
+    
+    def __init__(self, limit=LATENCY_SAMPLES):
+        self.samples = deque(maxlen=limit)
+        self.lock = threading.Lock()
+    
+    def add(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+    
+    def summary(self):
+        with self.lock:
+            samples = sorted(self.samples)
+            last = self.samples[-1] if self.samples else 0.0
+        if not samples:
+            return {'count': 0}
+        return {
+            'count': len(samples),
+            'last_ms': last * 1000,
+            'mean_ms': sum(samples) / len(samples) * 1000,
+            'p50_ms': samples[len(samples) // 2] * 1000,
+            'p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+            'max_ms': samples[-1] * 1000
+        }
+
+class ControlRequestHandler(BaseHTTPRequestHandler):
+    """JSON control endpoints.
+    
+    GET  /status, /stats, /scripts
+    POST /load {"script": path}
+    POST /play {"script": path, "settings": {...}}
+    POST /stop
+    
+    Every request needs "Authorization: Bearer <token>" with the per-install
+    token, and a local Host. Requests with an Origin header come from a web
+    page and are refused, and POST bodies must be application/json, so a
+    cross-site form or text/plain post cannot start playback.
+    """
+    
+    def log_message(self, format, *args):
+        pass  # keep the console for errors
+    
+    def send_json(self, status, body):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+    
+    def authorized(self):
+        """Check where the request came from and its token; sends the error response if refused"""
+        host = (self.headers.get('Host') or '').rsplit(':', 1)[0].strip('[]').lower()
+        if self.headers.get('Origin') is not None or host not in CONTROL_API_HOSTS:
+            self.send_json(403, {'error': 'browser and non-local requests are not accepted'})
+            return False
+        scheme, _, token = (self.headers.get('Authorization') or '').partition(' ')
+        if scheme.lower() != 'bearer' or not hmac.compare_digest(token.strip().encode('utf-8'),
+                                                                 self.server.token.encode('utf-8')):
+            self.send_json(401, {'error': 'missing or wrong token'})
+            return False
+        return True
+    
+    def do_GET(self):
+        if not self.authorized():
+            return
+        app = self.server.app
+        routes = {'/status': app.api_status, '/stats': app.api_stats, '/scripts': app.api_scripts}
+        route = routes.get(self.path.split('?')[0])
+        if route is None:
+            self.send_json(404, {'error': 'not found'})
+            return
+        self.send_json(200, route())
+    
+    def do_POST(self):
+        trigger_time = time.time()
+        if not self.authorized():
+            return
+        content_type = (self.headers.get('Content-Type') or '').split(';')[0].strip().lower()
+        if content_type != 'application/json':
+            self.send_json(415, {'error': 'Content-Type must be application/json'})
+            return
+        app = self.server.app
+        path = self.path.split('?')[0]
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            body = json.loads(self.rfile.read(length)) if length else {}
+        except ValueError:
+            self.send_json(400, {'error': 'invalid JSON body'})
+            return
+        if not isinstance(body, dict):
+            self.send_json(400, {'error': 'body must be a JSON object'})
+            return
+        
+        if path == '/play':
+            status, result = app.api_play(body, trigger_time)
+        elif path == '/load':
+            status, result = app.api_load(body)
+        elif path == '/stop':
+            status, result = app.api_stop()
+        else:
+            status, result = 404, {'error': 'not found'}
+        self.send_json(status, result)
+
+class ControlServer(ThreadingHTTPServer):
+    daemon_threads = True
+    
+    def __init__(self, app, token, port=CONTROL_API_PORT):
+        super().__init__((CONTROL_API_HOST, port), ControlRequestHandler)
+        self.app = app
+        self.token = token
 
 class NaMouseApp:
     def __init__(self, root):
@@ -35,11 +3888,23 @@ class NaMouseApp:
         # Variables
         self.is_recording = False
         self.is_playing = False
-        self.is_paused = False
-        self.recorded_events = []
+        self.recorded_events = ChunkedEventList()
+        self.script_blocks = {}  # Shared blocks referenced by 'block' events
+        self.script_screen = (self.actual_screen_width, self.actual_screen_height)  # Display it was recorded on
+        self.time_index = None
+        self.query_index = None
+        self.event_query = None  # Parsed filter shown in the script view, or None for all rows
+        self.path = PathPyramid()
+        self.path_key = None  # (events id, version) the path view was built from
+        self.path_fed = 0  # top-level events already in the path, for recording's appends
+        self.path_build = None  # (time, event) iterator still being indexed
+        self.path_view = None  # [scale, x offset, y offset], or None to fit the whole path
+        self.path_drag = (0, 0)
+        self.history = EditHistory()
         self.start_time = None
         self.playback_thread = None
-        self.playback_stop_event = threading.Event()
+        self.playback_token = 0  # bumped per run, so a stopped run can't clear the next one's state
+        self.now_playing = None
         
         # Settings variables
         self.playback_speed = tk.DoubleVar(value=1.0)
@@ -47,9 +3912,22 @@ class NaMouseApp:
         self.repeat_interval = tk.DoubleVar(value=0.0)
         self.current_file = None
         self.mouse_smoothing = tk.BooleanVar(value=False)  # Disabled by default for stability
+        self.smoothing_curve = tk.StringVar(value="catmull_rom")
+        self.smoothing_rate = tk.DoubleVar(value=60.0)  # points per second between recorded moves
         self.ignore_minimal_movements = tk.BooleanVar(value=True)
         self.minimal_movement_threshold = tk.IntVar(value=3)
         self.force_position = tk.BooleanVar(value=True)  # NEW: Force exact positioning
+        self.max_idle_gap = tk.DoubleVar(value=0.0)  # 0 = replay idle gaps in full
+        self.idle_gap_threshold = tk.DoubleVar(value=1.0)
+        self.idle_speed = tk.DoubleVar(value=0.0)  # 0 = same as playback speed
+        self.fast_mode = tk.BooleanVar(value=False)  # Ignore recorded timing entirely
+        self.typing_rate = tk.DoubleVar(value=0.0)  # chars/s for typed text, 0 = recorded cadence
+        self.remap_mode = tk.StringVar(value="scale")  # off / scale / anchors
+        self.remap_anchors = tk.StringVar(value="")
+        self.remap_info = tk.StringVar(value="")
+        self.calibrated_settle = tk.BooleanVar(value=False)  # settles from this machine's calibration
+        self.separate_process = tk.BooleanVar(value=False)  # play in a worker process, away from the UI
+        self.settle_info = tk.StringVar(value="")
         
         # Hotkeys
         self.record_hotkey = tk.StringVar(value="F9")
@@ -74,6 +3952,40 @@ class NaMouseApp:
         self.mouse_listener = None
         self.keyboard_listener = None
         self.hotkey_listener = None
+        self.engine = PlaybackEngine(self.mouse_controller, self.keyboard_controller,
+                                     on_progress=lambda p: self.root.after(0, lambda: self.progress_var.set(p)))
+        self.engine.settle_profile = SettleProfile.load()
+        self.settle_info.set(self.engine.settle_profile.describe())
+        self.process_player = PlaybackProcess(self.engine)
+        self.active_player = self.engine  # whichever of the two runs the current script
+        self.input_idle = threading.Condition()  # scheduled jobs wait here for recording/playback to end
+        self.scheduler = JobScheduler(self.run_scheduled_job,
+                                      on_change=lambda: self.root.after(0, self.refresh_scheduler_dialog))
+        self.scheduler_dialog = None
+        self.playlist_items = []
+        self.playlist_results = {}  # item index -> result of the last playlist run
+        self.playlist_dialog = None
+        self.script_cache = ScriptCache()
+        self.trigger_latency = LatencyStats()
+        self.control_server = None
+        self.api_enabled = tk.BooleanVar(value=False)
+        self.api_port = tk.IntVar(value=CONTROL_API_PORT)
+        self.api_token = tk.StringVar(value=load_api_token() or "(created when first enabled)")
+        self.tracing = tk.BooleanVar(value=False)
+        self.save_status = tk.StringVar(value="")
+        self.saver = BackgroundSaver(
+            on_progress=lambda filename, fraction: self.root.after(
+                0, lambda: self.save_status.set(f"Saving {os.path.basename(filename)}... {fraction:.0%}")),
+            on_done=lambda filename, error: self.root.after(0, lambda: self.save_finished(filename, error)))
+        self.query_text = tk.StringVar(value="")
+        self.query_info = tk.StringVar(value=QUERY_HINT)
+        self.path_position = tk.DoubleVar(value=1.0)  # where the time window sits, 0-1
+        self.path_window = tk.DoubleVar(value=0.0)  # seconds shown, 0 for the whole script
+        self.path_clicks = tk.BooleanVar(value=True)
+        self.path_heatmap = tk.BooleanVar(value=False)
+        self.path_info = tk.StringVar(value="")
+        tracer.on_profile = lambda name, stats_file: self.root.after(
+            0, lambda: messagebox.showinfo("Profile Saved", f"cProfile stats for {name}:\n{stats_file}"))
         
         # Statistics
         self.total_events = tk.StringVar(value="0")
@@ -83,7 +3995,9 @@ class NaMouseApp:
         self.recording_start_time = None
         
         self.setup_ui()
+        self.update_remap_info()
         self.setup_global_hotkeys()
+        self.scheduler.start()
         
     def setup_ui(self):
         # Style configuration
@@ -102,14 +4016,48 @@ class NaMouseApp:
         file_menu.add_command(label="Save As", command=self.save_script_as, accelerator="Ctrl+Shift+S")
         file_menu.add_separator()
         file_menu.add_command(label="Export as Python", command=self.export_as_python)
+        file_menu.add_command(label="Export Columns (CSV/NPZ)...", command=self.export_columns)
+        file_menu.add_command(label="Import Columns (CSV/NPZ)...", command=self.import_columns)
         file_menu.add_separator()
         file_menu.add_command(label="Exit", command=self.on_closing)
         
+        playback_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="Playback", menu=playback_menu)
+        playback_menu.add_command(label="Play", command=self.start_playback)
+        playback_menu.add_command(label="Play From Selected", command=self.play_from_selected)
+        playback_menu.add_command(label="Play Selection", command=self.play_selection)
+        playback_menu.add_separator()
+        playback_menu.add_command(label="Play From Time...", command=self.play_from_time)
+        playback_menu.add_command(label="Play Time Window...", command=self.play_time_window)
+        
         edit_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="Edit", menu=edit_menu)
+        edit_menu.add_command(label="Undo", command=self.undo, accelerator="Ctrl+Z")
+        edit_menu.add_command(label="Redo", command=self.redo, accelerator="Ctrl+Y")
+        edit_menu.add_separator()
         edit_menu.add_command(label="Clear All", command=self.clear_script)
         edit_menu.add_command(label="Delete Selected", command=self.delete_selected)
         edit_menu.add_command(label="Optimize Script", command=self.optimize_script)
+        edit_menu.add_command(label="Bulk Edit...", command=self.show_bulk_edit)
+        edit_menu.add_command(label="Coalesce Typed Text", command=self.coalesce_typed_text)
+        edit_menu.add_command(label="Compress Repeated Blocks", command=self.compress_repeated_blocks)
+        edit_menu.add_command(label="Expand Blocks", command=self.expand_blocks)
+        edit_menu.add_separator()
+        edit_menu.add_command(label="Analyze Idle Gaps", command=self.show_idle_gap_analysis)
+        
+        tools_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="Tools", menu=tools_menu)
+        tools_menu.add_command(label="Dry Run...", command=self.dry_run)
+        tools_menu.add_command(label="Fidelity Check...", command=self.fidelity_check)
+        tools_menu.add_command(label="Scheduler...", command=self.show_scheduler)
+        tools_menu.add_command(label="Playlist...", command=self.show_playlist)
+        tools_menu.add_command(label="Script Cache...", command=self.show_script_cache)
+        tools_menu.add_separator()
+        tools_menu.add_checkbutton(label="Tracing", variable=self.tracing, command=self.toggle_tracing)
+        profile_menu = tk.Menu(tools_menu, tearoff=0)
+        tools_menu.add_cascade(label="Profile Next", menu=profile_menu)
+        for operation in TRACED_OPERATIONS:
+            profile_menu.add_command(label=operation, command=lambda name=operation: self.arm_profile(name))
         
         # Main Control Frame
         control_frame = ttk.Frame(self.root, padding="10")
@@ -161,10 +4109,12 @@ class NaMouseApp:
         ttk.Label(stats_frame, textvariable=self.total_events).grid(row=0, column=1, padx=5)
         ttk.Label(stats_frame, text="Duration:").grid(row=0, column=2, padx=5)
         ttk.Label(stats_frame, textvariable=self.recording_duration).grid(row=0, column=3, padx=5)
+        ttk.Label(status_frame, textvariable=self.save_status, foreground="gray").pack()
         
         # Notebook for tabs
         notebook = ttk.Notebook(self.root)
         notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        self.notebook = notebook
         
         # Settings Tab
         settings_frame = ttk.Frame(notebook)
@@ -212,6 +4162,28 @@ class NaMouseApp:
         ttk.Spinbox(playback_group, from_=0, to=999, textvariable=self.repeat_interval,
                    increment=0.1, format="%.1f", width=10).grid(row=2, column=1, sticky=tk.W, pady=5)
         
+        ttk.Label(playback_group, text="Max Gap (s):").grid(row=3, column=0, sticky=tk.W, pady=5)
+        ttk.Spinbox(playback_group, from_=0, to=999, textvariable=self.max_idle_gap,
+                   increment=0.5, format="%.1f", width=10).grid(row=3, column=1, sticky=tk.W, pady=5)
+        ttk.Label(playback_group, text="(0 = no cap)").grid(row=3, column=2, sticky=tk.W, pady=5)
+        
+        ttk.Label(playback_group, text="Idle Threshold (s):").grid(row=4, column=0, sticky=tk.W, pady=5)
+        ttk.Spinbox(playback_group, from_=0.1, to=999, textvariable=self.idle_gap_threshold,
+                   increment=0.1, format="%.1f", width=10).grid(row=4, column=1, sticky=tk.W, pady=5)
+        
+        ttk.Label(playback_group, text="Idle Gap Speed:").grid(row=5, column=0, sticky=tk.W, pady=5)
+        ttk.Spinbox(playback_group, from_=0, to=100, textvariable=self.idle_speed,
+                   increment=0.5, format="%.1f", width=10).grid(row=5, column=1, sticky=tk.W, pady=5)
+        ttk.Label(playback_group, text="(0 = playback speed)").grid(row=5, column=2, sticky=tk.W, pady=5)
+        
+        ttk.Checkbutton(playback_group, text="As Fast As Possible (ignore recorded timing)",
+                       variable=self.fast_mode).grid(row=6, column=0, columnspan=3, sticky=tk.W, pady=5)
+        
+        ttk.Label(playback_group, text="Typing Rate (chars/s):").grid(row=7, column=0, sticky=tk.W, pady=5)
+        ttk.Spinbox(playback_group, from_=0, to=1000, textvariable=self.typing_rate,
+                   increment=10, format="%.0f", width=10).grid(row=7, column=1, sticky=tk.W, pady=5)
+        ttk.Label(playback_group, text="(0 = recorded cadence)").grid(row=7, column=2, sticky=tk.W, pady=5)
+        
         # Performance Settings
         performance_group = ttk.LabelFrame(scrollable_frame, text="Performance Settings", padding="10")
         performance_group.pack(fill=tk.X, padx=10, pady=5)
@@ -220,10 +4192,26 @@ class NaMouseApp:
                        variable=self.use_high_precision).pack(anchor=tk.W, pady=2)
         ttk.Checkbutton(performance_group, text="Mouse Movement Smoothing (Experimental)",
                        variable=self.mouse_smoothing).pack(anchor=tk.W, pady=2)
+        smoothing_frame = ttk.Frame(performance_group)
+        smoothing_frame.pack(anchor=tk.W, pady=2)
+        ttk.Label(smoothing_frame, text="Curve:").pack(side=tk.LEFT)
+        ttk.Combobox(smoothing_frame, textvariable=self.smoothing_curve, values=SMOOTHING_CURVES,
+                     state="readonly", width=12).pack(side=tk.LEFT, padx=5)
+        ttk.Label(smoothing_frame, text="Rate (Hz):").pack(side=tk.LEFT)
+        ttk.Spinbox(smoothing_frame, from_=10, to=1000, textvariable=self.smoothing_rate,
+                   increment=10, format="%.0f", width=8).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(performance_group, text="Play in Separate Process (steadier timing while editing)",
+                       variable=self.separate_process).pack(anchor=tk.W, pady=2)
         ttk.Checkbutton(performance_group, text="Force Exact Position (For Taskbar)",
                        variable=self.force_position).pack(anchor=tk.W, pady=2)
         ttk.Checkbutton(performance_group, text="Ignore Minimal Movements",
                        variable=self.ignore_minimal_movements).pack(anchor=tk.W, pady=2)
+        ttk.Checkbutton(performance_group, text="Calibrated Settle Delays (instead of fixed 30/10/10 ms)",
+                       variable=self.calibrated_settle).pack(anchor=tk.W, pady=2)
+        settle_frame = ttk.Frame(performance_group)
+        settle_frame.pack(anchor=tk.W, pady=2)
+        ttk.Button(settle_frame, text="Calibrate", command=self.calibrate_settles).pack(side=tk.LEFT)
+        ttk.Label(settle_frame, textvariable=self.settle_info, wraplength=520).pack(side=tk.LEFT, padx=5)
         
         threshold_frame = ttk.Frame(performance_group)
         threshold_frame.pack(anchor=tk.W, pady=2)
@@ -231,6 +4219,41 @@ class NaMouseApp:
         ttk.Spinbox(threshold_frame, from_=1, to=50, textvariable=self.minimal_movement_threshold,
                    width=10).pack(side=tk.LEFT, padx=5)
         
+        # Coordinate Remapping
+        remap_group = ttk.LabelFrame(scrollable_frame, text="Coordinate Remapping", padding="10")
+        remap_group.pack(fill=tk.X, padx=10, pady=5)
+        
+        ttk.Label(remap_group, textvariable=self.remap_info).pack(anchor=tk.W, pady=2)
+        ttk.Radiobutton(remap_group, text="Off (use recorded coordinates)", value="off",
+                       variable=self.remap_mode).pack(anchor=tk.W, pady=2)
+        ttk.Radiobutton(remap_group, text="Scale to this screen", value="scale",
+                       variable=self.remap_mode).pack(anchor=tk.W, pady=2)
+        ttk.Radiobutton(remap_group, text="Anchor points (piecewise)", value="anchors",
+                       variable=self.remap_mode).pack(anchor=tk.W, pady=2)
+        
+        anchors_frame = ttk.Frame(remap_group)
+        anchors_frame.pack(anchor=tk.W, pady=2)
+        ttk.Label(anchors_frame, text="Anchors (x,y=x,y; ...):").pack(side=tk.LEFT)
+        ttk.Entry(anchors_frame, textvariable=self.remap_anchors, width=40).pack(side=tk.LEFT, padx=5)
+        
+        # Control API
+        api_group = ttk.LabelFrame(scrollable_frame, text="Control API", padding="10")
+        api_group.pack(fill=tk.X, padx=10, pady=5)
+        
+        ttk.Checkbutton(api_group, text=f"Enable HTTP control on {CONTROL_API_HOST}",
+                       variable=self.api_enabled, command=self.toggle_control_api).pack(anchor=tk.W, pady=2)
+        api_port_frame = ttk.Frame(api_group)
+        api_port_frame.pack(anchor=tk.W, pady=2)
+        ttk.Label(api_port_frame, text="Port:").pack(side=tk.LEFT)
+        ttk.Entry(api_port_frame, textvariable=self.api_port, width=8).pack(side=tk.LEFT, padx=5)
+        api_token_frame = ttk.Frame(api_group)
+        api_token_frame.pack(anchor=tk.W, pady=2)
+        ttk.Label(api_token_frame, text="Token:").pack(side=tk.LEFT)
+        ttk.Entry(api_token_frame, textvariable=self.api_token, width=50, state='readonly').pack(side=tk.LEFT, padx=5)
+        ttk.Label(api_group, text="GET /status /stats /scripts, POST /load /play /stop (JSON)").pack(anchor=tk.W, pady=2)
+        ttk.Label(api_group, text="Send the token as 'Authorization: Bearer <token>'; browser requests are refused",
+                  foreground="gray").pack(anchor=tk.W, pady=2)
+        
         # Recording Filter
         filter_group = ttk.LabelFrame(scrollable_frame, text="Recording Filter", padding="10")
         filter_group.pack(fill=tk.X, padx=10, pady=5)
@@ -274,6 +4297,23 @@ class NaMouseApp:
         ttk.Button(script_toolbar, text="Delete Selected", command=self.delete_selected).pack(side=tk.LEFT, padx=2)
         ttk.Button(script_toolbar, text="Insert Delay", command=self.insert_delay).pack(side=tk.LEFT, padx=2)
         ttk.Button(script_toolbar, text="Optimize", command=self.optimize_script).pack(side=tk.LEFT, padx=2)
+        ttk.Button(script_toolbar, text="Bulk Edit", command=self.show_bulk_edit).pack(side=tk.LEFT, padx=2)
+        ttk.Button(script_toolbar, text="Loop", command=self.wrap_selection_in_loop).pack(side=tk.LEFT, padx=2)
+        ttk.Button(script_toolbar, text="Section", command=self.wrap_selection_in_section).pack(side=tk.LEFT, padx=2)
+        ttk.Button(script_toolbar, text="Call Script", command=self.insert_call).pack(side=tk.LEFT, padx=2)
+        ttk.Button(script_toolbar, text="Wait For", command=self.insert_wait_for).pack(side=tk.LEFT, padx=2)
+        
+        # Filter bar
+        filter_bar = ttk.Frame(script_frame)
+        filter_bar.pack(fill=tk.X, padx=5)
+        
+        ttk.Label(filter_bar, text="Filter:").pack(side=tk.LEFT, padx=2)
+        query_entry = ttk.Entry(filter_bar, textvariable=self.query_text, width=50)
+        query_entry.pack(side=tk.LEFT, padx=2)
+        query_entry.bind("<Return>", lambda e: self.apply_query())
+        ttk.Button(filter_bar, text="Apply", command=self.apply_query).pack(side=tk.LEFT, padx=2)
+        ttk.Button(filter_bar, text="Clear", command=self.clear_query).pack(side=tk.LEFT, padx=2)
+        ttk.Label(filter_bar, textvariable=self.query_info, foreground="gray").pack(side=tk.LEFT, padx=5)
         
                 # Treeview for script display
         tree_frame = ttk.Frame(script_frame)
@@ -281,6 +4321,9 @@ class NaMouseApp:
         
         columns = ("Index", "Type", "Action", "Details", "Time")
         self.script_tree = ttk.Treeview(tree_frame, columns=columns, show="tree headings", height=15)
+        self.script_tree.column("#0", width=30, stretch=False)
+        self.script_tree.bind("<<TreeviewOpen>>", self.on_tree_open)
+        self.tree_bodies = {}  # Collapsed node item -> (body events, blocks, index prefix)
         
         column_widths = {"Index": 50, "Type": 100, "Action": 100, "Details": 300, "Time": 100}
         for col in columns:
@@ -299,6 +4342,34 @@ class NaMouseApp:
         tree_frame.grid_rowconfigure(0, weight=1)
         tree_frame.grid_columnconfigure(0, weight=1)
         
+        # Path Tab
+        self.path_frame = ttk.Frame(notebook)
+        notebook.add(self.path_frame, text="Path")
+        
+        path_toolbar = ttk.Frame(self.path_frame)
+        path_toolbar.pack(fill=tk.X, padx=5, pady=5)
+        
+        ttk.Label(path_toolbar, text="Window (s):").pack(side=tk.LEFT, padx=2)
+        ttk.Spinbox(path_toolbar, from_=0, to=99999, textvariable=self.path_window, width=8,
+                    command=self.draw_path).pack(side=tk.LEFT, padx=2)
+        ttk.Checkbutton(path_toolbar, text="Clicks", variable=self.path_clicks,
+                        command=self.draw_path).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(path_toolbar, text="Heatmap", variable=self.path_heatmap,
+                        command=self.draw_path).pack(side=tk.LEFT, padx=5)
+        ttk.Button(path_toolbar, text="Reset View", command=self.reset_path_view).pack(side=tk.LEFT, padx=5)
+        ttk.Label(path_toolbar, textvariable=self.path_info, foreground="gray").pack(side=tk.LEFT, padx=5)
+        
+        self.path_canvas = tk.Canvas(self.path_frame, bg='white', highlightthickness=0)
+        self.path_canvas.pack(fill=tk.BOTH, expand=True, padx=5)
+        self.path_canvas.bind("<Configure>", lambda e: self.draw_path())
+        self.path_canvas.bind("<MouseWheel>", self.zoom_path)
+        self.path_canvas.bind("<ButtonPress-1>", self.start_path_pan)
+        self.path_canvas.bind("<B1-Motion>", self.pan_path)
+        
+        ttk.Scale(self.path_frame, from_=0.0, to=1.0, variable=self.path_position,
+                  command=lambda value: self.draw_path()).pack(fill=tk.X, padx=5, pady=5)
+        notebook.bind("<<NotebookTabChanged>>", lambda e: self.draw_path())
+        
         # Info Tab
         info_frame = ttk.Frame(notebook)
         notebook.add(info_frame, text="Help")
@@ -311,12 +4382,34 @@ Developed by Nader Mahbub Khan
 FEATURES:
 • Record mouse movements, clicks, and keyboard input
 • Adjustable playback speed (0.1x - 5.0x)
+• Mouse smoothing (linear, Bezier or Catmull-Rom) fitted into the recorded gaps
+• "As Fast As Possible" mode for scripts where only order matters
 • Repeat actions with custom intervals
-• Save and load automation scripts
+• Idle gap compression (cap or speed up long pauses)
+• Save and load automation scripts (saved in the background, written atomically)
 • Pause/resume during playback
+• Play from a selected row or timestamp, or only a selection
+• Script filter by type, key, button, time window and screen region
+• Path tab: recorded trajectory, clicks and heatmap, with zoom, pan and a timeline
+• Bulk edits on a selection or filter result (retime, move, rescale, buttons)
 • Script optimization
+• Repeated-segment compression into reusable blocks
+• Loops, labeled sections, script calls and wait-for-color steps
+• Typed text coalescing with adjustable typing rate
+• Undo/redo for all script edits (Ctrl+Z / Ctrl+Y)
 • Export as Python code
+• CSV / NPZ column export and import for offline analysis
 • FIXED: Full taskbar support with forced positioning
+• Coordinate remapping for scripts recorded on other resolutions
+• Tracing to Chrome trace JSON (Perfetto) and cProfile capture
+• Settle delays calibrated per machine and tuned during playback
+• Dry run: predicted duration, timing drift and per-segment cost
+• Fidelity check: replay against a fake backend, scored against error and lateness limits
+  (also from the command line: main.py --fidelity script.nam)
+• Scheduler for unattended runs (start time or cron, priorities, run history)
+• Playlists of scripts with per-item speed and repeats; the next script loads while one plays
+• Localhost control API for triggering scripts from other tools (token-protected)
+• Optional playback in a separate process, fed from shared memory
 
 HOTKEYS (Default):
 • F9  - Start Recording
@@ -339,6 +4432,8 @@ HOW TO USE:
         self.root.bind('<Control-o>', lambda e: self.open_script())
         self.root.bind('<Control-s>', lambda e: self.save_script())
         self.root.bind('<Control-Shift-S>', lambda e: self.save_script_as())
+        self.root.bind('<Control-z>', lambda e: self.undo())
+        self.root.bind('<Control-y>', lambda e: self.redo())
     
     def setup_global_hotkeys(self):
         """Setup keyboard listener for global hotkeys"""
@@ -367,28 +4462,10 @@ HOW TO USE:
                         self.root.after(0, self.pause_playback)
                         
             except Exception:
-                pass
-        
-        self.hotkey_listener = keyboard.Listener(on_press=on_press)
-        self.hotkey_listener.start()
-    
-    def set_mouse_position_forced(self, x, y):
-        """Force mouse to exact position with multiple attempts"""
-        target_x = int(x)
-        target_y = int(y)
-        
-        if self.force_position.get():
-            # Multiple attempts to ensure position is set
-            for attempt in range(3):
-                self.mouse_controller.position = (target_x, target_y)
-                time.sleep(0.005)  # Small delay between attempts
-                
-                # Verify position
-                current_pos = self.mouse_controller.position
-                if abs(current_pos[0] - target_x) <= 1 and abs(current_pos[1] - target_y) <= 1:
-                    break
-        else:
-            self.mouse_controller.position = (target_x, target_y)
+                pass
+        
+        self.hotkey_listener = keyboard.Listener(on_press=on_press)
+        self.hotkey_listener.start()
     
     def validate_mouse_position(self, x, y):
         """Ensure mouse position is within screen boundaries including taskbar"""
@@ -397,20 +4474,21 @@ HOW TO USE:
         y = max(0, min(y, self.actual_screen_height - 1))
         return x, y
     
-    def validate_mouse_position_for_playback(self, x, y):
-        """Special validation for playback that preserves exact positions"""
-        # During playback, we want to preserve the exact recorded position
-        # No modification - just ensure it's an integer
-        return int(x), int(y)
-    
     def start_recording(self):
         """Start recording with improved event handling"""
-        if self.is_playing:
+        with self.input_idle:
+            playing = self.is_playing
+            if not playing:
+                self.is_recording = True
+        if playing:
             messagebox.showwarning("Warning", "Cannot record while playing!")
             return
         
-        self.is_recording = True
-        self.recorded_events = []
+        self.push_undo()
+        self.recorded_events = ChunkedEventList()
+        self.script_blocks = {}
+        self.script_screen = (self.actual_screen_width, self.actual_screen_height)
+        self.update_remap_info()
         self.recording_start_time = time.time()
         self.last_mouse_pos = None
         self.last_event_time = 0
@@ -454,6 +4532,7 @@ HOW TO USE:
             duration = time.time() - self.recording_start_time
             self.recording_duration.set(f"{duration:.2f}s")
             self.total_events.set(str(len(self.recorded_events)))
+            self.refresh_path()
             self.root.after(100, self.update_recording_time)
     
     def stop_action(self):
@@ -465,7 +4544,9 @@ HOW TO USE:
     
     def stop_recording(self):
         """Stop recording with cleanup"""
-        self.is_recording = False
+        with self.input_idle:
+            self.is_recording = False
+            self.input_idle.notify_all()
         
         # Stop listeners
         try:
@@ -495,9 +4576,11 @@ HOW TO USE:
     
     def stop_playback(self):
         """Stop playback immediately"""
-        self.is_playing = False
-        self.is_paused = False
-        self.playback_stop_event.set()
+        with self.input_idle:
+            self.is_playing = False
+            self.input_idle.notify_all()
+        self.engine.stop()
+        self.process_player.stop()
         
         self.record_btn.config(state=tk.NORMAL)
         self.play_btn.config(state=tk.NORMAL)
@@ -506,193 +4589,398 @@ HOW TO USE:
         self.status_label.config(text="Playback Stopped", foreground="black")
         self.progress_var.set(0)
     
-    def start_playback(self):
+    def start_playback(self, play_range=None):
         """Start playback with enhanced precision"""
         if not self.recorded_events:
             messagebox.showinfo("Info", "No events recorded!")
             return
         
-        if self.is_recording:
-            messagebox.showwarning("Warning", "Cannot play while recording!")
+        token = self.claim_playback(os.path.basename(self.current_file or "") or "Untitled")
+        if token is None:
+            messagebox.showwarning("Warning", "Cannot play while recording or playing!")
             return
         
-        self.is_playing = True
-        self.is_paused = False
-        self.playback_stop_event.clear()
-        
         self.record_btn.config(state=tk.DISABLED)
         self.play_btn.config(state=tk.DISABLED)
         self.stop_btn.config(state=tk.NORMAL)
         self.pause_btn.config(state=tk.NORMAL)
         self.status_label.config(text="Playing...", foreground="green")
         
+        # Read settings here - Tk variables must not be touched from the playback thread
+        settings = self.get_playback_settings()
+        # Play an immutable snapshot so the script can be edited meanwhile
+        events = self.recorded_events.snapshot()
+        
+        if play_range:
+            settings['repeat_count'] = 1  # range playback is for debugging a step
+        
+        try:
+            transform = self.get_coordinate_transform(settings, self.script_screen)
+        except ValueError as e:
+            self.stop_playback()
+            messagebox.showerror("Error", f"Invalid remapping anchors: {str(e)}")
+            return
+        
         # Start playback thread
-        self.playback_thread = threading.Thread(target=self.playback_events_stable)
+        self.playback_thread = threading.Thread(target=self.run_playback, name="Playback",
+                                                args=(events, self.script_blocks, settings, play_range, transform,
+                                                      token))
         self.playback_thread.daemon = True
         self.playback_thread.start()
     
+    def parse_remap_anchors(self, text):
+        """Parse 'sx,sy=tx,ty; ...' into (sx, sy, tx, ty) tuples"""
+        anchors = []
+        for part in text.split(';'):
+            part = part.strip()
+            if not part:
+                continue
+            source, _, target = part.partition('=')
+            sx, sy = (float(v) for v in source.split(','))
+            tx, ty = (float(v) for v in target.split(','))
+            anchors.append((sx, sy, tx, ty))
+        if not anchors:
+            raise ValueError("no anchor points given")
+        return anchors
+    
+    def outcome_summary(self, outcome):
+        """Status line for a finished run"""
+        summary = outcome['summary']
+        if outcome['settle_saved'] >= 0.01:
+            saved = f"calibrated settles saved {outcome['settle_saved']:.2f}s"
+            summary = f"{summary}, {saved}" if summary else f"Done: {saved}"
+        return summary
+    
+    def calibrate_settles(self):
+        """Measure the input backend and store settle delays for this machine"""
+        token = self.claim_playback("Calibrating")
+        if token is None:
+            messagebox.showwarning("Warning", "Cannot calibrate while recording or playing!")
+            return
+        self.status_label.config(text="Calibrating settle delays...", foreground="black")
+        profile = self.engine.settle_profile
+        
+        def run():
+            try:
+                profile.calibrate(self.mouse_controller)
+                message = None
+            except Exception as e:
+                message = f"Calibration failed: {str(e)}"
+            self.end_playback(token)
+            self.root.after(0, lambda: self.calibration_finished(message))
+        
+        threading.Thread(target=run, name="Calibration", daemon=True).start()
+    
+    def calibration_finished(self, error):
+        self.status_label.config(text="Ready", foreground="black")
+        self.settle_info.set(self.engine.settle_profile.describe())
+        if error:
+            messagebox.showerror("Error", error)
+    
+    def run_playback(self, events, blocks, settings, play_range, transform, token):
+        """Playback thread body: run the engine, then hand back to the UI"""
+        outcome = self.player_for(settings).play(events, blocks, settings, play_range, transform, self.current_file)
+        self.end_playback(token)
+        self.root.after(0, lambda: self.playback_finished(self.outcome_summary(outcome)))
+    
+    def player_for(self, settings):
+        """The engine a run uses: in this process, or in the playback worker process"""
+        self.active_player = self.process_player if settings.get('separate_process') else self.engine
+        return self.active_player
+    
+    def claim_playback(self, label, wait=False):
+        """Mark playback busy and return its token, or None if recording/playing (unless wait)"""
+        with self.input_idle:
+            if wait:
+                self.input_idle.wait_for(lambda: not self.is_recording and not self.is_playing)
+            elif self.is_recording or self.is_playing:
+                return None
+            self.is_playing = True
+            self.playback_token += 1
+            self.now_playing = label
+            return self.playback_token
+    
+    def end_playback(self, token):
+        """Mark a run finished, unless playback was stopped and restarted meanwhile"""
+        if self.engine.settle_profile.changed:
+            try:
+                self.engine.settle_profile.save()  # keep what playback learned about this machine
+            except OSError as e:
+                print(f"Failed to save settle profile: {e}")
+        with self.input_idle:
+            if self.playback_token == token:
+                self.is_playing = False
+                self.now_playing = None
+            self.input_idle.notify_all()
+    
+    def run_scheduled_job(self, job):
+        """Scheduler thread: play one job as soon as recording and playback are idle"""
+        token = self.claim_playback(job['name'], wait=True)
+        try:
+            script, _ = self.script_cache.get(job['script'])
+        except Exception as e:
+            self.end_playback(token)
+            return playback_outcome(error=str(e))
+        return self.play_compiled(token, script, job['settings'], f"Scheduled: {job['name']}")
+    
+    def play_compiled(self, token, script, overrides, label, trigger_time=None):
+        """Play a cached script on the engine (any thread), after claim_playback"""
+        self.root.after(0, lambda: self.show_playing(label))
+        try:
+            settings = dict(PLAYBACK_DEFAULTS)
+            settings.update(script['settings'])
+            settings.update(overrides)
+            transform = self.get_coordinate_transform(
+                settings, script['screen'] or (self.actual_screen_width, self.actual_screen_height))
+            outcome = self.player_for(settings).play(script['events'], script['blocks'], settings,
+                                                     transform=transform, script_file=script['path'])
+        except Exception as e:
+            outcome = playback_outcome(error=str(e))
+        
+        if trigger_time is not None and outcome['first_event'] is not None:
+            # The script's own lead-in before its first event is not latency
+            self.trigger_latency.add(outcome['first_event'] - outcome['lead_in'] - trigger_time)
+        
+        self.end_playback(token)
+        self.root.after(0, lambda: self.playback_finished(self.outcome_summary(outcome)))
+        return outcome
+    
+    def show_playing(self, label):
+        """Put the controls in playing state for a run started outside the UI"""
+        self.record_btn.config(state=tk.DISABLED)
+        self.play_btn.config(state=tk.DISABLED)
+        self.stop_btn.config(state=tk.NORMAL)
+        self.pause_btn.config(state=tk.NORMAL)
+        self.status_label.config(text=label, foreground="green")
+    
+    def toggle_control_api(self):
+        """Start or stop the localhost control API"""
+        if self.control_server:
+            self.control_server.shutdown()  # returns within the serve loop's poll interval
+            self.control_server.server_close()
+            self.control_server = None
+        if not self.api_enabled.get():
+            return
+        
+        try:
+            token = load_api_token(create=True)
+            self.api_token.set(token)
+            self.control_server = ControlServer(self, token, self.api_port.get())
+        except (OSError, tk.TclError) as e:
+            self.api_enabled.set(False)
+            messagebox.showerror("Error", f"Failed to start control API: {str(e)}")
+            return
+        threading.Thread(target=self.control_server.serve_forever, name="Control API", daemon=True).start()
+    
+    def api_status(self):
+        return {
+            'playing': self.is_playing,
+            'recording': self.is_recording,
+            'paused': self.active_player.is_paused,
+            'script': self.now_playing
+        }
+    
+    def api_stats(self):
+        return {'cache': self.script_cache.stats(), 'trigger_latency': self.trigger_latency.summary()}
+    
+    def api_scripts(self):
+        return {'scripts': self.script_cache.entries()}
+    
+    def api_load(self, body):
+        """Parse a script into the cache ahead of its first trigger"""
+        if not isinstance(body.get('script'), str) or not body['script']:
+            return 400, {'error': 'script path is required'}
+        start = time.time()
+        try:
+            script, hit = self.script_cache.get(body['script'])
+        except OSError as e:
+            return 404, {'error': str(e)}
+        except ValueError as e:
+            return 400, {'error': f"invalid script: {e}"}
+        return 200, {'script': script['path'], 'events': len(script['events']),
+                     'cache': 'hit' if hit else 'miss', 'load_ms': (time.time() - start) * 1000}
+    
+    def api_play(self, body, trigger_time):
+        """Start a script from the cache; returns before playback ends"""
+        if not isinstance(body.get('script'), str) or not body['script']:
+            return 400, {'error': 'script path is required'}
+        try:
+            settings = validate_playback_settings(body.get('settings') or {})
+        except ValueError as e:
+            return 400, {'error': f"invalid settings: {e}"}
+        try:
+            script, hit = self.script_cache.get(body['script'])
+        except OSError as e:
+            return 404, {'error': str(e)}
+        except ValueError as e:
+            return 400, {'error': f"invalid script: {e}"}
+        
+        token = self.claim_playback(script['name'])
+        if token is None:
+            return 409, {'error': 'busy', 'script': self.now_playing}
+        threading.Thread(target=self.play_compiled, name="Playback", daemon=True,
+                         args=(token, script, settings, f"API: {script['name']}",
+                               trigger_time)).start()
+        return 202, {'script': script['path'], 'cache': 'hit' if hit else 'miss'}
+    
+    def api_stop(self):
+        if not self.is_playing:
+            return 200, {'stopped': False}
+        self.root.after(0, self.stop_playback)
+        return 200, {'stopped': True}
+    
+    def get_coordinate_transform(self, settings, script_screen):
+        """Transform from the display a script was recorded on to this one, or None"""
+        mode = settings.get('remap_mode', 'scale')
+        if mode == 'anchors':
+            return CoordinateTransform(anchors=self.parse_remap_anchors(settings.get('remap_anchors', '')))
+        if mode == 'scale':
+            transform = CoordinateTransform.for_displays(
+                script_screen, (self.actual_screen_width, self.actual_screen_height))
+            return None if transform.is_identity() else transform
+        return None
+    
+    def update_remap_info(self):
+        """Show the script's recorded display next to this one"""
+        self.remap_info.set(f"Recorded on {self.script_screen[0]}x{self.script_screen[1]}, "
+                            f"this screen is {self.actual_screen_width}x{self.actual_screen_height}")
+    
+    def get_time_index(self):
+        """Time index of the current events, rebuilt only after edits"""
+        events = self.recorded_events
+        if self.time_index is None or self.time_index_key != (id(events), events.version, id(self.script_blocks)):
+            self.time_index = EventTimeIndex(events.snapshot(), self.script_blocks)
+            self.time_index_key = (id(events), events.version, id(self.script_blocks))
+        return self.time_index
+    
+    def get_query_index(self):
+        """Query index of the current events, rebuilt only after edits"""
+        events = self.recorded_events
+        if self.query_index is None or self.query_index_key != (id(events), events.version):
+            self.query_index = EventQueryIndex(events.snapshot())
+            self.query_index_key = (id(events), events.version)
+        return self.query_index
+    
+    def apply_query(self):
+        """Filter the script view to the events matching the filter text"""
+        text = self.query_text.get().strip()
+        if not text:
+            self.clear_query()
+            return
+        try:
+            self.event_query = parse_event_query(text)
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid filter: {e}")
+            return
+        self.update_script_display()
+    
+    def clear_query(self):
+        """Show every event again"""
+        self.event_query = None
+        self.query_info.set(QUERY_HINT)
+        self.update_script_display()
+    
+    def play_range(self, start, stop, seek_time=None):
+        """Play top-level events start..stop-1 with the input state of that point"""
+        if start >= len(self.recorded_events) or start >= stop:
+            messagebox.showinfo("Info", "No events in that range")
+            return
+        
+        index = self.get_time_index()
+        keys, buttons, position = index.held_state(start)
+        self.start_playback({
+            'start': start,
+            'stop': stop,
+            'time': index.times[start] if seek_time is None else seek_time,
+            'keys': keys,
+            'buttons': buttons,
+            'position': position
+        })
+    
+    def play_from_selected(self):
+        """Play from the first selected row to the end"""
+        indices = self.selected_top_level_indices()
+        if not indices:
+            messagebox.showinfo("Info", "Select a row to play from")
+            return
+        self.play_range(indices[0], len(self.recorded_events))
+    
+    def play_selection(self):
+        """Play only the selected rows (first to last)"""
+        indices = self.selected_top_level_indices()
+        if not indices:
+            messagebox.showinfo("Info", "Select the rows to play")
+            return
+        self.play_range(indices[0], indices[-1] + 1)
+    
+    def play_from_time(self):
+        """Play from a recorded timestamp to the end"""
+        seconds = simpledialog.askfloat("Play From Time", "Start at (seconds):", parent=self.root, minvalue=0)
+        if seconds is None:
+            return
+        index = self.get_time_index()
+        self.play_range(index.index_at(seconds), len(self.recorded_events), seconds)
+    
+    def play_time_window(self):
+        """Play the events between two recorded timestamps"""
+        start = simpledialog.askfloat("Play Time Window", "From (seconds):", parent=self.root, minvalue=0)
+        if start is None:
+            return
+        end = simpledialog.askfloat("Play Time Window", "To (seconds):", parent=self.root, minvalue=start)
+        if end is None:
+            return
+        index = self.get_time_index()
+        self.play_range(index.index_at(start), bisect_right(index.times, end), start)
+    
     def pause_playback(self):
         """Pause or resume playback"""
         if self.is_playing:
-            self.is_paused = not self.is_paused
-            if self.is_paused:
+            player = self.active_player
+            player.is_paused = not player.is_paused
+            if player.is_paused:
                 self.pause_btn.config(text="▶ Resume")
                 self.status_label.config(text="Paused", foreground="orange")
             else:
                 self.pause_btn.config(text="⏸ Pause")
                 self.status_label.config(text="Playing...", foreground="green")
     
-    def playback_events_stable(self):
-        """Stable playback with proper timing and taskbar support"""
-        try:
-            repeat_count = self.repeat_count.get()
-            if repeat_count == 0:
-                repeat_count = 9999  # Large number instead of infinity
-            
-            repeat_interval = self.repeat_interval.get()
-            speed = self.playback_speed.get()
-            
-            total_duration = self.recorded_events[-1]['time'] if self.recorded_events else 0
-            
-            for repeat in range(repeat_count):
-                if self.playback_stop_event.is_set():
-                    break
-                
-                # Wait between repeats
-                if repeat > 0 and repeat_interval > 0:
-                    wait_start = time.time()
-                    while time.time() - wait_start < repeat_interval:
-                        if self.playback_stop_event.is_set():
-                            break
-                        time.sleep(0.1)
-                
-                # Play events
-                start_playback_time = time.time()
-                
-                for i, event in enumerate(self.recorded_events):
-                    if self.playback_stop_event.is_set():
-                        break
-                    
-                    # Handle pause
-                    while self.is_paused and not self.playback_stop_event.is_set():
-                        time.sleep(0.1)
-                    
-                    # Calculate timing
-                    target_time = event['time'] / speed
-                    elapsed = time.time() - start_playback_time
-                    wait_time = target_time - elapsed
-                    
-                    # Wait if needed
-                    if wait_time > 0:
-                        time.sleep(wait_time)
-                    
-                    # Update progress
-                    if total_duration > 0:
-                        progress = (event['time'] / total_duration) * 100
-                        self.root.after(0, lambda p=progress: self.progress_var.set(p))
-                    
-                    # Execute event
-                    self.execute_event_safe(event)
-            
-            self.is_playing = False
-            self.root.after(0, self.playback_finished)
-            
-        except Exception as e:
-            print(f"Playback error: {e}")
-            self.is_playing = False
-            self.root.after(0, self.playback_finished)
+    def get_playback_settings(self):
+        """Snapshot the playback settings (same keys as the saved script settings)"""
+        return {
+            'playback_speed': self.playback_speed.get(),
+            'repeat_count': self.repeat_count.get(),
+            'repeat_interval': self.repeat_interval.get(),
+            'mouse_smoothing': self.mouse_smoothing.get(),
+            'smoothing_curve': self.smoothing_curve.get(),
+            'smoothing_rate': self.smoothing_rate.get(),
+            'use_high_precision': self.use_high_precision.get(),
+            'force_position': self.force_position.get(),
+            'max_idle_gap': self.max_idle_gap.get(),
+            'idle_gap_threshold': self.idle_gap_threshold.get(),
+            'idle_speed': self.idle_speed.get(),
+            'fast_mode': self.fast_mode.get(),
+            'typing_rate': self.typing_rate.get(),
+            'remap_mode': self.remap_mode.get(),
+            'remap_anchors': self.remap_anchors.get(),
+            'calibrated_settle': self.calibrated_settle.get(),
+            'separate_process': self.separate_process.get()
+        }
     
-    def execute_event_safe(self, event):
-        """Execute a single event with enhanced taskbar support"""
-        try:
-            event_type = event['type']
-            
-            if event_type == 'mouse_move':
-                # Use exact position for playback
-                x, y = self.validate_mouse_position_for_playback(event['x'], event['y'])
-                
-                if self.mouse_smoothing.get():
-                    # Simple smoothing
-                    current_pos = self.mouse_controller.position
-                    steps = 3
-                    for i in range(1, steps + 1):
-                        if self.playback_stop_event.is_set():
-                            break
-                        interp_x = current_pos[0] + (x - current_pos[0]) * (i / steps)
-                        interp_y = current_pos[1] + (y - current_pos[1]) * (i / steps)
-                        self.set_mouse_position_forced(int(interp_x), int(interp_y))
-                        time.sleep(0.003)
-                else:
-                    self.set_mouse_position_forced(x, y)
-                    
-            elif event_type == 'mouse_click':
-                # Use exact position for clicks (critical for taskbar)
-                x, y = self.validate_mouse_position_for_playback(event['x'], event['y'])
-                button = mouse.Button.left if event['button'] == 'left' else mouse.Button.right
-                
-                # Move to exact position with forced positioning
-                self.set_mouse_position_forced(x, y)
-                time.sleep(0.03)  # Extended delay for taskbar reliability
-                
-                # Double-check position before clicking
-                self.set_mouse_position_forced(x, y)
-                time.sleep(0.01)
-                
-                # Perform the click
-                if event['pressed']:
-                    self.mouse_controller.press(button)
-                    time.sleep(0.01)  # Small delay after press
-                else:
-                    self.mouse_controller.release(button)
-                    time.sleep(0.01)  # Small delay after release
-                    
-            elif event_type == 'mouse_scroll':
-                x, y = self.validate_mouse_position_for_playback(event['x'], event['y'])
-                self.set_mouse_position_forced(x, y)
-                time.sleep(0.02)
-                self.mouse_controller.scroll(event['dx'], event['dy'])
-                
-            elif event_type == 'key_press':
-                key = event['key']
-                if key:
-                    try:
-                        if len(key) == 1:
-                            self.keyboard_controller.press(key)
-                        else:
-                            key_obj = getattr(keyboard.Key, key, None)
-                            if key_obj:
-                                self.keyboard_controller.press(key_obj)
-                    except:
-                        pass
-                        
-            elif event_type == 'key_release':
-                key = event['key']
-                if key:
-                    try:
-                        if len(key) == 1:
-                            self.keyboard_controller.release(key)
-                        else:
-                            key_obj = getattr(keyboard.Key, key, None)
-                            if key_obj:
-                                self.keyboard_controller.release(key_obj)
-                    except:
-                        pass
-                        
-            elif event_type == 'delay':
-                time.sleep(event['duration'] / self.playback_speed.get())
-                
-        except Exception as e:
-            print(f"Event execution error: {e}")
+    def apply_playback_settings(self, settings):
+        """Load saved script settings into the Settings tab"""
+        for name, default in PLAYBACK_DEFAULTS.items():
+            getattr(self, name).set(settings.get(name, default))
     
-    def playback_finished(self):
+    def playback_finished(self, summary=None):
         """Clean up after playback finishes"""
         self.record_btn.config(state=tk.NORMAL)
         self.play_btn.config(state=tk.NORMAL)
         self.stop_btn.config(state=tk.DISABLED)
         self.pause_btn.config(state=tk.DISABLED, text="⏸ Pause")
-        self.status_label.config(text="Ready", foreground="black")
+        self.status_label.config(text=summary or "Ready", foreground="black")
         self.progress_var.set(0)
 
+    @traced('listener mouse_move')
     def on_mouse_move(self, x, y):
         """Record mouse movement - records exact position"""
         if self.is_recording and not self.is_playing:
@@ -720,6 +5008,7 @@ HOW TO USE:
             }
             self.recorded_events.append(event)
     
+    @traced('listener mouse_click')
     def on_mouse_click(self, x, y, button, pressed):
         """Record mouse click with exact position"""
         if self.is_recording and not self.is_playing:
@@ -734,6 +5023,7 @@ HOW TO USE:
             }
             self.recorded_events.append(event)
     
+    @traced('listener mouse_scroll')
     def on_mouse_scroll(self, x, y, dx, dy):
         """Record mouse scroll with exact position"""
         if self.is_recording and not self.is_playing:
@@ -747,6 +5037,7 @@ HOW TO USE:
             }
             self.recorded_events.append(event)
     
+    @traced('listener key_press')
     def on_key_press(self, key):
         """Record key press with filtering"""
         if self.is_recording and not self.is_playing:
@@ -775,6 +5066,7 @@ HOW TO USE:
             except:
                 pass
     
+    @traced('listener key_release')
     def on_key_release(self, key):
         """Record key release"""
         if self.is_recording and not self.is_playing:
@@ -803,59 +5095,487 @@ HOW TO USE:
             except:
                 pass
     
-    def update_script_display(self):
-        """Update the script display"""
-        # Clear existing items
-        for item in self.script_tree.get_children():
-            self.script_tree.delete(item)
+    def describe_event(self, event, blocks):
+        """Return (type, action, details, tags) for a script row"""
+        event_type = event['type'].replace('_', ' ').title()
+        action = ""
+        details = ""
+        
+        if event['type'] == 'mouse_move':
+            action = "Move"
+            details = f"Position: ({event['x']}, {event['y']})"
+        elif event['type'] == 'mouse_click':
+            action = "Press" if event['pressed'] else "Release"
+            details = f"{event['button'].title()} button at ({event['x']}, {event['y']})"
+        elif event['type'] == 'mouse_scroll':
+            action = "Scroll"
+            details = f"Delta: ({event['dx']}, {event['dy']}) at ({event['x']}, {event['y']})"
+        elif event['type'] in ['key_press', 'key_release']:
+            action = "Press" if event['type'] == 'key_press' else "Release"
+            details = f"Key: {event.get('key', 'Unknown')}"
+        elif event['type'] == 'delay':
+            action = "Wait"
+            details = f"Duration: {event['duration']:.3f}s"
+        elif event['type'] == 'block':
+            block = blocks.get(event['block'], [])
+            action = "Play Block"
+            details = f"{event['block']}: {len(block)} events, {script_duration(block, blocks):.3f}s"
+        elif event['type'] == 'loop':
+            count = event.get('count', 1)
+            action = "Forever" if count == 0 else f"{count}x"
+            details = (f"{len(event['events'])} events, {script_duration(event['events'], blocks):.3f}s per pass, "
+                       f"interval {event.get('interval', 0.0):.3f}s")
+        elif event['type'] == 'section':
+            action = event.get('name', '')
+            details = f"{len(event['events'])} events, {script_duration(event['events'], blocks):.3f}s"
+        elif event['type'] == 'call':
+            action = "Call"
+            details = f"Script: {event['path']}"
+        elif event['type'] == 'type_text':
+            action = "Type"
+            text = event['text'] if len(event['text']) <= 60 else event['text'][:57] + "..."
+            details = f"{text!r} ({len(event['text'])} chars, {node_span(event, blocks):.2f}s)"
+        elif event['type'] == 'wait_for':
+            action = "Wait For"
+            details = (f"Color {event['color']} at ({event['x']}, {event['y']}), "
+                       f"timeout {event.get('timeout', 30.0):.1f}s")
+        
+        # Add color coding
+        tags = []
+        if 'mouse' in event['type']:
+            tags.append('mouse')
+        elif 'key' in event['type']:
+            tags.append('keyboard')
+        elif event['type'] in ('delay', 'wait_for'):
+            tags.append('delay')
+        elif event['type'] in CONTROL_NODE_TYPES:
+            tags.append('block')
+        
+        return event_type, action, details, tags
+    
+    def insert_event_rows(self, parent, events, blocks, index_prefix="", indices=None):
+        """Add rows for events under a tree item; node bodies are filled in when expanded.
+        
+        Top-level rows use the event index as their item id, so selections
+        map back to events even when the view is filtered to some indices.
+        """
+        rows = enumerate(events) if indices is None else ((i, events[i]) for i in indices)
+        for i, event in rows:
+            event_type, action, details, tags = self.describe_event(event, blocks)
+            time_str = f"{event['time']:.3f}s"
+            index = f"{index_prefix}{i+1}"
+            item = self.script_tree.insert(parent, "end", iid=None if parent else str(i),
+                                           values=(index, event_type, action, details, time_str), tags=tags)
+            
+            body = None
+            if event['type'] == 'block':
+                body = blocks.get(event['block'])
+            elif event['type'] in ('loop', 'section'):
+                body = event['events']
+            if body:
+                self.tree_bodies[item] = (body, blocks, f"{index}.")
+                self.script_tree.insert(item, "end", tags=('placeholder',))
+    
+    def on_tree_open(self, _event=None):
+        """Populate a collapsible node the first time it is expanded"""
+        item = self.script_tree.focus()
+        if item not in self.tree_bodies:
+            return
+        body, blocks, index_prefix = self.tree_bodies.pop(item)
+        self.script_tree.delete(*self.script_tree.get_children(item))
+        self.insert_event_rows(item, body, blocks, index_prefix)
+    
+    @traced('update_script_display')
+    def update_script_display(self):
+        """Update the script display"""
+        # Clear existing items
+        self.script_tree.delete(*self.script_tree.get_children())
+        self.tree_bodies = {}
+        
+        # Add events to tree
+        if self.event_query is None:
+            self.insert_event_rows("", self.recorded_events, self.script_blocks)
+        else:
+            started = time.perf_counter()
+            indices = self.get_query_index().query(self.event_query)
+            elapsed = (time.perf_counter() - started) * 1000
+            shown = indices[:QUERY_DISPLAY_LIMIT].tolist()
+            self.insert_event_rows("", self.recorded_events, self.script_blocks, indices=shown)
+            info = f"{len(indices):,} of {len(self.recorded_events):,} events ({elapsed:.1f} ms)"
+            if len(shown) < len(indices):
+                info += f", showing first {len(shown):,}"
+            self.query_info.set(info)
+        if tracer.enabled:
+            tracer.counter('script rows', rows=len(self.script_tree.get_children()))
+        self.refresh_path()
+        
+        # Configure tags
+        self.script_tree.tag_configure('mouse', foreground='blue')
+        self.script_tree.tag_configure('keyboard', foreground='green')
+        self.script_tree.tag_configure('delay', foreground='orange')
+        self.script_tree.tag_configure('block', foreground='purple')
+    
+    def refresh_path(self):
+        """Bring the path view up to date: recording appends the new events, anything else reindexes"""
+        events = self.recorded_events
+        key = (id(events), events.version)
+        if key == self.path_key:
+            return
+        
+        if self.is_recording and self.path_key and self.path_key[0] == id(events) and self.path_build is None:
+            # Recording only ever appends
+            count = len(events)
+            self.path.feed((event['time'], event) for event in events.iter_range(self.path_fed, count))
+            self.path_fed = count
+            self.path_key = key
+            self.draw_path()
+            return
+        
+        # Loaded or edited: index the flattened script a batch per UI step
+        self.path = PathPyramid()
+        self.path_key = key
+        self.path_fed = len(events)
+        self.path_build = iter_script_events(events.snapshot(), self.script_blocks,
+                                             make_script_loader(self.current_file))
+        self.root.after_idle(self.build_path_step, self.path_build)
+    
+    def build_path_step(self, build):
+        """Add the next batch of a reindex, then redraw so the path fills in as it goes"""
+        if build is not self.path_build:
+            return  # superseded by a newer script
+        try:
+            batch = list(itertools.islice(build, PATH_BUILD_BATCH))
+        except Exception as e:
+            print(f"Path view error: {e}")
+            batch = []
+        self.path.feed(batch)
+        if len(batch) < PATH_BUILD_BATCH:
+            self.path_build = None
+        else:
+            self.root.after(1, self.build_path_step, build)
+        self.draw_path()
+    
+    def path_transform(self, width, height):
+        """[scale, x offset, y offset] mapping screen coordinates to the canvas"""
+        return self.path_view or self.path_fit(width, height)
+    
+    def path_fit(self, width, height):
+        """Transform that fits the whole path in the canvas"""
+        x1, y1, x2, y2 = self.path.bounds
+        scale = min((width - 20) / max(x2 - x1, 1.0), (height - 20) / max(y2 - y1, 1.0))
+        return [scale, 10 - x1 * scale, 10 - y1 * scale]
+    
+    def draw_path(self):
+        """Redraw the visible time window of the path (only while the Path tab is shown)"""
+        if self.notebook.select() != str(self.path_frame):
+            return
+        canvas = self.path_canvas
+        canvas.delete("all")
+        width, height = canvas.winfo_width(), canvas.winfo_height()
+        path = self.path
+        if not path.size:
+            canvas.create_text(width / 2, height / 2, text="No mouse path yet", fill='gray')
+            self.path_info.set("")
+            return
+        
+        # Time window: the slider moves it across the script, and recording follows the end
+        total = path.times[path.size - 1]
+        try:
+            window = max(0.0, self.path_window.get())
+        except tk.TclError:
+            window = 0.0
+        if window <= 0 or window >= total:
+            start_time, end_time = 0.0, total
+        else:
+            position = 1.0 if self.is_recording else self.path_position.get()
+            start_time = position * (total - window)
+            end_time = start_time + window
+        start, stop = path.span(start_time, end_time)
+        
+        scale, offset_x, offset_y = self.path_transform(width, height)
+        fit_scale = self.path_fit(width, height)[0]
+        
+        if self.path_heatmap.get() and path.heat:
+            top = np.log1p(max(path.heat.values()))
+            cell = PATH_HEAT_CELL * scale
+            for (column, row), count in path.heat.items():
+                x = column * PATH_HEAT_CELL * scale + offset_x
+                y = row * PATH_HEAT_CELL * scale + offset_y
+                if x + cell < 0 or y + cell < 0 or x > width or y > height:
+                    continue
+                shade = 255 - int(200 * np.log1p(count) / top)
+                canvas.create_rectangle(x, y, x + cell, y + cell, outline="",
+                                        fill=f"#ff{shade:02x}{shade:02x}")
+        
+        detail = min(PATH_MAX_DETAIL, max(1.0, scale / fit_scale))
+        indices = path.decimate(start, stop, int(max(width, 100) * detail))
+        if len(indices):
+            coords = np.empty(2 * len(indices))
+            coords[0::2] = path.x[indices] * scale + offset_x
+            coords[1::2] = path.y[indices] * scale + offset_y
+            if len(indices) > 1:
+                canvas.create_line(*coords.tolist(), fill='#2c7be5')
+            x, y = coords[-2], coords[-1]
+            canvas.create_oval(x - 4, y - 4, x + 4, y + 4, fill='#2c7be5', outline="")
+        
+        clicks = path.clicks_between(start_time, end_time) if self.path_clicks.get() else []
+        step = max(1, -(-len(clicks) // PATH_MARKER_LIMIT))
+        for _, x, y, button in clicks[::step]:
+            x, y = x * scale + offset_x, y * scale + offset_y
+            color = '#c0392b' if button == 'left' else '#8e44ad'
+            canvas.create_oval(x - 3, y - 3, x + 3, y + 3, outline=color)
+        
+        self.path_info.set(f"{start_time:.2f}-{end_time:.2f}s: {len(indices):,} of {stop - start:,} points drawn, "
+                           f"{len(clicks):,} clicks" + (" (indexing...)" if self.path_build else ""))
+    
+    def zoom_path(self, event):
+        """Zoom the path view around the pointer"""
+        if not self.path.size:
+            return
+        factor = 1.25 if event.delta > 0 else 0.8
+        scale, offset_x, offset_y = self.path_transform(self.path_canvas.winfo_width(),
+                                                        self.path_canvas.winfo_height())
+        self.path_view = [scale * factor, event.x - (event.x - offset_x) * factor,
+                          event.y - (event.y - offset_y) * factor]
+        self.draw_path()
+    
+    def start_path_pan(self, event):
+        """Remember where a drag of the path view started"""
+        self.path_drag = (event.x, event.y)
+    
+    def pan_path(self, event):
+        """Drag the path view"""
+        if not self.path.size:
+            return
+        scale, offset_x, offset_y = self.path_transform(self.path_canvas.winfo_width(),
+                                                        self.path_canvas.winfo_height())
+        last_x, last_y = self.path_drag
+        self.path_view = [scale, offset_x + event.x - last_x, offset_y + event.y - last_y]
+        self.path_drag = (event.x, event.y)
+        self.draw_path()
+    
+    def reset_path_view(self):
+        """Fit the whole path in the view again"""
+        self.path_view = None
+        self.draw_path()
+    
+    def selected_top_level_indices(self):
+        """Indices of the selected top-level rows (rows inside nodes are not editable)"""
+        return sorted(int(item) for item in self.script_tree.selection()
+                      if not self.script_tree.parent(item))
+    
+    def insertion_index(self):
+        """Index after the selected top-level row, or the end of the script"""
+        indices = self.selected_top_level_indices()
+        return indices[0] + 1 if indices else len(self.recorded_events)
+    
+    def wrap_selection(self, node):
+        """Replace the selected range of top-level rows with a node whose body is that range"""
+        indices = self.selected_top_level_indices()
+        if not indices:
+            messagebox.showinfo("Info", "Select the events to wrap first")
+            return
+        
+        start, end = indices[0], indices[-1]
+        events = self.recorded_events
+        body_base = events[start]['time']
+        node = dict(node, time=body_base,
+                    events=[dict(event, time=event['time'] - body_base)
+                            for event in events.iter_range(start, end + 1)])
+        
+        self.push_undo()
+        events.delete_indices(range(start, end + 1))
+        events.insert(start, node)
+        self.update_script_display()
+        self.total_events.set(str(len(events)))
+    
+    def bulk_edit_targets(self):
+        """(indices, description) the bulk edit applies to: selection, filter results or the whole script"""
+        indices = self.selected_top_level_indices()
+        if indices:
+            return np.asarray(indices, dtype=np.int64), f"{len(indices):,} selected events"
+        if self.event_query is not None:
+            indices = self.get_query_index().query(self.event_query)
+            return indices, f"{len(indices):,} filtered events"
+        return np.arange(len(self.recorded_events)), f"all {len(self.recorded_events):,} events"
+    
+    def show_bulk_edit(self):
+        """Dialog for bulk edits on the selection or filter results"""
+        indices, description = self.bulk_edit_targets()
+        if not len(indices):
+            messagebox.showinfo("Info", "No events to edit")
+            return
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Bulk Edit")
+        dialog.geometry("320x260")
+        dialog.transient(self.root)
+        dialog.grab_set()
+        
+        ttk.Label(dialog, text=f"Applies to {description}").pack(pady=5)
+        operations = {label: name for name, (label, _) in BULK_EDIT_OPERATIONS.items()}
+        operation_var = tk.StringVar(value=next(iter(operations)))
+        combo = ttk.Combobox(dialog, textvariable=operation_var, values=list(operations),
+                             state="readonly", width=30)
+        combo.pack(pady=5)
+        
+        ttk.Label(dialog, text="Value (factor, seconds, 'dx, dy', button or types):").pack(pady=5)
+        value_var = tk.StringVar(value=BULK_EDIT_OPERATIONS['scale_time'][1])
+        ttk.Entry(dialog, textvariable=value_var, width=20).pack(pady=5)
+        combo.bind("<<ComboboxSelected>>",
+                   lambda e: value_var.set(BULK_EDIT_OPERATIONS[operations[operation_var.get()]][1]))
+        
+        def apply():
+            operation = operations[operation_var.get()]
+            text = value_var.get().strip()
+            try:
+                if operation in ('scale_time', 'shift_time'):
+                    value = float(text)
+                elif operation in ('translate', 'scale_xy'):
+                    parts = [float(v) for v in text.replace(',', ' ').split()]
+                    if len(parts) not in (1, 2):
+                        raise ValueError("Enter one value or two (x, y)")
+                    value = parts * 2 if len(parts) == 1 else parts
+                elif operation == 'set_button':
+                    value = text.lower()
+                    if value not in ('left', 'right'):
+                        raise ValueError("Button must be left or right")
+                else:
+                    value = [name.lower() for name in text.replace(',', ' ').split()]
+                self.apply_bulk_edit(indices, operation, value)
+            except ValueError as e:
+                messagebox.showerror("Error", f"Invalid value: {e}", parent=dialog)
+                return
+            dialog.destroy()
+        
+        ttk.Button(dialog, text="Apply", command=apply).pack(pady=5)
+        ttk.Button(dialog, text="Cancel", command=dialog.destroy).pack()
+    
+    def apply_bulk_edit(self, indices, operation, value):
+        """Apply a bulk edit as one undoable step and refresh the view once"""
+        events = self.recorded_events
+        replacements, deletions = bulk_edit_events(events, indices, operation, value)
+        if not replacements and not deletions:
+            messagebox.showinfo("Info", "Nothing to change")
+            return
+        
+        self.push_undo()
+        events.replace_many(replacements)
+        events.delete_indices(deletions)
+        if deletions or self.event_query is not None:
+            self.update_script_display()
+        else:
+            self.refresh_rows(replacements)
+        self.total_events.set(str(len(events)))
+        self.recording_duration.set(f"{script_duration(events, self.script_blocks):.2f}s")
+    
+    def refresh_rows(self, indices):
+        """Redraw the shown top-level rows of the given events in place"""
+        tree = self.script_tree
+        for i in indices:
+            item = str(i)
+            if tree.exists(item):
+                event = self.recorded_events[i]
+                event_type, action, details, tags = self.describe_event(event, self.script_blocks)
+                tree.item(item, values=(i + 1, event_type, action, details, f"{event['time']:.3f}s"), tags=tags)
+    
+    def wrap_selection_in_loop(self):
+        """Turn the selected range into a loop node"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Loop Selection")
+        dialog.geometry("300x200")
+        dialog.transient(self.root)
+        dialog.grab_set()
+        
+        ttk.Label(dialog, text="Repeat Count (0 = forever):").pack(pady=5)
+        count_var = tk.IntVar(value=2)
+        ttk.Spinbox(dialog, from_=0, to=100000, textvariable=count_var, width=10).pack(pady=5)
+        
+        ttk.Label(dialog, text="Interval Between Passes (seconds):").pack(pady=5)
+        interval_var = tk.DoubleVar(value=0.0)
+        ttk.Spinbox(dialog, from_=0, to=3600, textvariable=interval_var,
+                   increment=0.1, format="%.1f", width=10).pack(pady=5)
+        
+        def wrap():
+            self.wrap_selection({'type': 'loop', 'count': count_var.get(), 'interval': interval_var.get()})
+            dialog.destroy()
+        
+        ttk.Button(dialog, text="Loop", command=wrap).pack(pady=5)
+        ttk.Button(dialog, text="Cancel", command=dialog.destroy).pack()
+    
+    def wrap_selection_in_section(self):
+        """Turn the selected range into a labeled section"""
+        name = simpledialog.askstring("Section", "Section name:", parent=self.root)
+        if name:
+            self.wrap_selection({'type': 'section', 'name': name})
+    
+    def insert_node(self, index, node):
+        """Insert a point node (call, wait for) at a top-level index"""
+        events = self.recorded_events
+        self.push_undo()
+        events.insert(index, dict(node, time=events[index-1]['time'] if index > 0 and events else 0))
+        self.update_script_display()
+        self.total_events.set(str(len(events)))
+    
+    def insert_call(self):
+        """Insert a call to another script"""
+        index = self.insertion_index()
+        filename = filedialog.askopenfilename(
+            title="Call Script",
+            filetypes=[("NaMouse Script", "*.nam"), ("JSON files", "*.json"), ("All files", "*.*")]
+        )
+        if not filename:
+            return
+        
+        # Keep calls portable when both scripts live side by side
+        if self.current_file:
+            try:
+                filename = os.path.relpath(filename, os.path.dirname(self.current_file))
+            except ValueError:
+                pass  # different drive
+        self.insert_node(index, {'type': 'call', 'path': filename})
+    
+    def insert_wait_for(self):
+        """Insert a wait until a screen pixel has a given color"""
+        index = self.insertion_index()
         
-        # Add events to tree
-        for i, event in enumerate(self.recorded_events):
-            event_type = event['type'].replace('_', ' ').title()
-            action = ""
-            details = ""
-            
-            if event['type'] == 'mouse_move':
-                action = "Move"
-                details = f"Position: ({event['x']}, {event['y']})"
-            elif event['type'] == 'mouse_click':
-                action = "Press" if event['pressed'] else "Release"
-                details = f"{event['button'].title()} button at ({event['x']}, {event['y']})"
-            elif event['type'] == 'mouse_scroll':
-                action = "Scroll"
-                details = f"Delta: ({event['dx']}, {event['dy']}) at ({event['x']}, {event['y']})"
-            elif event['type'] in ['key_press', 'key_release']:
-                action = "Press" if event['type'] == 'key_press' else "Release"
-                details = f"Key: {event.get('key', 'Unknown')}"
-            elif event['type'] == 'delay':
-                action = "Wait"
-                details = f"Duration: {event['duration']:.3f}s"
-            
-            time_str = f"{event['time']:.3f}s"
-            
-            # Add color coding
-            tags = []
-            if 'mouse' in event['type']:
-                tags.append('mouse')
-            elif 'key' in event['type']:
-                tags.append('keyboard')
-            elif event['type'] == 'delay':
-                tags.append('delay')
-            
-            self.script_tree.insert("", "end", values=(i+1, event_type, action, details, time_str), tags=tags)
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Insert Wait For")
+        dialog.geometry("320x260")
+        dialog.transient(self.root)
+        dialog.grab_set()
         
-        # Configure tags
-        self.script_tree.tag_configure('mouse', foreground='blue')
-        self.script_tree.tag_configure('keyboard', foreground='green')
-        self.script_tree.tag_configure('delay', foreground='orange')
+        x_var = tk.IntVar(value=0)
+        y_var = tk.IntVar(value=0)
+        color_var = tk.StringVar(value="#ffffff")
+        tolerance_var = tk.IntVar(value=10)
+        timeout_var = tk.DoubleVar(value=30.0)
+        
+        form = ttk.Frame(dialog, padding="10")
+        form.pack(fill=tk.X)
+        fields = [("X:", x_var), ("Y:", y_var), ("Color (#rrggbb):", color_var),
+                  ("Tolerance:", tolerance_var), ("Timeout (s, 0 = none):", timeout_var)]
+        for i, (label, var) in enumerate(fields):
+            ttk.Label(form, text=label).grid(row=i, column=0, sticky=tk.W, pady=2)
+            ttk.Entry(form, textvariable=var, width=12).grid(row=i, column=1, sticky=tk.W, pady=2)
+        
+        def read_color():
+            r, g, b = get_pixel_color(x_var.get(), y_var.get())
+            color_var.set(f"#{r:02x}{g:02x}{b:02x}")
+        
+        def insert():
+            self.insert_node(index, {'type': 'wait_for', 'x': x_var.get(), 'y': y_var.get(),
+                                     'color': color_var.get(), 'tolerance': tolerance_var.get(),
+                                     'timeout': timeout_var.get()})
+            dialog.destroy()
+        
+        ttk.Button(dialog, text="Read Current Color", command=read_color).pack(pady=2)
+        ttk.Button(dialog, text="Insert", command=insert).pack(pady=2)
+        ttk.Button(dialog, text="Cancel", command=dialog.destroy).pack()
     
     def insert_delay(self):
         """Insert a custom delay"""
-        selected = self.script_tree.selection()
-        if not selected:
-            index = len(self.recorded_events)
-        else:
-            index = self.script_tree.index(selected[0]) + 1
+        index = self.insertion_index()
         
         # Create delay dialog
         dialog = tk.Toplevel(self.root)
@@ -871,18 +5591,20 @@ HOW TO USE:
                    increment=0.1, format="%.1f", width=10).pack(pady=5)
         
         def insert():
+            self.push_undo()
+            events = self.recorded_events
             delay_event = {
                 'type': 'delay',
-                'time': self.recorded_events[index-1]['time'] if index > 0 and self.recorded_events else 0,
+                'time': events[index-1]['time'] if index > 0 and events else 0,
                 'duration': delay_var.get()
             }
             
-            self.recorded_events.insert(index, delay_event)
+            events.insert(index, delay_event)
             
-            # Adjust subsequent event times
-            for i in range(index + 1, len(self.recorded_events)):
-                if self.recorded_events[i]['type'] != 'delay':
-                    self.recorded_events[i]['time'] += delay_var.get()
+            # Adjust subsequent event times (replace, never mutate - undo shares these dicts)
+            for i in range(index + 1, len(events)):
+                if events[i]['type'] != 'delay':
+                    events[i] = dict(events[i], time=events[i]['time'] + delay_var.get())
             
             self.update_script_display()
             dialog.destroy()
@@ -897,25 +5619,10 @@ HOW TO USE:
             return
         
         original_count = len(self.recorded_events)
-        optimized = []
-        last_mouse_move = None
-        
-        for event in self.recorded_events:
-            # Skip redundant mouse moves
-            if event['type'] == 'mouse_move':
-                if last_mouse_move and event['time'] - last_mouse_move['time'] < 0.02:
-                    # Update the last mouse move
-                    last_mouse_move['x'] = event['x']
-                    last_mouse_move['y'] = event['y']
-                    last_mouse_move['time'] = event['time']
-                else:
-                    optimized.append(event)
-                    last_mouse_move = event
-            else:
-                optimized.append(event)
-                last_mouse_move = None
+        optimized = optimize_events(self.recorded_events)
         
-        self.recorded_events = optimized
+        self.push_undo()
+        self.recorded_events = ChunkedEventList(optimized)
         removed = original_count - len(optimized)
         
         self.update_script_display()
@@ -926,11 +5633,560 @@ HOW TO USE:
                            f"Original: {original_count} events\n"
                            f"Optimized: {len(optimized)} events")
     
+    def coalesce_typed_text(self):
+        """Merge runs of typed characters into single Type Text events"""
+        if not self.recorded_events:
+            messagebox.showinfo("Info", "No events to coalesce")
+            return
+        
+        original_count = len(self.recorded_events)
+        coalesced = coalesce_typing(self.recorded_events)
+        if len(coalesced) == original_count:
+            messagebox.showinfo("Coalesce Typed Text", "No typed text found")
+            return
+        
+        self.push_undo()
+        self.recorded_events = ChunkedEventList(coalesced)
+        self.update_script_display()
+        self.total_events.set(str(len(self.recorded_events)))
+        
+        messagebox.showinfo("Coalesce Typed Text",
+                           f"Original: {original_count} events\n"
+                           f"Coalesced: {len(coalesced)} events")
+    
+    def compress_repeated_blocks(self):
+        """Deduplicate repeated event runs into shared blocks"""
+        if not self.recorded_events:
+            messagebox.showinfo("Info", "No events to compress")
+            return
+        
+        original_count = len(self.recorded_events)
+        self.root.config(cursor="watch")
+        self.root.update_idletasks()
+        try:
+            events, blocks = mine_repeated_blocks(self.recorded_events, self.script_blocks,
+                                                  coord_tolerance=max(1, self.minimal_movement_threshold.get()))
+        finally:
+            self.root.config(cursor="")
+        
+        new_blocks = len(blocks) - len(self.script_blocks)
+        if not new_blocks:
+            messagebox.showinfo("Compress Repeated Blocks", "No repeated segments found")
+            return
+        
+        self.push_undo()
+        self.recorded_events = ChunkedEventList(events)
+        self.script_blocks = blocks
+        self.update_script_display()
+        self.total_events.set(str(len(self.recorded_events)))
+        
+        stored = len(events) + sum(len(block) for block in blocks.values())
+        messagebox.showinfo("Compress Repeated Blocks",
+                           f"Found {new_blocks} repeated blocks\n"
+                           f"Original: {original_count} events\n"
+                           f"Compressed: {len(events)} events + block definitions ({stored} stored)")
+    
+    def expand_blocks(self):
+        """Inline every block reference back into a flat event list"""
+        if not self.script_blocks:
+            return
+        
+        self.push_undo()
+        self.recorded_events = ChunkedEventList(inline_blocks(self.recorded_events, self.script_blocks))
+        self.script_blocks = {}
+        self.update_script_display()
+        self.total_events.set(str(len(self.recorded_events)))
+    
+    def analyze_idle_gaps(self, events, blocks, settings):
+        """Estimate how much wall time idle-gap compression saves per pass"""
+        timeline = PlaybackTimeline.from_settings(settings)
+        for event_time, _ in iter_script_events(events, blocks, make_script_loader(self.current_file)):
+            timeline.advance(event_time)
+        
+        recorded = script_duration(events, blocks)
+        uniform = recorded / timeline.speed
+        return {
+            'recorded': recorded,
+            'uniform': uniform,
+            'compressed': timeline.playback_time,
+            'saved': uniform - timeline.playback_time,
+            'idle_gaps': timeline.idle_gaps,
+            'clamped_gaps': timeline.clamped_gaps
+        }
+    
+    def show_idle_gap_analysis(self):
+        """Report the effect of the idle gap settings on the current script"""
+        if not self.recorded_events:
+            messagebox.showinfo("Info", "No events to analyze")
+            return
+        
+        settings = self.get_playback_settings()
+        result = self.analyze_idle_gaps(self.recorded_events, self.script_blocks, settings)
+        
+        repeats = settings['repeat_count']
+        summary = (f"Recorded duration: {result['recorded']:.2f}s\n"
+                   f"At {settings['playback_speed']:.1f}x: {result['uniform']:.2f}s\n"
+                   f"With idle compression: {result['compressed']:.2f}s\n"
+                   f"Saved per pass: {result['saved']:.2f}s\n\n"
+                   f"Idle gaps: {result['idle_gaps']}\n"
+                   f"Gaps clamped to the cap: {result['clamped_gaps']}")
+        if repeats > 1:
+            summary += f"\nSaved over {repeats} repeats: {result['saved'] * repeats:.2f}s"
+        
+        messagebox.showinfo("Idle Gap Analysis", summary)
+    
+    def dry_run(self):
+        """Simulate playback with the current settings, without touching the mouse or keyboard"""
+        if not self.recorded_events:
+            messagebox.showinfo("Info", "No events to simulate")
+            return
+        
+        settings = self.get_playback_settings()
+        events = self.recorded_events.snapshot()
+        blocks = self.script_blocks
+        script_file = self.current_file
+        
+        def run():
+            try:
+                report = simulate_playback(events, blocks, settings, script_file,
+                                           settle_profile=self.engine.settle_profile)
+            except Exception as e:
+                message = f"Dry run failed: {str(e)}"
+                self.root.after(0, lambda: messagebox.showerror("Error", message))
+                return
+            self.root.after(0, lambda: self.show_dry_run_report(report, settings, script_duration(events, blocks)))
+        
+        # Long scripts take a moment - keep the UI responsive
+        threading.Thread(target=run, name="Dry run", daemon=True).start()
+    
+    def show_dry_run_report(self, report, settings, recorded):
+        """Show a dry run's prediction, drift curve and segment costs"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Dry Run")
+        dialog.geometry("620x560")
+        dialog.transient(self.root)
+        
+        repeats = settings['repeat_count'] or 1
+        summary = (f"Predicted duration: {report['duration']:.2f}s\n"
+                   f"Recorded: {recorded:.2f}s at {settings['playback_speed']:.1f}x, {repeats} repeat(s)\n"
+                   f"Events: {report['events']}, input calls: {report['input_calls']}\n"
+                   f"Drift behind schedule: max {report['max_drift']:.3f}s, at end {report['final_drift']:.3f}s\n"
+                   f"Simulated at {report['simulated_per_second']:,.0f} events/s")
+        ttk.Label(dialog, text=summary, justify=tk.LEFT, padding="10").pack(anchor=tk.W)
+        
+        # Drift curve: worst lateness per slice of the run
+        curve = report['drift_curve']
+        canvas = tk.Canvas(dialog, height=140, bg='white')
+        canvas.pack(fill=tk.X, padx=10)
+        if len(curve) > 1 and max(curve) > 0:
+            width, height, top = 580, 120, max(curve)
+            points = []
+            for i, value in enumerate(curve):
+                points += [10 + i * width / (len(curve) - 1), 130 - max(0.0, value) / top * height]
+            canvas.create_line(*points, fill='#c0392b')
+            canvas.create_text(12, 4, anchor=tk.NW, text=f"{top:.3f}s late", fill='gray')
+        else:
+            canvas.create_text(300, 70, text="No drift - every event fires on schedule", fill='gray')
+        
+        columns = ("Segment", "Events", "Wall", "Input/Settle", "Share")
+        tree = ttk.Treeview(dialog, columns=columns, show="headings", height=10)
+        column_widths = {"Segment": 220, "Events": 70, "Wall": 90, "Input/Settle": 90, "Share": 70}
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, width=column_widths[col])
+        tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        total = sum(segment['wall'] for segment in report['segments']) or 1.0
+        for segment in report['segments']:
+            tree.insert("", "end", values=(segment['label'], segment['events'], f"{segment['wall']:.2f}s",
+                                           f"{segment['busy']:.2f}s", f"{segment['wall'] / total * 100:.1f}%"))
+    
+    def fidelity_check(self):
+        """Replay against a fake backend and report how faithfully the current settings reproduce the script"""
+        if not self.recorded_events:
+            messagebox.showinfo("Info", "No events to check")
+            return
+        
+        settings = self.get_playback_settings()
+        events = self.recorded_events.snapshot()
+        blocks = self.script_blocks
+        script_file = self.current_file
+        
+        def run():
+            try:
+                report = measure_fidelity(events, blocks, settings, script_file)
+            except Exception as e:
+                message = f"Fidelity check failed: {str(e)}"
+                self.root.after(0, lambda: messagebox.showerror("Error", message))
+                return
+            self.root.after(0, lambda: self.show_fidelity_report(report))
+        
+        threading.Thread(target=run, name="Fidelity check", daemon=True).start()
+    
+    def show_fidelity_report(self, report):
+        """Show a fidelity check's metrics against their thresholds"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Fidelity Check")
+        dialog.transient(self.root)
+        ttk.Label(dialog, text=format_fidelity_report(report), justify=tk.LEFT, padding="10",
+                  font=('Consolas', 9)).pack(anchor=tk.W)
+        ttk.Button(dialog, text="Close", command=dialog.destroy).pack(pady=(0, 10))
+    
+    def toggle_tracing(self):
+        """Start collecting a trace, or stop and save it as Chrome trace JSON"""
+        if self.tracing.get():
+            tracer.start()
+            return
+        
+        tracer.stop()
+        filename = filedialog.asksaveasfilename(
+            title="Save Trace",
+            defaultextension=".json",
+            filetypes=[("Chrome Trace", "*.json"), ("All files", "*.*")]
+        )
+        if filename:
+            try:
+                tracer.save(filename)
+                messagebox.showinfo("Success", f"Saved {len(tracer.events)} trace events - open in ui.perfetto.dev")
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to save trace: {str(e)}")
+    
+    def arm_profile(self, name):
+        """Capture the next run of an operation with cProfile"""
+        tracer.profile_next = name
+        self.status_label.config(text=f"Profiling next {name}", foreground="black")
+    
+    def show_script_cache(self):
+        """Show the on-disk script cache and offer to clear it"""
+        stats = script_disk_cache.stats()
+        summary = (f"Cached scripts: {stats['entries']} ({stats['bytes'] / 1024 / 1024:.1f} MB "
+                   f"of {script_disk_cache.limit / 1024 / 1024:.0f} MB)\n"
+                   f"This session: {stats['hits']} hits, {stats['misses']} misses\n\n"
+                   f"Clear the cache?")
+        if messagebox.askyesno("Script Cache", summary):
+            script_disk_cache.clear()
+    
+    def show_playlist(self):
+        """Edit and play an ordered list of scripts"""
+        if self.playlist_dialog and self.playlist_dialog.winfo_exists():
+            self.playlist_dialog.lift()
+            return
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Playlist")
+        dialog.geometry("700x420")
+        dialog.transient(self.root)
+        self.playlist_dialog = dialog
+        
+        toolbar = ttk.Frame(dialog, padding="5")
+        toolbar.pack(fill=tk.X)
+        ttk.Button(toolbar, text="Add...", command=self.add_playlist_items).pack(side=tk.LEFT, padx=2)
+        ttk.Button(toolbar, text="Remove", command=self.remove_playlist_items).pack(side=tk.LEFT, padx=2)
+        ttk.Button(toolbar, text="Up", command=lambda: self.move_playlist_item(-1)).pack(side=tk.LEFT, padx=2)
+        ttk.Button(toolbar, text="Down", command=lambda: self.move_playlist_item(1)).pack(side=tk.LEFT, padx=2)
+        ttk.Button(toolbar, text="Load...", command=self.load_playlist_file).pack(side=tk.LEFT, padx=(10, 2))
+        ttk.Button(toolbar, text="Save...", command=self.save_playlist_file).pack(side=tk.LEFT, padx=2)
+        ttk.Button(toolbar, text="Play", command=self.play_playlist).pack(side=tk.RIGHT, padx=2)
+        
+        columns = ("#", "Script", "Speed", "Repeats", "Result")
+        self.playlist_tree = ttk.Treeview(dialog, columns=columns, show="headings", height=12)
+        column_widths = {"#": 40, "Script": 220, "Speed": 60, "Repeats": 70, "Result": 280}
+        for col in columns:
+            self.playlist_tree.heading(col, text=col)
+            self.playlist_tree.column(col, width=column_widths[col])
+        self.playlist_tree.pack(fill=tk.BOTH, expand=True, padx=5)
+        
+        item_frame = ttk.Frame(dialog, padding="5")
+        item_frame.pack(fill=tk.X)
+        speed_var = tk.DoubleVar(value=PLAYLIST_ITEM_DEFAULTS['speed'])
+        repeat_var = tk.IntVar(value=PLAYLIST_ITEM_DEFAULTS['repeat'])
+        ttk.Label(item_frame, text="Speed:").pack(side=tk.LEFT)
+        ttk.Spinbox(item_frame, from_=0.1, to=5.0, textvariable=speed_var, increment=0.1, format="%.1f",
+                    width=6).pack(side=tk.LEFT, padx=5)
+        ttk.Label(item_frame, text="Repeats:").pack(side=tk.LEFT)
+        ttk.Spinbox(item_frame, from_=1, to=10000, textvariable=repeat_var, width=6).pack(side=tk.LEFT, padx=5)
+        
+        def apply_to_selected():
+            try:
+                speed, repeat = speed_var.get(), repeat_var.get()
+            except tk.TclError:
+                messagebox.showerror("Error", "Speed and repeats must be numbers", parent=dialog)
+                return
+            for iid in self.playlist_tree.selection():
+                self.playlist_items[int(iid)].update(speed=speed, repeat=max(1, repeat))
+            self.refresh_playlist_dialog()
+        
+        ttk.Button(item_frame, text="Apply to Selected", command=apply_to_selected).pack(side=tk.LEFT, padx=5)
+        self.refresh_playlist_dialog()
+    
+    def refresh_playlist_dialog(self):
+        """Redraw the playlist and its last results if the dialog is open"""
+        if not (self.playlist_dialog and self.playlist_dialog.winfo_exists()):
+            return
+        selection = self.playlist_tree.selection()
+        self.playlist_tree.delete(*self.playlist_tree.get_children())
+        for index, item in enumerate(self.playlist_items):
+            result = self.playlist_results.get(index)
+            if result is None:
+                outcome = ""
+            elif result['error']:
+                outcome = f"Error: {result['error']}"
+            else:
+                outcome = (f"{'Stopped' if result['stopped'] else 'Done'}: {result['events']} events in "
+                           f"{result['duration']:.1f}s, waited {result['waited'] * 1000:.0f} ms to start")
+            self.playlist_tree.insert("", "end", iid=str(index),
+                                      values=(index + 1, os.path.basename(item['script']), f"{item['speed']:.1f}x",
+                                              item['repeat'], outcome))
+        self.playlist_tree.selection_set([iid for iid in selection if self.playlist_tree.exists(iid)])
+    
+    def add_playlist_items(self):
+        filenames = filedialog.askopenfilenames(
+            parent=self.playlist_dialog, title="Add Scripts",
+            filetypes=[("NaMouse Script", "*.nam"), ("JSON files", "*.json"), ("All files", "*.*")])
+        self.playlist_items.extend(dict(PLAYLIST_ITEM_DEFAULTS, script=filename) for filename in filenames)
+        self.playlist_results = {}
+        self.refresh_playlist_dialog()
+    
+    def remove_playlist_items(self):
+        drop = {int(iid) for iid in self.playlist_tree.selection()}
+        self.playlist_items = [item for i, item in enumerate(self.playlist_items) if i not in drop]
+        self.playlist_results = {}
+        self.refresh_playlist_dialog()
+    
+    def move_playlist_item(self, step):
+        """Move the selected item up (-1) or down (1)"""
+        selection = self.playlist_tree.selection()
+        if len(selection) != 1:
+            return
+        index = int(selection[0])
+        target = index + step
+        if 0 <= target < len(self.playlist_items):
+            items = self.playlist_items
+            items[index], items[target] = items[target], items[index]
+            self.playlist_results = {}
+            self.refresh_playlist_dialog()
+            self.playlist_tree.selection_set(str(target))
+    
+    def load_playlist_file(self):
+        filename = filedialog.askopenfilename(
+            parent=self.playlist_dialog, title="Load Playlist",
+            filetypes=[("NaMouse Playlist", "*.namlist"), ("All files", "*.*")])
+        if not filename:
+            return
+        try:
+            self.playlist_items = load_playlist(filename)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load playlist: {str(e)}", parent=self.playlist_dialog)
+            return
+        self.playlist_results = {}
+        self.refresh_playlist_dialog()
+    
+    def save_playlist_file(self):
+        filename = filedialog.asksaveasfilename(
+            parent=self.playlist_dialog, title="Save Playlist", defaultextension=".namlist",
+            filetypes=[("NaMouse Playlist", "*.namlist"), ("All files", "*.*")])
+        if not filename:
+            return
+        try:
+            save_playlist(filename, self.playlist_items)
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to save playlist: {str(e)}", parent=self.playlist_dialog)
+    
+    def play_playlist(self):
+        """Play the playlist in order on the playback thread"""
+        if not self.playlist_items:
+            messagebox.showinfo("Info", "The playlist is empty", parent=self.playlist_dialog)
+            return
+        token = self.claim_playback("Playlist")
+        if token is None:
+            messagebox.showwarning("Warning", "Cannot play while recording or playing!", parent=self.playlist_dialog)
+            return
+        
+        self.playlist_results = {}
+        self.refresh_playlist_dialog()
+        self.show_playing("Playlist...")
+        items = [dict(item) for item in self.playlist_items]
+        self.playback_thread = threading.Thread(target=self.run_playlist, args=(items, token), name="Playback",
+                                                daemon=True)
+        self.playback_thread.start()
+    
+    def run_playlist(self, items, token):
+        """Playback thread body for a playlist"""
+        def on_result(result):
+            def show():
+                self.playlist_results[result['index']] = result
+                self.refresh_playlist_dialog()
+            self.root.after(0, show)
+        
+        def play_item(index, item, compiled):
+            label = f"Playlist {index + 1}/{len(items)}: {os.path.basename(item['script'])}"
+            self.root.after(0, lambda: self.show_playing(label))
+            return self.player_for(compiled['settings']).play(compiled['events'], compiled['blocks'],
+                                                              compiled['settings'], script_file=compiled['path'])
+        
+        results = PlaylistPlayer(self.compile_playlist_item, play_item, on_result).run(items)
+        self.end_playback(token)
+        done = sum(1 for result in results if not result['stopped'] and not result['error'])
+        summary = f"Playlist: {done} of {len(items)} scripts completed"
+        self.root.after(0, lambda: self.playback_finished(summary))
+    
+    def compile_playlist_item(self, item):
+        """Prefetch thread: parse, remap and smooth one playlist item"""
+        data = read_script_file(item['script'])
+        settings = dict(PLAYBACK_DEFAULTS)
+        settings.update(data['settings'] or {})
+        settings.update(playback_speed=item['speed'], repeat_count=item['repeat'])
+        metadata = data['metadata']
+        screen = (metadata.get('screen_width') or self.actual_screen_width,
+                  metadata.get('screen_height') or self.actual_screen_height)
+        
+        events, blocks = data['events'], data['blocks']
+        transform = self.get_coordinate_transform(settings, screen)
+        if transform is not None and not transform.is_identity():
+            events, blocks = remap_script(events, blocks, transform)
+        if settings['mouse_smoothing'] and not settings['fast_mode']:
+            events, blocks = smooth_script(events, blocks, *smoothing_options(settings))
+            settings['mouse_smoothing'] = False  # the points are in the script now
+        return {'path': item['script'], 'events': events, 'blocks': blocks, 'settings': settings}
+    
+    def show_scheduler(self):
+        """Queue scripts to run unattended and review past runs"""
+        if self.scheduler_dialog and self.scheduler_dialog.winfo_exists():
+            self.scheduler_dialog.lift()
+            return
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Scheduler")
+        dialog.geometry("760x520")
+        dialog.transient(self.root)
+        self.scheduler_dialog = dialog
+        
+        queue_group = ttk.LabelFrame(dialog, text="Queue", padding="5")
+        queue_group.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        
+        toolbar = ttk.Frame(queue_group)
+        toolbar.pack(fill=tk.X)
+        ttk.Button(toolbar, text="Add Job...", command=self.add_scheduled_job).pack(side=tk.LEFT, padx=2)
+        ttk.Button(toolbar, text="Remove", command=self.remove_scheduled_jobs).pack(side=tk.LEFT, padx=2)
+        self.hold_queue = tk.BooleanVar(value=self.scheduler.held)
+        ttk.Checkbutton(toolbar, text="Hold Queue", variable=self.hold_queue,
+                        command=lambda: self.scheduler.set_held(self.hold_queue.get())).pack(side=tk.LEFT, padx=10)
+        
+        columns = ("Script", "Next Run", "Cron", "Priority", "State")
+        self.jobs_tree = ttk.Treeview(queue_group, columns=columns, show="headings", height=8)
+        column_widths = {"Script": 220, "Next Run": 140, "Cron": 120, "Priority": 60, "State": 80}
+        for col in columns:
+            self.jobs_tree.heading(col, text=col)
+            self.jobs_tree.column(col, width=column_widths[col])
+        self.jobs_tree.pack(fill=tk.BOTH, expand=True, pady=5)
+        
+        history_group = ttk.LabelFrame(dialog, text="Run History", padding="5")
+        history_group.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        
+        columns = ("Started", "Script", "Duration", "Events", "Outcome")
+        self.history_tree = ttk.Treeview(history_group, columns=columns, show="headings", height=8)
+        column_widths = {"Started": 140, "Script": 220, "Duration": 80, "Events": 70, "Outcome": 200}
+        for col in columns:
+            self.history_tree.heading(col, text=col)
+            self.history_tree.column(col, width=column_widths[col])
+        self.history_tree.pack(fill=tk.BOTH, expand=True)
+        
+        self.refresh_scheduler_dialog()
+    
+    def refresh_scheduler_dialog(self):
+        """Redraw the scheduler queue and history if the dialog is open"""
+        if not (self.scheduler_dialog and self.scheduler_dialog.winfo_exists()):
+            return
+        
+        def when(timestamp):
+            return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M")
+        
+        running, queued = self.scheduler.jobs()
+        now = time.time()
+        self.jobs_tree.delete(*self.jobs_tree.get_children())
+        for job in running + queued:
+            if job in running:
+                state = "Running"
+            elif job['start'] <= now:
+                state = "Held" if self.scheduler.held else "Due"
+            else:
+                state = "Waiting"
+            self.jobs_tree.insert("", "end", iid=str(job['id']),
+                                  values=(job['name'], when(job['start']), job['cron'] or "once",
+                                          job['priority'], state))
+        
+        self.history_tree.delete(*self.history_tree.get_children())
+        for run in self.scheduler.history():
+            outcome = run['outcome'] if not run['error'] else f"{run['outcome']}: {run['error']}"
+            self.history_tree.insert("", "end", values=(when(run['started']), run['name'],
+                                                        f"{run['duration']:.1f}s", run['events'], outcome))
+    
+    def add_scheduled_job(self):
+        """Dialog for queueing a script file"""
+        dialog = tk.Toplevel(self.scheduler_dialog or self.root)
+        dialog.title("Add Job")
+        dialog.geometry("420x250")
+        dialog.transient(self.scheduler_dialog or self.root)
+        dialog.grab_set()
+        
+        script_var = tk.StringVar(value=self.current_file or "")
+        start_var = tk.StringVar(value="")
+        cron_var = tk.StringVar(value="")
+        priority_var = tk.IntVar(value=0)
+        use_current_var = tk.BooleanVar(value=False)
+        
+        form = ttk.Frame(dialog, padding="10")
+        form.pack(fill=tk.X)
+        fields = [("Script:", script_var, 30), ("Start (YYYY-MM-DD HH:MM, blank = now):", start_var, 18),
+                  ("Cron (min hour day month weekday):", cron_var, 18), ("Priority (higher first):", priority_var, 8)]
+        for i, (label, var, width) in enumerate(fields):
+            ttk.Label(form, text=label).grid(row=i * 2, column=0, sticky=tk.W)
+            ttk.Entry(form, textvariable=var, width=width).grid(row=i * 2 + 1, column=0, sticky=tk.W, pady=(0, 4))
+        
+        def browse():
+            filename = filedialog.askopenfilename(
+                parent=dialog, title="Choose Script",
+                filetypes=[("NaMouse Script", "*.nam"), ("JSON files", "*.json"), ("All files", "*.*")])
+            if filename:
+                script_var.set(filename)
+        
+        ttk.Button(form, text="Browse...", command=browse).grid(row=1, column=1, padx=5, sticky=tk.W)
+        ttk.Checkbutton(form, text="Use the Settings tab instead of the script's saved settings",
+                        variable=use_current_var).grid(row=8, column=0, columnspan=2, sticky=tk.W)
+        
+        def add():
+            try:
+                if not os.path.isfile(script_var.get()):
+                    raise ValueError("script file not found")
+                start = None
+                if start_var.get().strip():
+                    start = datetime.strptime(start_var.get().strip(), "%Y-%m-%d %H:%M").timestamp()
+                settings = self.get_playback_settings() if use_current_var.get() else {}
+                self.scheduler.add_job(script_var.get(), start, settings, cron_var.get().strip(),
+                                       priority_var.get())
+            except (ValueError, tk.TclError, OSError) as e:
+                messagebox.showerror("Error", f"Cannot add job: {str(e)}", parent=dialog)
+                return
+            dialog.destroy()
+        
+        ttk.Button(dialog, text="Add", command=add).pack(pady=2)
+        ttk.Button(dialog, text="Cancel", command=dialog.destroy).pack()
+    
+    def remove_scheduled_jobs(self):
+        """Remove the selected jobs from the queue"""
+        for item in self.jobs_tree.selection():
+            self.scheduler.remove_job(int(item))
+    
     def export_as_python(self):
         """Export the script as a standalone Python file"""
         if not self.recorded_events:
             messagebox.showinfo("Info", "No events to export")
             return
+        try:
+            code = self.generate_python_code()
+        except (OSError, ValueError, RuntimeError) as e:
+            messagebox.showerror("Error", f"Failed to export: {str(e)}")
+            return
         
         filename = filedialog.asksaveasfilename(
             title="Export as Python",
@@ -941,11 +6197,83 @@ HOW TO USE:
         if filename:
             try:
                 with open(filename, 'w') as f:
-                    f.write(self.generate_python_code())
+                    f.write(code)
                 messagebox.showinfo("Success", f"Exported to {filename}")
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to export: {str(e)}")
     
+    def export_columns(self):
+        """Export the event stream as CSV or NPZ columns, in the background"""
+        if not self.recorded_events:
+            messagebox.showinfo("Info", "No events to export")
+            return
+        
+        filename = filedialog.asksaveasfilename(
+            title="Export Columns",
+            defaultextension=".npz",
+            filetypes=[("NumPy columns", "*.npz"), ("CSV", "*.csv"), ("All files", "*.*")]
+        )
+        if not filename:
+            return
+        
+        events, blocks = self.recorded_events.snapshot(), dict(self.script_blocks)
+        settings = self.get_playback_settings()
+        metadata = {
+            'created': datetime.now().isoformat(),
+            'source': self.current_file,
+            'total_events': len(events),
+            'duration': script_duration(events, blocks),
+            'screen_width': self.script_screen[0],
+            'screen_height': self.script_screen[1]
+        }
+        name = os.path.basename(filename)
+        
+        loader = make_script_loader(self.current_file)
+        
+        def progress(count):
+            self.root.after(0, lambda: self.save_status.set(f"Exporting {name}... {count:,} rows"))
+        
+        def run():
+            try:
+                rows = export_columns(filename, events, blocks, settings, metadata, loader, on_progress=progress)
+                self.root.after(0, lambda: self.save_status.set(f"Exported {rows:,} rows to {name}"))
+            except Exception as e:
+                error = str(e)
+                self.root.after(0, lambda: (self.save_status.set(""),
+                                            messagebox.showerror("Error", f"Failed to export: {error}")))
+        
+        self.save_status.set(f"Exporting {name}...")
+        threading.Thread(target=run, name="Export", daemon=True).start()
+    
+    def import_columns(self):
+        """Load a CSV or NPZ column export as a new, flat script"""
+        filename = filedialog.askopenfilename(
+            title="Import Columns",
+            filetypes=[("NumPy columns", "*.npz"), ("CSV", "*.csv"), ("All files", "*.*")]
+        )
+        if not filename:
+            return
+        try:
+            events, settings, metadata = import_columns(filename)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to import: {str(e)}")
+            return
+        
+        self.recorded_events = events
+        self.script_blocks = {}
+        self.script_screen = (metadata.get('screen_width') or self.actual_screen_width,
+                              metadata.get('screen_height') or self.actual_screen_height)
+        self.update_remap_info()
+        if settings:
+            self.apply_playback_settings(settings)
+        
+        self.current_file = None  # saving writes a .nam, not back to the export
+        self.history.clear()
+        self.update_script_display()
+        self.root.title(f"NaMouse - {os.path.basename(filename)} (imported)")
+        self.total_events.set(str(len(events)))
+        self.recording_duration.set(f"{script_duration(events, self.script_blocks):.2f}s")
+    
     def generate_python_code(self):
         """Generate standalone Python code"""
         code = '''#!/usr/bin/env python3
@@ -967,6 +6295,27 @@ def set_mouse_position_forced(x, y):
         mouse_controller.position = (int(x), int(y))
         time.sleep(0.005)
 
+def wait_for_color(x, y, color, tolerance, timeout):
+    """Poll the pixel at (x, y) until it matches color (Windows); returns seconds waited"""
+    import ctypes
+    expected = tuple(int(color.lstrip('#')[i:i + 2], 16) for i in (0, 2, 4))
+    user32 = ctypes.windll.user32
+    wait_start = time.time()
+    while True:
+        hdc = user32.GetDC(0)
+        try:
+            pixel = ctypes.windll.gdi32.GetPixel(hdc, x, y)
+        finally:
+            user32.ReleaseDC(0, hdc)
+        actual = (pixel & 0xFF, (pixel >> 8) & 0xFF, (pixel >> 16) & 0xFF)
+        if all(abs(a - e) <= tolerance for a, e in zip(actual, expected)):
+            break
+        if timeout > 0 and time.time() - wait_start >= timeout:
+            print(f"Wait for {{color}} at ({{x}}, {{y}}) timed out")
+            break
+        time.sleep({poll})
+    return time.time() - wait_start
+
 def run_automation():
     """Execute the recorded automation"""
     print("Starting automation in 3 seconds...")
@@ -974,19 +6323,23 @@ def run_automation():
     
     start_time = time.time()
     
-'''.format(date=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+'''.format(date=datetime.now().strftime("%Y-%m-%d %H:%M:%S"), poll=WAIT_FOR_POLL_INTERVAL)
         
-        for event in self.recorded_events:
+        loader = make_script_loader(self.current_file)
+        if runs_forever(self.recorded_events, self.script_blocks, loader):
+            raise ValueError("the script has a loop that repeats forever, which the Python export cannot "
+                             "reproduce. Give the loop a repeat count to export it.")
+        for event_time, event in iter_script_events(self.recorded_events, self.script_blocks, loader):
             if event['type'] == 'mouse_move':
                 code += f"    # Move mouse\n"
-                code += f"    time.sleep(max(0, {event['time']:.3f} - (time.time() - start_time)))\n"
+                code += f"    time.sleep(max(0, {event_time:.3f} - (time.time() - start_time)))\n"
                 code += f"    set_mouse_position_forced({event['x']}, {event['y']})\n\n"
                 
             elif event['type'] == 'mouse_click':
                 button = 'mouse.Button.left' if event['button'] == 'left' else 'mouse.Button.right'
                 action = 'press' if event['pressed'] else 'release'
                 code += f"    # {action.title()} {event['button']} button\n"
-                code += f"    time.sleep(max(0, {event['time']:.3f} - (time.time() - start_time)))\n"
+                code += f"    time.sleep(max(0, {event_time:.3f} - (time.time() - start_time)))\n"
                 code += f"    set_mouse_position_forced({event['x']}, {event['y']})\n"
                 code += f"    time.sleep(0.03)\n"
                 code += f"    set_mouse_position_forced({event['x']}, {event['y']})\n"
@@ -996,7 +6349,7 @@ def run_automation():
                 
             elif event['type'] == 'mouse_scroll':
                 code += f"    # Scroll\n"
-                code += f"    time.sleep(max(0, {event['time']:.3f} - (time.time() - start_time)))\n"
+                code += f"    time.sleep(max(0, {event_time:.3f} - (time.time() - start_time)))\n"
                 code += f"    set_mouse_position_forced({event['x']}, {event['y']})\n"
                 code += f"    time.sleep(0.02)\n"
                 code += f"    mouse_controller.scroll({event['dx']}, {event['dy']})\n\n"
@@ -1008,7 +6361,7 @@ def run_automation():
                 else:
                     key_code = f"keyboard.Key.{key}"
                 code += f"    # Press key: {key}\n"
-                code += f"    time.sleep(max(0, {event['time']:.3f} - (time.time() - start_time)))\n"
+                code += f"    time.sleep(max(0, {event_time:.3f} - (time.time() - start_time)))\n"
                 code += f"    try:\n"
                 code += f"        keyboard_controller.press({key_code})\n"
                 code += f"    except: pass\n\n"
@@ -1020,11 +6373,23 @@ def run_automation():
                 else:
                     key_code = f"keyboard.Key.{key}"
                 code += f"    # Release key: {key}\n"
-                code += f"    time.sleep(max(0, {event['time']:.3f} - (time.time() - start_time)))\n"
+                code += f"    time.sleep(max(0, {event_time:.3f} - (time.time() - start_time)))\n"
                 code += f"    try:\n"
                 code += f"        keyboard_controller.release({key_code})\n"
                 code += f"    except: pass\n\n"
                 
+            elif event['type'] == 'type_text':
+                code += f"    # Type text\n"
+                code += f"    time.sleep(max(0, {event_time:.3f} - (time.time() - start_time)))\n"
+                code += f"    keyboard_controller.type({event['text']!r})\n\n"
+                
+            elif event['type'] == 'wait_for':
+                # The wait takes as long as it takes; later events move with it, as in playback
+                code += f"    # Wait for {event['color']} at ({event['x']}, {event['y']})\n"
+                code += f"    time.sleep(max(0, {event_time:.3f} - (time.time() - start_time)))\n"
+                code += (f"    start_time += wait_for_color({event['x']}, {event['y']}, {event['color']!r}, "
+                         f"{event.get('tolerance', 10)}, {event.get('timeout', 30.0)})\n\n")
+                
             elif event['type'] == 'delay':
                 code += f"    # Custom delay\n"
                 code += f"    time.sleep({event['duration']:.3f})\n\n"
@@ -1045,29 +6410,67 @@ if __name__ == "__main__":
         """Clear all recorded events"""
         if self.recorded_events:
             if messagebox.askyesno("Confirm", "Clear all recorded events?"):
-                self.recorded_events = []
+                self.push_undo()
+                self.recorded_events = ChunkedEventList()
+                self.script_blocks = {}
+                self.script_screen = (self.actual_screen_width, self.actual_screen_height)
+                self.update_remap_info()
                 self.update_script_display()
                 self.total_events.set("0")
                 self.recording_duration.set("0.00s")
     
     def delete_selected(self):
         """Delete selected events"""
-        selected = self.script_tree.selection()
-        if selected:
-            indices = sorted([self.script_tree.index(item) for item in selected], reverse=True)
-            
-            for i in indices:
-                if i < len(self.recorded_events):
-                    del self.recorded_events[i]
+        indices = self.selected_top_level_indices()
+        if indices:
+            self.push_undo()
+            self.recorded_events.delete_indices(i for i in indices if i < len(self.recorded_events))
             
             self.update_script_display()
             self.total_events.set(str(len(self.recorded_events)))
     
+    def script_snapshot(self):
+        """Immutable state of the script: (events snapshot, blocks, recorded display)"""
+        return self.recorded_events.snapshot(), self.script_blocks, self.script_screen
+    
+    def push_undo(self):
+        """Record the current script before an edit"""
+        self.history.record(self.script_snapshot())
+    
+    def undo(self):
+        """Undo the last edit"""
+        if self.is_recording:
+            return
+        snapshot = self.history.undo(self.script_snapshot())
+        if snapshot is not None:
+            self.restore_snapshot(snapshot)
+    
+    def redo(self):
+        """Redo the last undone edit"""
+        if self.is_recording:
+            return
+        snapshot = self.history.redo(self.script_snapshot())
+        if snapshot is not None:
+            self.restore_snapshot(snapshot)
+    
+    def restore_snapshot(self, snapshot):
+        """Make a snapshot the current script"""
+        events, self.script_blocks, self.script_screen = snapshot
+        self.recorded_events = ChunkedEventList.from_snapshot(events)
+        self.update_remap_info()
+        self.update_script_display()
+        self.total_events.set(str(len(self.recorded_events)))
+        self.recording_duration.set(f"{script_duration(self.recorded_events, self.script_blocks):.2f}s")
+    
     def new_script(self):
         """Create a new script"""
         if self.recorded_events:
             if messagebox.askyesno("Confirm", "Create new script? Current events will be lost if not saved."):
-                self.recorded_events = []
+                self.recorded_events = ChunkedEventList()
+                self.script_blocks = {}
+                self.script_screen = (self.actual_screen_width, self.actual_screen_height)
+                self.update_remap_info()
+                self.history.clear()
                 self.current_file = None
                 self.update_script_display()
                 self.root.title("NaMouse - Automation Tool")
@@ -1082,37 +6485,35 @@ if __name__ == "__main__":
         )
         if filename:
             try:
-                with open(filename, 'r') as f:
-                    data = json.load(f)
-                    
-                # Handle both old and new format
-                if isinstance(data, list):
-                    self.recorded_events = data
-                else:
-                    self.recorded_events = data.get('events', [])
-                    # Load settings if available
-                    if 'settings' in data:
-                        settings = data['settings']
-                        self.playback_speed.set(settings.get('playback_speed', 1.0))
-                        self.repeat_count.set(settings.get('repeat_count', 1))
-                        self.repeat_interval.set(settings.get('repeat_interval', 0))
-                        self.mouse_smoothing.set(settings.get('mouse_smoothing', False))
-                        self.use_high_precision.set(settings.get('use_high_precision', False))
-                        self.force_position.set(settings.get('force_position', True))
-                
-                self.current_file = filename
-                self.update_script_display()
-                self.root.title(f"NaMouse - {os.path.basename(filename)}")
-                
-                if self.recorded_events:
-                    self.total_events.set(str(len(self.recorded_events)))
-                    self.recording_duration.set(f"{self.recorded_events[-1]['time']:.2f}s")
-                
+                self.load_script(filename)
                 messagebox.showinfo("Success", "Script loaded successfully!")
-                
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to load script: {str(e)}")
     
+    @traced('open_script')
+    def load_script(self, filename):
+        """Load a script file into the editor"""
+        data = read_script_file(filename)
+        self.recorded_events = ChunkedEventList(data['events'])
+        self.script_blocks = data['blocks']
+        metadata = data['metadata']
+        self.script_screen = (metadata.get('screen_width') or self.actual_screen_width,
+                              metadata.get('screen_height') or self.actual_screen_height)
+        self.update_remap_info()
+        
+        # Load settings if available
+        if data['settings']:
+            self.apply_playback_settings(data['settings'])
+        
+        self.current_file = filename
+        self.history.clear()
+        self.update_script_display()
+        self.root.title(f"NaMouse - {os.path.basename(filename)}")
+        
+        if self.recorded_events:
+            self.total_events.set(str(len(self.recorded_events)))
+            self.recording_duration.set(f"{script_duration(self.recorded_events, self.script_blocks):.2f}s")
+    
     def save_script(self):
         """Save the current script"""
         if self.current_file:
@@ -1133,41 +6534,37 @@ if __name__ == "__main__":
             self.root.title(f"NaMouse - {os.path.basename(filename)}")
     
     def save_to_file(self, filename):
-        """Save script to file"""
-        try:
-            data = {
-                'version': '2.3',
-                'events': self.recorded_events,
-                'settings': {
-                    'playback_speed': self.playback_speed.get(),
-                    'repeat_count': self.repeat_count.get(),
-                    'repeat_interval': self.repeat_interval.get(),
-                    'mouse_smoothing': self.mouse_smoothing.get(),
-                    'use_high_precision': self.use_high_precision.get(),
-                    'force_position': self.force_position.get()
-                },
-                'metadata': {
-                    'created': datetime.now().isoformat(),
-                    'total_events': len(self.recorded_events),
-                    'duration': self.recorded_events[-1]['time'] if self.recorded_events else 0,
-                    'screen_width': self.actual_screen_width,
-                    'screen_height': self.actual_screen_height
-                }
-            }
-            
-            with open(filename, 'w') as f:
-                json.dump(data, f, indent=2)
-            
-            messagebox.showinfo("Success", "Script saved successfully!")
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to save script: {str(e)}")
+        """Save script to file in the background; editing and playback carry on meanwhile"""
+        self.save_status.set(f"Saving {os.path.basename(filename)}...")
+        self.saver.save(filename, self.recorded_events.snapshot(), dict(self.script_blocks),
+                        self.get_playback_settings(), self.script_screen)
+    
+    def save_finished(self, filename, error):
+        """Report the end of a background save"""
+        if error:
+            self.save_status.set("")
+            messagebox.showerror("Error", f"Failed to save script: {str(error)}")
+        else:
+            self.save_status.set(f"Saved {os.path.basename(filename)} at {datetime.now():%H:%M:%S}")
     
     def on_closing(self):
         """Handle application closing"""
         if self.recorded_events and not self.current_file:
             if messagebox.askyesno("Unsaved Changes", "You have unsaved changes. Do you want to save before closing?"):
                 self.save_script_as()
+        self.finish_closing()
+    
+    def finish_closing(self):
+        """Close once pending saves are written"""
+        if self.saver.busy():
+            self.root.after(100, self.finish_closing)
+            return
+        
+        self.scheduler.close()
+        self.process_player.close()
+        if self.control_server:
+            self.api_enabled.set(False)
+            self.toggle_control_api()
         
         # Clean up listeners
         try:
@@ -1183,6 +6580,9 @@ if __name__ == "__main__":
         self.root.destroy()
 
 def main():
+    multiprocessing.freeze_support()  # the playback worker re-runs this module in a frozen build
+    if sys.argv[1:2] == ['--fidelity']:
+        sys.exit(fidelity_cli(sys.argv[2:]))
     root = tk.Tk()
     app = NaMouseApp(root)
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
@@ -0,0 +1,58 @@
+"""Test setup: stand-ins for the Windows-only input libraries, so main imports anywhere"""
+import ctypes
+import enum
+import os
+import sys
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class _Controller:
+    """Records every call as (method, args...) in log"""
+    
+    def __init__(self):
+        self.position = (0, 0)
+        self.log = []
+    
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return lambda *args: self.log.append((name,) + args)
+
+
+class _Listener:
+    def __init__(self, **callbacks):
+        self.callbacks = callbacks
+    
+    def start(self):
+        pass
+    
+    def stop(self):
+        pass
+
+
+def _install_pynput():
+    mouse = types.ModuleType('pynput.mouse')
+    mouse.Button = enum.Enum('Button', 'left right middle x1 x2')
+    mouse.Controller = _Controller
+    mouse.Listener = _Listener
+    keyboard = types.ModuleType('pynput.keyboard')
+    keyboard.Key = enum.Enum('Key', 'alt ctrl shift enter tab esc space backspace delete up down left right '
+                                    'home end page_up page_down cmd caps_lock insert '
+                                    + ' '.join(f'f{n}' for n in range(1, 13)))
+    keyboard.Controller = _Controller
+    keyboard.Listener = _Listener
+    pynput = types.ModuleType('pynput')
+    pynput.mouse = mouse
+    pynput.keyboard = keyboard
+    sys.modules.update({'pynput': pynput, 'pynput.mouse': mouse, 'pynput.keyboard': keyboard})
+
+
+try:
+    import pynput  # noqa: F401
+except Exception:  # no display, or not on Windows
+    _install_pynput()
+
+if not hasattr(ctypes, 'windll'):
+    ctypes.windll = types.SimpleNamespace()
@@ -0,0 +1,43 @@
+import pytest
+
+import main
+
+
+SCRIPT = [
+    {'type': 'mouse_move', 'time': 0.0, 'x': 10, 'y': 20},
+    {'type': 'mouse_click', 'time': 0.1, 'x': 10, 'y': 20, 'button': 'left', 'pressed': True},
+    {'type': 'mouse_click', 'time': 0.2, 'x': 10, 'y': 20, 'button': 'middle', 'pressed': False},
+    {'type': 'mouse_scroll', 'time': 0.3, 'x': 5, 'y': 6, 'dx': 0, 'dy': -2},
+    {'type': 'key_press', 'time': 0.4, 'key': 'shift'},
+    {'type': 'key_release', 'time': 0.5, 'key': 'shift'},
+    {'type': 'type_text', 'time': 0.6, 'text': 'hi', 'offsets': [0.0, 0.1]},
+    {'type': 'delay', 'time': 0.8, 'duration': 1.5},
+    {'type': 'loop', 'time': 1.0, 'count': 2, 'events': [{'type': 'key_press', 'time': 0.0, 'key': 'a'}]},
+]
+SETTINGS = {'playback_speed': 2.0}
+METADATA = {'screen_width': 1920, 'screen_height': 1080}
+
+
+@pytest.mark.parametrize('extension', ['.npz', '.csv'])
+def test_columns_round_trip(tmp_path, extension, monkeypatch):
+    monkeypatch.setattr(main, 'COLUMN_EXPORT_CHUNK', 3)  # several chunks
+    filename = str(tmp_path / ('script' + extension))
+    count = main.export_columns(filename, SCRIPT, {}, SETTINGS, METADATA)
+    expected = [dict(event, time=event_time) for event_time, event in main.iter_script_events(SCRIPT, {})]
+    assert count == len(expected) == 10
+    
+    events, settings, metadata = main.import_columns(filename)
+    assert settings == SETTINGS and metadata == METADATA
+    assert len(events) == len(expected)
+    for got, want in zip(events, expected):
+        assert got['time'] == pytest.approx(want['time'])
+        assert dict(got, time=0) == dict(want, time=0)
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_csv_without_sidecar_is_refused(tmp_path):
+    filename = str(tmp_path / 'script.csv')
+    main.export_columns(filename, SCRIPT, {}, {}, {})
+    (tmp_path / ('script.csv' + main.COLUMN_META_SUFFIX)).unlink()
+    with pytest.raises(ValueError):
+        main.import_columns(filename)
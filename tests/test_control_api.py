@@ -0,0 +1,79 @@
+import http.client
+import json
+import threading
+import types
+
+import pytest
+
+import main
+
+
+TOKEN = 'secret-token'
+
+
+class FakeApp:
+    """The parts of NaMouseApp the /play route touches"""
+    
+    api_play = main.NaMouseApp.api_play
+    
+    def __init__(self):
+        self.now_playing = None
+        self.started = []
+        self.script_cache = types.SimpleNamespace(
+            get=lambda path: ({'name': 'demo', 'path': path, 'events': []}, True))
+    
+    def claim_playback(self, name):
+        return 1
+    
+    def play_compiled(self, token, script, settings, label, trigger_time):
+        self.started.append(settings)
+
+
+@pytest.fixture
+def server():
+    app = FakeApp()
+    server = main.ControlServer(app, TOKEN, port=0)
+    threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def post(server, path, body):
+    connection = http.client.HTTPConnection('127.0.0.1', server.server_address[1])
+    payload = body if isinstance(body, bytes) else json.dumps(body).encode('utf-8')
+    connection.request('POST', path, payload, {'Authorization': f'Bearer {TOKEN}',
+                                               'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    result = response.status, json.loads(response.read())
+    connection.close()
+    return result
+
+
+@pytest.mark.parametrize('body', [[], 'x', 3, None])
+def test_non_object_bodies_are_rejected(server, body):
+    assert post(server, '/play', body)[0] == 400
+    assert post(server, '/load', body)[0] == 400
+
+
+@pytest.mark.parametrize('settings', [{'repeat_count': '3'}, {'repeat_count': 1.5}, {'fast_mode': 1},
+                                      {'playback_speed': -1}, {'no_such_setting': 1}, [1]])
+def test_bad_settings_are_rejected(server, settings):
+    status, result = post(server, '/play', {'script': 'demo.json', 'settings': settings})
+    assert status == 400 and 'settings' in result['error']
+    assert server.app.started == []
+
+
+def test_play_coerces_settings(server):
+    status, _ = post(server, '/play', {'script': 'demo.json', 'settings': {'playback_speed': 2, 'repeat_count': 3}})
+    assert status == 202
+    for _ in range(100):
+        if server.app.started:
+            break
+        threading.Event().wait(0.01)
+    assert server.app.started == [{'playback_speed': 2.0, 'repeat_count': 3}]
+    assert type(server.app.started[0]['playback_speed']) is float
+
+
+def test_script_must_be_a_path(server):
+    assert post(server, '/play', {'script': 5})[0] == 400
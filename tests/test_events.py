@@ -0,0 +1,156 @@
+import numpy as np
+import pytest
+
+import main
+from main import ChunkedEventList, EditHistory
+
+
+def moves(count, start=0):
+    return [{'type': 'mouse_move', 'time': (start + i) * 0.01, 'x': start + i, 'y': 0} for i in range(count)]
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(main, 'EVENT_CHUNK_SIZE', 4)
+
+
+def test_snapshot_is_unchanged_by_later_edits(small_chunks):
+    events = ChunkedEventList(moves(10))
+    before = events.snapshot()
+    events[5] = dict(events[5], x=-1)
+    del events[0]
+    events.insert(3, {'type': 'delay', 'time': 0.0, 'duration': 1.0})
+    events.append(moves(1, 99)[0])
+    
+    assert [event['x'] for event in before] == list(range(10))
+    assert len(events) == 11
+    assert events[5]['x'] == -1 and events[3]['type'] == 'delay'
+
+
+def test_edits_copy_only_the_chunks_they_touch(small_chunks):
+    events = ChunkedEventList(moves(12))
+    before = events.snapshot()
+    events[9] = dict(events[9], x=-1)
+    assert events._chunks[0] is before._chunks[0]
+    assert events._chunks[1] is before._chunks[1]
+    assert events._chunks[2] is not before._chunks[2]
+
+
+def test_delete_indices_and_replace_many(small_chunks):
+    events = ChunkedEventList(moves(10))
+    before = events.snapshot()
+    events.replace_many({1: dict(events[1], x=100), 8: dict(events[8], x=800)})
+    events.delete_indices([0, 4, 5, 6, 7])
+    assert [event['x'] for event in events] == [100, 2, 3, 800, 9]
+    assert [event['x'] for event in events.iter_range(1, 4)] == [2, 3, 800]
+    assert len(before) == 10 and before[1]['x'] == 1
+
+
+def test_version_changes_with_every_edit():
+    events = ChunkedEventList(moves(3))
+    seen = {events.version}
+    events.append(moves(1, 3)[0])
+    seen.add(events.version)
+    events[0] = dict(events[0], x=5)
+    seen.add(events.version)
+    del events[1]
+    seen.add(events.version)
+    assert len(seen) == 4
+
+
+def test_edit_history_undo_redo_restores_snapshots():
+    history = EditHistory(limit=2)
+    events = ChunkedEventList(moves(3))
+    history.record(events.snapshot())
+    events.append(moves(1, 3)[0])
+    history.record(events.snapshot())
+    events.append(moves(1, 4)[0])
+    
+    restored = ChunkedEventList.from_snapshot(history.undo(events.snapshot()))
+    assert len(restored) == 4
+    assert len(history.redo(restored.snapshot())) == 5
+    assert history.undo(restored.snapshot()) is not None
+    
+    history.record(restored.snapshot())
+    assert history.redo(restored.snapshot()) is None  # a new edit drops the redo stack
+    assert len(history.undo_stack) == 2
+
+
+def test_mined_blocks_inline_back_to_the_script():
+    pattern = [{'type': 'mouse_click', 'time': 0.1 * i, 'x': 10 * i, 'y': 5, 'button': 'left',
+                'pressed': i % 2 == 0} for i in range(8)]
+    script = []
+    for repeat in range(3):
+        script.extend(dict(event, time=event['time'] + 2.0 * repeat) for event in pattern)
+        script.append({'type': 'key_press', 'time': 2.0 * repeat + 1.5, 'key': str(repeat)})
+    
+    events, blocks = main.mine_repeated_blocks(script)
+    assert len(blocks) == 1
+    assert [event['type'] for event in events].count('block') == 3
+    
+    inlined = main.inline_blocks(events, blocks)
+    assert len(inlined) == len(script)
+    for got, want in zip(inlined, script):
+        assert got['time'] == pytest.approx(want['time'])
+        assert dict(got, time=0) == dict(want, time=0)
+
+
+def test_short_or_unique_runs_are_not_mined():
+    events, blocks = main.mine_repeated_blocks(moves(20))
+    assert blocks == {}
+    assert len(events) == 20
+
+
+def test_parse_event_query():
+    query = main.parse_event_query("type:click,press key:Enter,a button:LEFT time:1:30-2:00 region:800,600,0,0")
+    assert query == {
+        'types': {'mouse_click', 'key_press'},
+        'keys': {'enter', 'a'},
+        'button': 'left',
+        'time': (90.0, 120.0),
+        'region': (0.0, 0.0, 800.0, 600.0),
+    }
+    assert main.parse_event_query("time:5-") == {'time': (5.0, float('inf'))}
+    with pytest.raises(ValueError):
+        main.parse_event_query("colour:red")
+    with pytest.raises(ValueError):
+        main.parse_event_query("type:")
+
+
+def test_event_query_index_matches_a_scan():
+    script = moves(200)
+    script[50] = {'type': 'mouse_click', 'time': 0.5, 'x': 50, 'y': 0, 'button': 'left', 'pressed': True}
+    script[120] = {'type': 'key_press', 'time': 1.2, 'key': 'enter'}
+    index = main.EventQueryIndex(script)
+    
+    assert index.query(main.parse_event_query("type:click")).tolist() == [50]
+    assert index.query(main.parse_event_query("key:enter")).tolist() == [120]
+    region = index.query(main.parse_event_query("region:10,0,20,0 time:0.15-1")).tolist()
+    assert region == [i for i in range(15, 21)]
+
+
+def test_bulk_edit_translate_and_set_button():
+    events = ChunkedEventList(moves(3) + [{'type': 'mouse_click', 'time': 0.03, 'x': 3, 'y': 0,
+                                           'button': 'left', 'pressed': True}])
+    replacements, deletions = main.bulk_edit_events(events, [1, 3], 'translate', (10, -5))
+    assert deletions == []
+    assert {i: (event['x'], event['y']) for i, event in replacements.items()} == {1: (11, -5), 3: (13, -5)}
+    
+    replacements, _ = main.bulk_edit_events(events, [0, 3], 'set_button', 'right')
+    assert list(replacements) == [3] and replacements[3]['button'] == 'right'
+
+
+def test_bulk_edit_scale_time_keeps_order():
+    events = ChunkedEventList(moves(6))
+    replacements, _ = main.bulk_edit_events(events, [1, 3], 'scale_time', 2.0)
+    events.replace_many(replacements)
+    times = [event['time'] for event in events]
+    assert times == pytest.approx([0.0, 0.01, 0.03, 0.05, 0.06, 0.07])
+    with pytest.raises(ValueError):
+        main.bulk_edit_events(events, [1], 'scale_time', 0)
+
+
+def test_bulk_edit_remove_types():
+    events = ChunkedEventList(moves(2) + [{'type': 'key_press', 'time': 0.02, 'key': 'a'}])
+    assert main.bulk_edit_events(events, [0, 1, 2], 'remove_types', ['press']) == ({}, [2])
+    assert main.bulk_edit_events(events, np.array([], dtype=int), 'translate', (1, 1)) == ({}, [])
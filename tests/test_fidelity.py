@@ -0,0 +1,63 @@
+import pytest
+
+import main
+
+
+def script():
+    events = [{'type': 'mouse_move', 'time': 0.1 * i, 'x': 10 * i, 'y': 5 * i} for i in range(10)]
+    events.append({'type': 'loop', 'time': 1.0, 'count': 3, 'interval': 0.2, 'events': [
+        {'type': 'key_press', 'time': 0.0, 'key': 'a'},
+        {'type': 'key_release', 'time': 0.05, 'key': 'a'},
+        {'type': 'block', 'time': 0.1, 'block': 'B1'}]})
+    events.append({'type': 'mouse_click', 'time': 2.0, 'x': 1, 'y': 2, 'button': 'left', 'pressed': True})
+    events.append({'type': 'mouse_click', 'time': 2.1, 'x': 1, 'y': 2, 'button': 'left', 'pressed': False})
+    blocks = {'B1': [{'type': 'mouse_move', 'time': 0.0, 'x': 300, 'y': 300},
+                     {'type': 'mouse_move', 'time': 0.1, 'x': 310, 'y': 300}]}
+    return events, blocks
+
+
+def test_expected_stream_matches_the_cursor():
+    events, blocks = script()
+    expected = [(round(t, 9), event) for t, event in main._fidelity_expected(events, blocks, None)]
+    played = [(round(t, 9), event) for t, event in main.iter_script_events(events, blocks)]
+    assert expected == played
+    assert len(expected) == 10 + 3 * 4 + 2
+
+
+def test_clean_run_passes():
+    events, blocks = script()
+    report = main.measure_fidelity(events, blocks, {})
+    assert report['failures'] == []
+    assert report['dropped'] == report['reordered'] == 0
+
+
+class SabotagedCursor(main.PlaybackCursor):
+    """Skips the third event it yields and swaps the fifth and sixth"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.yielded = 0
+        self.held = None
+    
+    def __next__(self):
+        if self.held is not None:
+            item, self.held = self.held, None
+            return item
+        item = super().__next__()
+        self.yielded += 1
+        if self.yielded == 3:
+            return self.__next__()
+        if self.yielded == 5:
+            self.held = item
+            self.yielded += 1
+            return super().__next__()
+        return item
+
+
+def test_dropped_and_reordered_events_are_reported(monkeypatch):
+    monkeypatch.setattr(main, 'PlaybackCursor', SabotagedCursor)
+    events, blocks = script()
+    report = main.measure_fidelity(events, blocks, {})
+    assert report['dropped'] == 1
+    assert report['reordered'] == 1
+    assert {'dropped', 'reordered'} <= set(report['failures'])
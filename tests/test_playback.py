@@ -0,0 +1,104 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+import main
+from main import CoordinateTransform, CronSchedule, PlaybackCursor
+
+
+def key(time, name):
+    return {'type': 'key_press', 'time': time, 'key': name}
+
+
+def played(cursor):
+    return [(round(event_time, 6), event['key']) for event_time, event in cursor]
+
+
+def test_loop_passes_shift_later_events():
+    loop = {'type': 'loop', 'time': 1.0, 'count': 3, 'interval': 0.5, 'events': [key(0.0, 'a'), key(1.0, 'b')]}
+    script = [key(0.0, 'start'), loop, key(3.0, 'end')]
+    # Each extra pass shifts what follows by the loop span (1.0) plus its interval (0.5)
+    assert played(PlaybackCursor(script, {})) == [
+        (0.0, 'start'), (1.0, 'a'), (2.0, 'b'), (2.5, 'a'), (3.5, 'b'), (4.0, 'a'), (5.0, 'b'), (6.0, 'end')]
+
+
+def test_forever_loop_runs_lazily():
+    loop = {'type': 'loop', 'time': 0.0, 'count': 0, 'events': [key(0.0, 'a'), key(0.25, 'b')]}
+    cursor = PlaybackCursor([loop, key(1.0, 'never')], {})
+    first = [next(cursor) for _ in range(1000)]
+    assert first[-1][0] == pytest.approx(0.25 * 500)  # pass 500, event b
+    assert len(cursor.stack) == 2
+    assert played(PlaybackCursor([loop, key(1.0, 'end')], {}, infinite_as=2)) == [
+        (0.0, 'a'), (0.25, 'b'), (0.25, 'a'), (0.5, 'b'), (1.25, 'end')]
+
+
+def test_blocks_and_calls_play_in_place():
+    called = {'other.json': ([key(0.0, 'c1'), key(2.0, 'c2')], {})}
+    script = [{'type': 'block', 'time': 1.0, 'block': 'B1'},
+              {'type': 'call', 'time': 3.0, 'path': 'other.json'},
+              key(4.0, 'after')]
+    blocks = {'B1': [key(0.0, 'b1'), key(0.5, 'b2')]}
+    assert played(PlaybackCursor(script, blocks, loader=called.__getitem__)) == [
+        (1.0, 'b1'), (1.5, 'b2'), (3.0, 'c1'), (5.0, 'c2'), (6.0, 'after')]
+    # Without a loader calls are skipped and take no time
+    assert played(PlaybackCursor(script, blocks))[-1] == (4.0, 'after')
+
+
+def test_recursive_calls_are_refused():
+    script = [{'type': 'call', 'time': 0.0, 'path': 'self.json'}]
+    with pytest.raises(RuntimeError):
+        list(PlaybackCursor(script, {}, loader=lambda path: (script, {})))
+
+
+def test_coordinate_transform_scale_and_offset():
+    transform = CoordinateTransform.for_displays((1920, 1080), (1280, 720))
+    xs, ys = transform.apply([0, 960, 1919], [0, 540, 1079])
+    assert xs.tolist() == [0, 640, 1279] and ys.tolist() == [0, 360, 719]
+    assert not transform.is_identity()
+    assert CoordinateTransform().is_identity()
+    
+    xs, ys = CoordinateTransform(offset_x=10, offset_y=-10).apply([1.4], [20])
+    assert (xs.tolist(), ys.tolist()) == ([11], [10])
+
+
+def test_coordinate_transform_anchors_extrapolate():
+    transform = CoordinateTransform(anchors=[(0, 0, 100, 50), (100, 100, 300, 250)])
+    xs, ys = transform.apply(np.array([-50, 0, 50, 100, 150]), np.array([0, 0, 50, 100, 200]))
+    assert xs.tolist() == [0, 100, 200, 300, 400]
+    assert ys.tolist() == [50, 50, 150, 250, 450]
+    
+    # A single anchor is a pure translation
+    xs, ys = CoordinateTransform(anchors=[(10, 10, 15, 5)]).apply([0, 100], [0, 100])
+    assert (xs.tolist(), ys.tolist()) == ([5, 105], [-5, 95])
+
+
+def fire(expression, after):
+    return datetime.fromtimestamp(CronSchedule(expression).next_after(after.timestamp()))
+
+
+def test_cron_next_fire_time():
+    now = datetime(2024, 3, 14, 10, 30, 20)
+    assert fire('*/15 * * * *', now) == datetime(2024, 3, 14, 10, 45)
+    assert fire('0 9 * * *', now) == datetime(2024, 3, 15, 9, 0)
+    assert fire('30 10 * * *', now) == datetime(2024, 3, 15, 10, 30)  # strictly after now
+    assert fire('0 0 29 2 *', now) == datetime(2028, 2, 29, 0, 0)
+
+
+def test_cron_weekdays_and_days():
+    friday = datetime(2024, 3, 15, 12, 0)
+    assert fire('0 8 * * 1-5', friday) == datetime(2024, 3, 18, 8, 0)
+    assert fire('0 8 * * 7', friday) == datetime(2024, 3, 17, 8, 0)  # 7 is Sunday too
+    # A restricted day and weekday fire on either
+    assert fire('0 8 1 * 1', friday) == datetime(2024, 3, 18, 8, 0)
+
+
+@pytest.mark.parametrize('expression', ['* * * *', '60 * * * *', '* * 0 * *', '5-1 * * * *', '*/0 * * * *'])
+def test_cron_rejects_bad_expressions(expression):
+    with pytest.raises(ValueError):
+        CronSchedule(expression)
+
+
+def test_cron_that_never_fires():
+    with pytest.raises(ValueError):
+        CronSchedule('0 0 31 2 *').next_after(datetime(2024, 1, 1).timestamp())
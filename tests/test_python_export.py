@@ -0,0 +1,45 @@
+import ctypes
+import time
+import types
+
+import pytest
+
+import main
+
+
+def generate(events, blocks=None):
+    app = types.SimpleNamespace(recorded_events=main.ChunkedEventList(events), script_blocks=blocks or {},
+                                current_file=None)
+    return main.NaMouseApp.generate_python_code(app)
+
+
+def test_wait_for_polls_and_shifts_later_events(monkeypatch):
+    events = [
+        {'type': 'key_press', 'time': 0.0, 'key': 'a'},
+        {'type': 'wait_for', 'time': 0.5, 'x': 10, 'y': 20, 'color': '#102030', 'tolerance': 0, 'timeout': 5.0},
+        {'type': 'key_release', 'time': 1.0, 'key': 'a'},
+    ]
+    code = generate(events)
+    assert "wait_for_color(10, 20, '#102030', 0, 5.0)" in code
+    
+    polls = []
+    pixels = iter([0x000000, 0x302010])  # GetPixel is 0x00BBGGRR
+    monkeypatch.setattr(ctypes, 'windll', types.SimpleNamespace(
+        user32=types.SimpleNamespace(GetDC=lambda hwnd: 1, ReleaseDC=lambda hwnd, hdc: None),
+        gdi32=types.SimpleNamespace(GetPixel=lambda hdc, x, y: polls.append((x, y)) or next(pixels))),
+        raising=False)
+    monkeypatch.setattr(time, 'sleep', lambda seconds: None)
+    namespace = {'__name__': 'generated'}
+    exec(compile(code, 'generated.py', 'exec'), namespace)
+    namespace['run_automation']()
+    
+    assert polls == [(10, 20), (10, 20)]
+    assert [action for action, _ in namespace['keyboard_controller'].log] == ['press', 'release']
+
+
+def test_forever_loops_are_refused():
+    loop = {'type': 'loop', 'time': 0.0, 'count': 0, 'events': [{'type': 'key_press', 'time': 0.0, 'key': 'a'}]}
+    with pytest.raises(ValueError, match='forever'):
+        generate([loop])
+    code = generate([dict(loop, count=2)])
+    assert code.count("keyboard_controller.press('a')") == 2
@@ -0,0 +1,75 @@
+import json
+import os
+import pickle
+
+import pytest
+
+import main
+
+
+SCRIPT = {'events': [{'type': 'key_press', 'time': 0.0, 'key': 'a'}], 'blocks': {}, 'settings': {},
+          'metadata': {}}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return main.DiskScriptCache(str(tmp_path / 'cache'), key_file=str(tmp_path / 'cache_key'))
+
+
+@pytest.fixture
+def script(tmp_path):
+    path = tmp_path / 'script.json'
+    path.write_text(json.dumps(SCRIPT))
+    return path
+
+
+def load(cache, path):
+    data = cache.load(str(path))
+    cache.writes.join()  # let the background writer store the entry
+    return data
+
+
+def test_hit_after_touch_and_miss_after_change(cache, script):
+    assert load(cache, script) == SCRIPT
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert load(cache, script) == SCRIPT
+    assert (cache.hits, cache.misses) == (1, 1)
+    
+    # Touched but unchanged: still a hit, found by the content hash
+    stat = script.stat()
+    os.utime(script, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert load(cache, script) == SCRIPT
+    assert (cache.hits, cache.misses) == (2, 1)
+    
+    changed = dict(SCRIPT, settings={'playback_speed': 2.0})
+    script.write_text(json.dumps(changed))
+    os.utime(script, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10 ** 9))
+    assert load(cache, script) == changed
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+class Planted:
+    ran = False
+    
+    def __reduce__(self):
+        return (setattr, (Planted, 'ran', True))
+
+
+def test_unsigned_entries_are_never_unpickled(cache, script, tmp_path):
+    load(cache, script)
+    entry_path = cache.entry_path(str(script))
+    with open(entry_path, 'rb') as f:
+        entry = f.read()
+    length = int.from_bytes(entry[4:8], 'little')
+    offset = 8 + length + main.SCRIPT_CACHE_MAC_SIZE
+    with open(entry_path, 'wb') as f:
+        f.write(entry[:offset] + pickle.dumps(Planted()))
+    
+    assert load(cache, script) == SCRIPT
+    assert not Planted.ran
+    assert cache.misses == 2
+    
+    # An entry signed with another key is rejected too
+    other = main.DiskScriptCache(cache.directory, key_file=str(tmp_path / 'other_key'))
+    assert load(other, script) == SCRIPT
+    assert (other.hits, other.misses) == (0, 1)
@@ -0,0 +1,53 @@
+import main
+from main import ChunkedEventList, EventTimeIndex
+
+
+def click(time, x, y, pressed):
+    return {'type': 'mouse_click', 'time': time, 'x': x, 'y': y, 'button': 'left', 'pressed': pressed}
+
+
+def test_held_state_follows_nested_bodies():
+    script = ChunkedEventList([
+        {'type': 'mouse_move', 'time': 0.0, 'x': 5, 'y': 5},
+        {'type': 'section', 'time': 1.0, 'name': 'drag', 'events': [
+            {'type': 'key_press', 'time': 0.0, 'key': 'shift'},
+            click(0.1, 40, 50, True)]},
+        {'type': 'block', 'time': 2.0, 'block': 'B1'},
+        {'type': 'loop', 'time': 3.0, 'count': 2, 'events': [
+            {'type': 'key_press', 'time': 0.0, 'key': 'a'},
+            {'type': 'key_release', 'time': 0.1, 'key': 'a'}]},
+        click(4.0, 70, 80, False),
+    ])
+    blocks = {'B1': [{'type': 'mouse_move', 'time': 0.0, 'x': 60, 'y': 70}]}
+    index = EventTimeIndex(script.snapshot(), blocks)
+    
+    assert index.held_state(0) == (set(), set(), None)
+    assert index.held_state(2) == ({'shift'}, {'left'}, (40, 50))
+    assert index.held_state(4) == ({'shift'}, {'left'}, (60, 70))
+    assert index.held_state(5) == ({'shift'}, set(), (70, 80))
+
+
+def test_held_state_across_checkpoints(monkeypatch):
+    monkeypatch.setattr(main, 'SEEK_CHECKPOINT_INTERVAL', 4)
+    script = [{'type': 'mouse_move', 'time': 0.1 * i, 'x': i, 'y': 2 * i} for i in range(10)]
+    script[2] = click(0.2, 2, 4, True)
+    index = EventTimeIndex(ChunkedEventList(script).snapshot())
+    assert index.held_state(9) == (set(), {'left'}, (8, 16))
+
+
+def test_seek_moves_the_pointer_before_pressing_held_buttons():
+    clock = main.VirtualClock()
+    log = []
+    engine = main.PlaybackEngine(main.VirtualMouse(clock, log=log), main.VirtualKeyboard(clock, log=log),
+                                 clock=clock)
+    script = ChunkedEventList([click(0.0, 100, 200, True), {'type': 'mouse_move', 'time': 0.5, 'x': 150, 'y': 250},
+                               click(1.0, 150, 250, False)])
+    keys, buttons, position = EventTimeIndex(script.snapshot()).held_state(1)
+    play_range = {'start': 1, 'stop': None, 'time': 0.5, 'keys': keys, 'buttons': buttons, 'position': position}
+    transform = main.CoordinateTransform(scale_x=2.0, scale_y=2.0)
+    engine.play(script.snapshot(), {}, dict(main.PLAYBACK_DEFAULTS), play_range, transform)
+    
+    actions = [(action, value) for _, action, value in log]
+    assert actions[0] == ('move', (200, 400))
+    assert actions.index(('press', 'left')) > 0
+    assert actions[-1] == ('release', 'left')
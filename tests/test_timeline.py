@@ -0,0 +1,41 @@
+import pytest
+
+from main import PlaybackTimeline
+
+
+def test_active_gaps_play_at_speed():
+    timeline = PlaybackTimeline(speed=2.0, idle_threshold=1.0)
+    assert timeline.gap_duration(0.8) == pytest.approx(0.4)
+    assert timeline.gap_duration(0.0) == 0.0
+    assert timeline.gap_duration(-1.0) == 0.0  # hand-edited times out of order
+    assert timeline.idle_gaps == 0
+
+
+def test_idle_gaps_play_at_idle_speed():
+    timeline = PlaybackTimeline(speed=2.0, idle_speed=10.0, idle_threshold=1.0)
+    assert timeline.gap_duration(5.0) == pytest.approx(0.5)
+    assert timeline.idle_gaps == 1
+    # Without an idle speed, idle gaps use the playback speed
+    assert PlaybackTimeline(speed=2.0, idle_threshold=1.0).gap_duration(5.0) == pytest.approx(2.5)
+
+
+def test_cap_applies_to_idle_gaps():
+    timeline = PlaybackTimeline(idle_threshold=1.0, max_gap=2.0)
+    assert timeline.gap_duration(30.0) == 2.0
+    assert timeline.gap_duration(1.5) == pytest.approx(1.5)
+    assert (timeline.idle_gaps, timeline.clamped_gaps) == (2, 1)
+
+
+def test_cap_applies_below_the_idle_threshold():
+    timeline = PlaybackTimeline(idle_threshold=5.0, max_gap=0.5)
+    assert timeline.gap_duration(3.0) == 0.5
+    assert timeline.gap_duration(0.2) == pytest.approx(0.2)
+    assert (timeline.idle_gaps, timeline.clamped_gaps) == (0, 1)
+
+
+def test_advance_accumulates_playback_time():
+    timeline = PlaybackTimeline(speed=1.0, idle_speed=4.0, idle_threshold=1.0, max_gap=3.0)
+    times = [timeline.advance(t) for t in (0.5, 1.0, 9.0, 29.0)]
+    assert times == pytest.approx([0.5, 1.0, 3.0, 6.0])
+    timeline.reset(29.0)
+    assert timeline.advance(29.5) == pytest.approx(0.5)
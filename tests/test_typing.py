@@ -0,0 +1,70 @@
+import pytest
+
+import main
+
+
+def keys(spec, start=0.0):
+    """Events from 'shift+ h+ h- shift-' (+ press, - release), 0.1 s apart"""
+    events = []
+    for i, token in enumerate(spec.split()):
+        name, action = token[:-1], token[-1]
+        events.append({'type': 'key_press' if action == '+' else 'key_release', 'time': start + 0.1 * i,
+                       'key': name})
+    return events
+
+
+def typed(text):
+    return ' '.join(f'{char}+ {char}-' for char in text)
+
+
+def held_after(events):
+    held = set()
+    for event in events:
+        if event['type'] == 'key_press':
+            held.add(event['key'])
+        elif event['type'] == 'key_release':
+            held.discard(event['key'])
+    return held
+
+
+def summary(events):
+    return [event['text'] if event['type'] == 'type_text' else (event['type'], event['key']) for event in events]
+
+
+def test_plain_typing_is_coalesced_with_offsets():
+    events = main.coalesce_typing(keys(typed('hello')))
+    assert summary(events) == ['hello']
+    assert events[0]['time'] == 0.0
+    assert events[0]['offsets'] == pytest.approx([0.0, 0.2, 0.4, 0.6, 0.8])
+
+
+def test_shift_inside_the_run_is_dropped():
+    events = main.coalesce_typing(keys(f"{typed('ab')} shift+ C+ C- shift- {typed('d')}"))
+    assert summary(events) == ['abCd']
+
+
+def test_shift_pressed_before_the_run_is_released():
+    # The press lands before the run starts and the release inside it
+    events = main.coalesce_typing(keys(f"shift+ H+ H- shift- {typed('ello')}"))
+    assert summary(events) == [('key_press', 'shift'), ('key_press', 'H'), ('key_release', 'H'),
+                               ('key_release', 'shift'), 'ello']
+    assert held_after(events) == set()
+
+
+def test_shift_held_across_the_end_of_a_run():
+    # The run ends at ctrl while shift is still down; shift is released after ctrl
+    source = keys(f"{typed('abc')} shift+ D+ D- ctrl+ s+ s- ctrl- shift-")
+    events = main.coalesce_typing(source)
+    assert summary(events)[:2] == ['abc', ('key_press', 'shift')]
+    assert ('key_release', 'shift') in summary(events)
+    assert held_after(events) == held_after(source) == set()
+
+
+def test_auto_repeated_shift_is_paired_with_its_release():
+    events = main.coalesce_typing(keys(f"{typed('ab')} shift+ shift+ C+ C- shift- {typed('d')}"))
+    assert summary(events) == ['abCd']
+
+
+def test_modifier_chords_are_left_alone():
+    source = keys(f"ctrl+ {typed('abc')} ctrl-")
+    assert main.coalesce_typing(source) == source